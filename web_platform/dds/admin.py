@@ -4,7 +4,8 @@ from .models import (
     Status,
     Type,
     Category,
-    Subcategory
+    Subcategory,
+    Job,
 )
 
 
@@ -16,7 +17,7 @@ class StatusAdmin(admin.ModelAdmin):
 
 @admin.register(Type)
 class TypeAdmin(admin.ModelAdmin):
-    list_display = 'pk', 'type_name'
+    list_display = 'pk', 'type_name', 'sign'
     list_display_links = 'pk', 'type_name',
 
 
@@ -30,3 +31,10 @@ class CategoryAdmin(admin.ModelAdmin):
 class SubcategoryAdmin(admin.ModelAdmin):
     list_display = 'pk', 'category', 'subcategory_name'
     list_display_links = 'pk', 'category', 'subcategory_name'
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = 'pk', 'kind', 'description', 'status', 'processed', 'total', 'created_at', 'finished_at'
+    list_display_links = 'pk', 'kind'
+    list_filter = 'status', 'kind'
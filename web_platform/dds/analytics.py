@@ -0,0 +1,543 @@
+import datetime
+import json
+import os
+import shutil
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import BigIntegerField, F, Max, Sum
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+
+from .archive import MAX_IDS_PER_QUERY
+from .models import ArchivedCashFlow, CashFlow, CashFlowChange, DailyCashFlowAggregate
+from .reports import DEFAULT_PERIOD, VERSION_MODELS
+from .versions import get_table_versions
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Столбцы снимка и их типы: даты - ординалы (date.toordinal), справочники - ID,
+# суммы - копейки
+COLUMNS = {
+    'id': 'int64',
+    'date': 'int32',
+    'status': 'int32',
+    'type': 'int32',
+    'category': 'int32',
+    'subcategory': 'int32',
+    'amount': 'int64',
+}
+SOURCE_FIELDS = 'id', 'creation_date', 'status_id', 'type_id', 'category_id', 'subcategory_id', 'kopecks'
+# Параметры фильтров главной страницы и соответствующие столбцы снимка
+FILTER_COLUMNS = {
+    'status': 'status',
+    'type_obj': 'type',
+    'category': 'category',
+    'subcategory': 'subcategory',
+}
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+
+# Открытые снимки процесса: {каталог: Snapshot}
+_opened = {}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImproperlyConfigured('Для dds.analytics установите пакет numpy: pip install numpy')
+
+
+def _kopecks(field):
+    return Cast(Round(F(field) * 100), BigIntegerField())
+
+
+def _empty():
+    return {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+
+def _concat(parts):
+    return {name: np.concatenate([part[name] for part in parts]).astype(dtype, copy=False) for name, dtype in COLUMNS.items()}
+
+
+def _sort(columns):
+    order = np.lexsort((columns['id'], columns['date']))
+    return {name: column[order] for name, column in columns.items()}
+
+
+def _to_ordinals(values):
+    days = np.array(values, dtype='datetime64[D]').astype(np.int64)
+    return (days + EPOCH_ORDINAL).astype(np.int32)
+
+
+def _to_ordinal(value):
+    if not isinstance(value, datetime.date):
+        value = datetime.date.fromisoformat(str(value))
+    return value.toordinal()
+
+
+def _read_rows(queryset):
+    """
+    Читает операции queryset (CashFlow или ArchivedCashFlow) в столбцы снимка.
+
+    Суммы переводятся в копейки в базе данных, поэтому из строк
+    не создаются объекты Decimal.
+    """
+    rows = list(queryset.annotate(kopecks=_kopecks('amount')).values_list(*SOURCE_FIELDS).order_by())
+    if not rows:
+        return _empty()
+    ids, dates, statuses, types, categories, subcategories, amounts = zip(*rows)
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'date': _to_ordinals(dates),
+        'status': np.array(statuses, dtype=np.int32),
+        'type': np.array(types, dtype=np.int32),
+        'category': np.array(categories, dtype=np.int32),
+        'subcategory': np.array(subcategories, dtype=np.int32),
+        'amount': np.array(amounts, dtype=np.int64),
+    }
+
+
+def _read_all(**lookups):
+    return _concat([
+        _read_rows(CashFlow.objects.filter(**lookups)),
+        _read_rows(ArchivedCashFlow.objects.filter(**lookups)),
+    ])
+
+
+def _date_stats(columns):
+    """
+    Возвращает итоги снимка по дням: {ординал: (количество, сумма в копейках,
+    сумма ID статусов, сумма ID подкатегорий)}. Столбцы упорядочены по дате.
+    """
+    dates, starts = np.unique(columns['date'], return_index=True)
+    if not len(dates):
+        return {}
+    counts = np.diff(np.append(starts, len(columns['date'])))
+    sums = [np.add.reduceat(columns[name].astype(np.int64), starts) for name in ('amount', 'status', 'subcategory')]
+    return dict(zip(dates.tolist(), zip(counts.tolist(), *(column.tolist() for column in sums))))
+
+
+def _source_date_stats():
+    """
+    Возвращает те же итоги по дням из таблицы дневных агрегатов DailyCashFlowAggregate.
+
+    Агрегаты ведутся в одной транзакции с операциями (включая архив),
+    поэтому расхождение с _date_stats означает, что операции дня изменены
+    или удалены после построения снимка.
+    """
+    rows = (
+        DailyCashFlowAggregate.objects
+        .values('date')
+        .annotate(
+            count=Sum('operations_count'),
+            amount=Sum(_kopecks('total_amount')),
+            status_sum=Sum(F('operations_count') * F('status_id')),
+            subcategory_sum=Sum(F('operations_count') * F('subcategory_id')),
+        )
+        .order_by()
+    )
+    return {
+        row['date'].toordinal(): (row['count'], row['amount'], row['status_sum'], row['subcategory_sum'])
+        for row in rows
+    }
+
+
+def _source_versions():
+    versions = get_table_versions(VERSION_MODELS)
+    return [versions[model] for model in VERSION_MODELS]
+
+
+def truncate_period(ordinals, period):
+    """
+    Возвращает ординалы начала периода (day, week, month, quarter, year) для ординалов дат.
+
+    Недели начинаются с понедельника, как TruncWeek.
+    """
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    if period == 'day':
+        return ordinals
+    if period == 'week':
+        # Ординал 1 (01.01.0001) - понедельник
+        return ordinals - (ordinals - 1) % 7
+    return shift_period(ordinals, period, 0)
+
+
+def shift_period(ordinals, period, step):
+    """
+    Возвращает ординалы начала периода, отстоящего на step периодов от периода дат ordinals.
+    """
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    if period == 'day':
+        return ordinals + step
+    if period == 'week':
+        return truncate_period(ordinals, period) + 7 * step
+    months = (ordinals - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    size = PERIOD_MONTHS[period]
+    months = months - months % size + size * step
+    return months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) + EPOCH_ORDINAL
+
+
+def _group_percentiles(amounts, starts, counts, q):
+    """
+    Процентиль q сумм каждой группы с линейной интерполяцией (как numpy.percentile).
+
+    Суммы упорядочены по группе и по возрастанию внутри группы.
+    """
+    position = starts + (counts - 1) * (q / 100)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, starts + counts - 1)
+    return amounts[lower] + (amounts[upper] - amounts[lower]) * (position - lower)
+
+
+def _previous_amounts(result, group_by, period):
+    """
+    Суммы тех же групп за предыдущий период (0, если операций не было).
+    """
+    if not len(result['period']):
+        return np.zeros(0, dtype=np.int64)
+    previous = shift_period(result['period'], period, -1)
+    periods = np.unique(np.concatenate((result['period'], previous)))
+    current_key = np.searchsorted(periods, result['period']).astype(np.int64)
+    previous_key = np.searchsorted(periods, previous).astype(np.int64)
+    for name in group_by:
+        values, codes = np.unique(result[name], return_inverse=True)
+        current_key = current_key * len(values) + codes
+        previous_key = previous_key * len(values) + codes
+    order = np.argsort(current_key)
+    position = np.minimum(np.searchsorted(current_key, previous_key, sorter=order), len(order) - 1)
+    found = current_key[order[position]] == previous_key
+    return np.where(found, result['amount'][order[position]], 0)
+
+
+class Snapshot:
+    """
+    Столбцовый снимок операций ДДС (CashFlow вместе с архивом).
+
+    Столбцы хранятся файлами .npy и открываются через memory map: процессы
+    читают один и тот же файл из страничного кеша ОС, не загружая его целиком.
+    Строки упорядочены по дате и ID, поэтому фильтр по датам - срез столбцов
+    без копирования, а фильтры по справочникам и группировки выполняются
+    векторными операциями NumPy.
+    """
+
+    def __init__(self, columns, meta, path=None):
+        self.columns = columns
+        self.meta = meta
+        self.path = path
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    @classmethod
+    def load(cls, path):
+        """
+        Открывает снимок из каталога поколения (столбцы .npy и meta.json).
+        """
+        _require_numpy()
+        path = Path(path)
+        meta = json.loads((path / 'meta.json').read_text(encoding='utf-8'))
+        columns = {name: np.load(path / f'{name}.npy', mmap_mode='r') for name in COLUMNS}
+        return cls(columns, meta, path)
+
+    def select(self, filters):
+        """
+        Возвращает столбцы операций, подходящих под фильтры главной страницы.
+
+        Как и в filter_cash_flows, нецифровые ID справочников игнорируются.
+        """
+        date = self.columns['date']
+        start, stop = 0, len(date)
+        if filters.get('date_from'):
+            start = int(np.searchsorted(date, _to_ordinal(filters['date_from']), 'left'))
+        if filters.get('date_to'):
+            stop = int(np.searchsorted(date, _to_ordinal(filters['date_to']), 'right'))
+        columns = {name: column[start:max(start, stop)] for name, column in self.columns.items()}
+
+        mask = None
+        for param, name in FILTER_COLUMNS.items():
+            value = str(filters.get(param) or '')
+            if value.isdigit():
+                condition = columns[name] == int(value)
+                mask = condition if mask is None else mask & condition
+        if mask is not None:
+            columns = {name: column[mask] for name, column in columns.items()}
+        return columns
+
+    def aggregate(self, period=DEFAULT_PERIOD, group_by=(), filters=None, percentiles=(), compare=False):
+        """
+        Группирует операции по периоду и измерениям.
+
+        Args:
+            period (str): day, week, month, quarter или year
+            group_by (tuple): Измерения: status, type, category, subcategory
+            filters (dict): Фильтры главной страницы (FILTER_PARAMS)
+            percentiles (tuple): Процентили сумм операций в группе, например (50, 90)
+            compare (bool): Добавить сумму той же группы за предыдущий период
+
+        Returns:
+            dict: Массивы одинаковой длины, упорядоченные по периоду и измерениям:
+                period - ординалы начала периода, столбцы измерений,
+                amount - сумма в копейках, count - количество операций,
+                p50, p90... - процентили в копейках,
+                previous_amount - сумма за предыдущий период в копейках
+        """
+        columns = self.select(filters or {})
+        periods = truncate_period(columns['date'], period)
+
+        # Составной ключ группы: коды значений ключей в смешанной системе счисления
+        combined = np.zeros(len(periods), dtype=np.int64)
+        for key in [periods] + [columns[name] for name in group_by]:
+            values, codes = np.unique(key, return_inverse=True)
+            combined = combined * len(values) + codes
+        _, first, inverse = np.unique(combined, return_index=True, return_inverse=True)
+
+        counts = np.bincount(inverse, minlength=len(first))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+        amounts = np.asarray(columns['amount'])[np.lexsort((columns['amount'], inverse))]
+
+        result = {'period': periods[first]}
+        for name in group_by:
+            result[name] = np.asarray(columns[name][first], dtype=np.int64)
+        result['amount'] = np.add.reduceat(amounts, starts) if len(first) else np.zeros(0, dtype=np.int64)
+        result['count'] = counts
+        for q in percentiles:
+            result[f'p{q}'] = _group_percentiles(amounts, starts, counts, q)
+        if compare:
+            result['previous_amount'] = _previous_amounts(result, group_by, period)
+        return result
+
+
+def get_snapshot_dir():
+    """
+    Возвращает каталог снимка (настройка DDS_ANALYTICS_DIR).
+
+    В каталоге лежат поколения снимка (подкаталоги со столбцами и meta.json)
+    и файл CURRENT с именем текущего поколения.
+    """
+    return Path(getattr(settings, 'DDS_ANALYTICS_DIR', settings.BASE_DIR / 'analytics'))
+
+
+def open_snapshot(root=None):
+    """
+    Открывает текущее поколение снимка или возвращает None, если снимок не построен.
+
+    Открытый снимок переиспользуется процессом, пока не сменится поколение.
+    """
+    _require_numpy()
+    root = Path(root or get_snapshot_dir())
+    try:
+        generation = (root / 'CURRENT').read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        return None
+    path = root / generation
+    snapshot = _opened.get(root)
+    if snapshot is None or snapshot.path != path:
+        snapshot = _opened[root] = Snapshot.load(path)
+    return snapshot
+
+
+def _write(root, columns, meta):
+    """
+    Записывает новое поколение снимка и атомарно делает его текущим.
+
+    Читатели продолжают работать со своим поколением; поколения старше
+    предыдущего удаляются.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    generation = f'{time.time_ns():x}'
+    path = root / generation
+    path.mkdir()
+    for name, dtype in COLUMNS.items():
+        np.save(path / f'{name}.npy', np.ascontiguousarray(columns[name], dtype=dtype))
+    (path / 'meta.json').write_text(json.dumps(meta), encoding='utf-8')
+
+    previous = None
+    try:
+        previous = (root / 'CURRENT').read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        pass
+    pointer = root / f'CURRENT.{generation}'
+    pointer.write_text(generation, encoding='utf-8')
+    os.replace(pointer, root / 'CURRENT')
+
+    for child in root.iterdir():
+        if child.is_dir() and child.name not in (generation, previous):
+            shutil.rmtree(child, ignore_errors=True)
+    return Snapshot.load(path)
+
+
+def _merge_changes(changes):
+    """
+    Разбирает записи журнала CashFlowChange на отдельные даты и диапазоны.
+
+    Пересекающиеся диапазоны объединяются, даты внутри диапазонов
+    отбрасываются, поэтому каждая операция перечитывается один раз.
+
+    Args:
+        changes (list): Пары (date_from, date_to); None - граница не ограничена
+
+    Returns:
+        tuple: (отсортированный список ординалов дат, список диапазонов ординалов [(start, stop)])
+    """
+    days = set()
+    ranges = []
+    for date_from, date_to in changes:
+        if date_from is not None and date_from == date_to:
+            days.add(date_from.toordinal())
+        else:
+            start = date_from.toordinal() if date_from else 1
+            stop = date_to.toordinal() if date_to else datetime.date.max.toordinal()
+            ranges.append((start, stop))
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    days = sorted(day for day in days if not any(start <= day <= stop for start, stop in merged))
+    return days, merged
+
+
+def _reload(columns, days, ranges):
+    """
+    Заменяет в столбцах операции дат days и диапазонов ranges (ординалы)
+    операциями из базы данных.
+    """
+    drop = np.isin(columns['date'], days)
+    for start, stop in ranges:
+        drop |= (columns['date'] >= start) & (columns['date'] <= stop)
+    parts = [{name: column[~drop] for name, column in columns.items()}]
+    dates = [datetime.date.fromordinal(day) for day in days]
+    for i in range(0, len(dates), MAX_IDS_PER_QUERY):
+        parts.append(_read_all(creation_date__in=dates[i:i + MAX_IDS_PER_QUERY]))
+    for start, stop in ranges:
+        parts.append(_read_all(
+            creation_date__gte=datetime.date.fromordinal(start),
+            creation_date__lte=datetime.date.fromordinal(stop),
+        ))
+    return _sort(_concat(parts))
+
+
+def refresh_snapshot(root=None, full=False):
+    """
+    Обновляет снимок операций и возвращает его вместе со статистикой обновления.
+
+    Инкрементальное обновление:
+        1. Дописывает операции с ID больше водяного знака (meta['watermark'])
+           из CashFlow и архива.
+        2. Перечитывает даты и диапазоны дат из записей журнала CashFlowChange
+           с ID больше обработанного (meta['change_id']) - изменения
+           и удаления старых операций.
+        3. Сверяет итоги снимка по дням (количество, сумма, суммы ID статусов
+           и подкатегорий) с таблицей дневных агрегатов и перечитывает дни
+           с расхождениями - страховка от изменений, не попавших в журнал
+           (например, зафиксированных позже чтения журнала).
+    Полное построение выполняется при full=True, если снимка еще нет, если
+    журнал сообщает о пересчете всех дат или если снимок не обновлялся дольше
+    срока хранения журнала (DDS_ANALYTICS_CHANGES_DAYS).
+
+    Returns:
+        tuple: (Snapshot, {'full': bool, 'appended': int, 'reloaded_dates': int,
+            'reloaded_ranges': int, 'rows': int})
+    """
+    _require_numpy()
+    root = Path(root or get_snapshot_dir())
+    now = timezone.now()
+    retention = datetime.timedelta(days=getattr(settings, 'DDS_ANALYTICS_CHANGES_DAYS', 30))
+    # Версии и журнал читаются до данных: изменения во время обновления попадут в следующее обновление
+    versions = _source_versions()
+    snapshot = None if full else open_snapshot(root)
+    if snapshot is not None and (
+        'change_id' not in snapshot.meta
+        or datetime.datetime.fromisoformat(snapshot.meta['built_at']) < now - retention
+    ):
+        snapshot = None
+    if snapshot is None:
+        change_id = CashFlowChange.objects.aggregate(change_id=Max('id'))['change_id'] or 0
+        changes = []
+    else:
+        change_id = snapshot.meta['change_id']
+        changes = list(CashFlowChange.objects.filter(id__gt=change_id).values_list('id', 'date_from', 'date_to'))
+        if changes:
+            change_id = max(pk for pk, _, _ in changes)
+        if any(date_from is None and date_to is None for _, date_from, date_to in changes):
+            snapshot = None
+    stats = {'full': snapshot is None, 'appended': 0, 'reloaded_dates': 0, 'reloaded_ranges': 0}
+
+    if snapshot is None:
+        columns = _sort(_read_all())
+        watermark = 0
+    else:
+        watermark = snapshot.meta['watermark']
+        appended = _read_all(id__gt=watermark)
+        stats['appended'] = len(appended['id'])
+        columns = _sort(_concat([snapshot.columns, appended]))
+
+        days, ranges = _merge_changes([(date_from, date_to) for _, date_from, date_to in changes])
+        if days or ranges:
+            columns = _reload(columns, days, ranges)
+
+        snapshot_stats = _date_stats(columns)
+        source_stats = _source_date_stats()
+        mismatched = sorted(
+            date for date in snapshot_stats.keys() | source_stats.keys()
+            if snapshot_stats.get(date) != source_stats.get(date)
+        )
+        if mismatched:
+            columns = _reload(columns, mismatched, [])
+        stats['reloaded_dates'] = len(days) + len(mismatched)
+        stats['reloaded_ranges'] = len(ranges)
+
+    if len(columns['id']):
+        watermark = max(watermark, int(columns['id'].max()))
+    stats['rows'] = len(columns['id'])
+    meta = {
+        'watermark': watermark,
+        'change_id': change_id,
+        'rows': stats['rows'],
+        'versions': versions,
+        'built_at': now.isoformat(),
+    }
+    snapshot = _opened[root] = _write(root, columns, meta)
+    CashFlowChange.objects.prune(now - retention)
+    return snapshot, stats
+
+
+def get_snapshot():
+    """
+    Возвращает снимок из каталога DDS_ANALYTICS_DIR, обновленный до текущих данных.
+
+    Снимок обновляется, только если изменились версии таблицы дневных
+    агрегатов или справочников (те же, что у кеша отчетов).
+    """
+    snapshot = open_snapshot()
+    if snapshot is None or snapshot.meta['versions'] != _source_versions():
+        snapshot, _ = refresh_snapshot()
+    return snapshot
+
+
+def aggregate_report(period, group_by, filters):
+    """
+    Строки отчета dds.reports.build_report, посчитанные по снимку.
+
+    Returns:
+        list[dict]: {'period': date, 'type': 2, ..., 'amount': Decimal, 'count': int}
+    """
+    result = get_snapshot().aggregate(period, group_by, filters)
+    values = [result['period'].tolist()]
+    values += [result[name].tolist() for name in group_by]
+    values += [result['amount'].tolist(), result['count'].tolist()]
+    rows = []
+    for row in zip(*values):
+        item = {'period': datetime.date.fromordinal(row[0])}
+        item.update(zip(group_by, row[1:-2]))
+        item['amount'] = Decimal(row[-2]).scaleb(-2)
+        item['count'] = row[-1]
+        rows.append(item)
+    return rows
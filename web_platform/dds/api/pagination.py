@@ -0,0 +1,182 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация по ключу из нескольких полей.
+
+    Порядок задается методом get_ordering или атрибутом ordering у ViewSet
+    (например, ('-creation_date', '-id')), последнее поле должно быть уникальным.
+    Поля могут быть аннотациями queryset (например, search_rank). Страница выбирается условием
+    "строго после/до ключа граничной строки" и LIMIT page_size + 1, без OFFSET
+    и COUNT(*), поэтому время ответа не зависит от глубины страницы
+    (в отличие от CursorPagination DRF, которая для одинаковых значений
+    первого поля использует смещение).
+
+    Работает как с QuerySet (в том числе values()), так и со списками
+    словарей или объектов - например, со справочниками из reference_cache.
+
+    Формат ответа совпадает с CursorPagination DRF:
+        {"next": url | null, "previous": url | null, "results": [...]}
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        get_ordering = getattr(view, 'get_ordering', None)
+        ordering = get_ordering() if get_ordering is not None else getattr(view, 'ordering', None)
+        self.ordering = tuple(ordering or ('id',))
+        self.page_size = self.get_page_size(request)
+        model = queryset.model if isinstance(queryset, QuerySet) else view.queryset.model
+        position, reverse = self.decode_cursor(request, model)
+
+        if isinstance(queryset, QuerySet):
+            rows = self._page_queryset(queryset, position, reverse)
+        else:
+            rows = self._page_list(queryset, position, reverse)
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = position is not None, has_more
+
+        self.next_position = self._key(rows[-1]) if rows and has_next else None
+        self.previous_position = self._key(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value and value.isdigit() and int(value) > 0:
+            return min(int(value), self.max_page_size)
+        return self.page_size
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self._link(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self._link(self.previous_position, reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'), default=str)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        """
+        Возвращает (значения ключа, признак движения назад) или (None, False) для первой страницы.
+
+        Raises:
+            NotFound: Если курсор поврежден
+        """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                self._to_python(model, field.lstrip('-'), value)
+                for field, value in zip(self.ordering, values)
+            ]
+            return position, bool(payload['r'])
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _to_python(self, model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Аннотация (например, search_rank): значение из JSON без преобразования
+            if not isinstance(value, (int, float, str)):
+                raise ValueError(name)
+            return value
+        return field.to_python(value)
+
+    def _link(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        if position is None:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, reverse))
+
+    def _key(self, row):
+        names = [field.lstrip('-') for field in self.ordering]
+        if isinstance(row, dict):
+            return [row[name] for name in names]
+        return [getattr(row, name) for name in names]
+
+    def _page_queryset(self, queryset, position, reverse):
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            condition = Q()
+            prefix = {}
+            for field, value in zip(ordering, position):
+                name = field.lstrip('-')
+                lookup = f'{name}__lt' if field.startswith('-') else f'{name}__gt'
+                condition |= Q(**prefix, **{lookup: value})
+                prefix[name] = value
+            if len(ordering) > 1:
+                # Нестрогая граница по первому полю позволяет использовать индекс как
+                # диапазон (для одного только OR SQLite выбирает MULTI-INDEX OR)
+                first = ordering[0]
+                bound = 'lte' if first.startswith('-') else 'gte'
+                condition &= Q(**{f'{first.lstrip("-")}__{bound}': position[0]})
+            queryset = queryset.filter(condition)
+        return list(queryset[:self.page_size + 1])
+
+    def _page_list(self, rows, position, reverse):
+        descending = [field.startswith('-') != reverse for field in self.ordering]
+
+        def follows(key):
+            for value, bound, desc in zip(key, position, descending):
+                if value != bound:
+                    return value < bound if desc else value > bound
+            return False
+
+        # Сортировка по полям справа налево: sort стабилен
+        rows = list(rows)
+        for index in reversed(range(len(self.ordering))):
+            rows.sort(key=lambda row: self._key(row)[index], reverse=descending[index])
+        if position is not None:
+            rows = [row for row in rows if follows(self._key(row))]
+        return rows[:self.page_size + 1]
@@ -1,12 +1,32 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
 from rest_framework import serializers
 
+from ..forms import validate_hierarchy
 from ..models import (
     Category,
-    Subcategory
+    Subcategory,
+    CashFlow,
 )
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Миксин сериализатора, ограничивающий набор полей аргументом fields.
+
+    Пример:
+        CategorySerializer(obj, fields=['id', 'category_name'])
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для модели Category.
 
@@ -23,7 +43,7 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class SubcategorySerializer(serializers.ModelSerializer):
+class SubcategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для модели Subcategory.
 
@@ -37,4 +57,79 @@ class SubcategorySerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Subcategory
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class CashFlowSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Сериализатор для модели CashFlow.
+
+    Используется в CashFlowViewSet для чтения, создания и изменения операций.
+    Справочники передаются по ID. Проверяет те же правила, что и
+    CreateCashFlowForm: категория принадлежит типу, подкатегория - категории,
+    сумма не отрицательна.
+    """
+    class Meta:
+        model = CashFlow
+        fields = 'id', 'creation_date', 'status', 'type', 'category', 'subcategory', 'amount', 'comment'
+
+    def _get(self, attrs, name):
+        if name in attrs:
+            return attrs[name]
+        return getattr(self.instance, name, None)
+
+    def validate_amount(self, value):
+        if value < 0:
+            raise serializers.ValidationError(f'Сумма должна быть положительной: {value}')
+        return value
+
+    def validate(self, attrs):
+        type_obj = self._get(attrs, 'type')
+        category = self._get(attrs, 'category')
+        subcategory = self._get(attrs, 'subcategory')
+
+        try:
+            validate_hierarchy(type_obj, category, subcategory)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.message_dict)
+
+        if self.instance is None and not attrs.get('creation_date'):
+            # Значение по умолчанию модели (timezone.now) - datetime, а не date
+            attrs['creation_date'] = timezone.localdate()
+        return attrs
+
+
+class CashFlowBulkItemSerializer(serializers.Serializer):
+    """
+    Сериализатор одной операции в пакетной загрузке.
+
+    Проверяет только формат значений: справочники принимаются как ID и
+    проверяются пакетно через ReferenceLookup, без запросов на строку.
+    """
+    creation_date = serializers.DateField(required=False)
+    status = serializers.IntegerField()
+    type = serializers.IntegerField()
+    category = serializers.IntegerField()
+    subcategory = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=30, decimal_places=2)
+    comment = serializers.CharField(max_length=150, required=False, allow_null=True, allow_blank=True)
+
+    def validate_amount(self, value):
+        if value < 0:
+            raise serializers.ValidationError(f'Сумма должна быть положительной: {value}')
+        return value
+
+
+class CashFlowBulkUpdateItemSerializer(CashFlowBulkItemSerializer):
+    """
+    Сериализатор одной строки пакетного изменения: ID операции и изменяемые поля.
+
+    Используется с partial=True; справочники итоговых значений строки
+    проверяются пакетно через ReferenceLookup.
+    """
+    id = serializers.IntegerField()
+
+    def validate(self, attrs):
+        if 'id' not in attrs:
+            raise serializers.ValidationError({'id': 'Обязательное поле.'})
+        return attrs
@@ -1,9 +1,15 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from .views import (
     CategoryViewSet,
-    SubcategoryViewSet
+    SubcategoryViewSet,
+    HierarchyViewSet,
+    CashFlowViewSet,
+    ReportAPIView,
+    AsyncCategoryListView,
+    AsyncSubcategoryListView,
 )
 
 app_name = 'api-root'
@@ -12,7 +18,18 @@ router = DefaultRouter()
 
 router.register(r'category', CategoryViewSet, basename='category')
 router.register(r'subcategory', SubcategoryViewSet, basename='subcategory')
+router.register(r'hierarchy', HierarchyViewSet, basename='hierarchy')
+router.register(r'cashflow', CashFlowViewSet, basename='cashflow')
+
+# Списки справочников обслуживают асинхронные представления при DDS_ASYNC_VIEWS,
+# остальные действия - ViewSet (маршруты ниже имеют приоритет над маршрутами router)
+async_urlpatterns = [
+    path('category/', AsyncCategoryListView.as_view(), name='category-list'),
+    path('subcategory/', AsyncSubcategoryListView.as_view(), name='subcategory-list'),
+]
 
 urlpatterns = [
+    path('reports/', ReportAPIView.as_view(), name='reports'),
+    *(async_urlpatterns if settings.DDS_ASYNC_VIEWS else []),
     path('', include(router.urls)),
 ]
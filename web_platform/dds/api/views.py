@@ -1,23 +1,262 @@
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.viewsets import ModelViewSet
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView, exception_handler
+from rest_framework.viewsets import ModelViewSet, ViewSet
 
+from .pagination import KeysetPagination
 from .serializers import (
     CategorySerializer,
-    SubcategorySerializer
+    SubcategorySerializer,
+    CashFlowSerializer,
+    CashFlowBulkItemSerializer,
+    CashFlowBulkUpdateItemSerializer,
 )
+from ..bulk import ReferenceLookup, bulk_insert_cash_flows, bulk_save_cash_flows
+from ..filters import filter_cash_flows
 from ..models import (
+    Type,
     Category,
-    Subcategory
+    Subcategory,
+    CashFlow,
 )
+from ..reference_cache import reference_cache
+from ..reports import VERSION_MODELS as REPORT_VERSION_MODELS, get_report, parse_report_params, pivot_report
+from ..search import SEARCH_PARAM, parse_search_terms, search_cash_flows
+from ..versions import get_table_states
+
+
+class NotModified(Exception):
+    """
+    Прерывает обработку запроса, если у клиента актуальная версия ответа.
+    """
+
+    def __init__(self, response):
+        self.response = response
+
+
+def conditional_state(states, models, renderer_format):
+    """
+    Возвращает (ETag, Last-Modified) по состояниям таблиц из get_table_states.
+    """
+    version = '.'.join(str(states[model][0]) for model in models)
+    etag = quote_etag(f'{version}-{renderer_format}')
+    last_modified = int(max(state[1] for state in states.values()))
+    return etag, last_modified
+
+
+def patch_conditional_headers(response, etag, last_modified):
+    """
+    Добавляет в ответ ETag, Last-Modified, Cache-Control и Vary для условных запросов.
+    """
+    response.headers.setdefault('ETag', etag)
+    response.headers.setdefault('Last-Modified', http_date(last_modified))
+    patch_cache_control(response, max_age=getattr(settings, 'DDS_API_CACHE_MAX_AGE', 0), must_revalidate=True)
+    patch_vary_headers(response, ['Accept'])
 
 
-class CategoryViewSet(ModelViewSet):
+class ConditionalResponseMixin:
+    """
+    Миксин условных GET-запросов (ETag / Last-Modified) по версиям таблиц.
+
+    ETag строится из версий таблиц version_models и формата ответа,
+    Last-Modified - из времени последнего изменения этих таблиц
+    (dds.reference_cache.get_table_states). Версии читаются из кеша Django,
+    поэтому ответ 304 Not Modified не выполняет запросов к базе данных
+    и не сериализует данные.
+
+    Атрибуты:
+        version_models (tuple): Модели, от данных которых зависит ответ.
+            Пустой кортеж отключает условные запросы.
+
+    Настройки:
+        DDS_API_CACHE_MAX_AGE: max-age в Cache-Control (по умолчанию 0 -
+            клиент и прокси повторно проверяют ответ при каждом обращении)
+    """
+    version_models = ()
+
+    def get_conditional_state(self, request):
+        """
+        Возвращает (ETag, Last-Modified) для безопасного запроса или None.
+        """
+        if request.method not in ('GET', 'HEAD') or not self.version_models:
+            return None
+        renderer_format = getattr(request, 'accepted_renderer', None) and request.accepted_renderer.format
+        return conditional_state(get_table_states(self.version_models), self.version_models, renderer_format)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_state = self.get_conditional_state(request)
+        if self.conditional_state is not None:
+            etag, last_modified = self.conditional_state
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        state = getattr(self, 'conditional_state', None)
+        if state is not None and response.status_code in (200, 304):
+            patch_conditional_headers(response, *state)
+        return response
+
+
+class BaseModelViewSet(ConditionalResponseMixin, ModelViewSet):
+    """
+    Базовый ViewSet для всех ViewSet модуля dds.api.
+
+    Обеспечивает:
+        - Курсорную пагинацию KeysetPagination в порядке ordering
+          (?cursor=..., ?page_size=...)
+        - Выбор полей ответа параметром ?fields=id,category_name
+          (неизвестные поля - ошибка 400)
+        - Быстрый путь для list: строки читаются через values() только для
+          запрошенных полей, без создания экземпляров моделей и без сериализатора
+        - Условные запросы по версиям таблиц version_models (ConditionalResponseMixin)
+
+    Атрибуты:
+        ordering (tuple): Порядок выдачи, последнее поле должно быть уникальным
+            (для отдельного запроса переопределяется методом get_ordering)
+        fields_query_param (str): Имя GET-параметра для выбора полей
+    """
+    ordering = ('id',)
+    pagination_class = KeysetPagination
+    fields_query_param = 'fields'
+
+    def get_ordering(self):
+        return self.ordering
+
+    def get_field_names(self):
+        """
+        Возвращает имена всех полей сериализатора ViewSet.
+        """
+        return list(self.get_serializer_class()().fields)
+
+    def get_requested_fields(self):
+        """
+        Возвращает поля из ?fields= или все поля сериализатора.
+
+        Raises:
+            ValidationError: Если запрошено неизвестное поле
+        """
+        available = self.get_field_names()
+        value = self.request.query_params.get(self.fields_query_param)
+        if not value:
+            return available
+        requested = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise ValidationError({self.fields_query_param: [f'Неизвестные поля: {", ".join(unknown)}']})
+        return requested
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request is not None and self.request.method == 'GET':
+            kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_value_lookups(self, names):
+        """
+        Сопоставляет полям ответа колонки для values(): для внешних ключей - *_id.
+        """
+        model = self.get_serializer_class().Meta.model
+        return {name: model._meta.get_field(name).attname for name in names}
+
+    def get_list_rows(self, lookups):
+        """
+        Возвращает строки списка в виде словарей {колонка: значение}.
+
+        Кроме запрошенных колонок всегда содержит поля ordering для пагинации.
+        """
+        columns = set(lookups.values()) | {field.lstrip('-') for field in self.get_ordering()}
+        return self.filter_queryset(self.get_queryset()).values(*columns)
+
+    def represent(self, row, lookups):
+        data = {}
+        for name, column in lookups.items():
+            value = row[column]
+            # Decimal отдается строкой, как DecimalField сериализатора
+            data[name] = str(value) if isinstance(value, Decimal) else value
+        return data
+
+    def list(self, request, *args, **kwargs):
+        lookups = self.get_value_lookups(self.get_requested_fields())
+        rows = self.get_list_rows(lookups)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response([self.represent(row, lookups) for row in rows])
+        return self.get_paginated_response([self.represent(row, lookups) for row in page])
+
+
+class CachedReferenceMixin:
+    """
+    Миксин для ViewSet справочников: list и retrieve читают данные из reference_cache.
+
+    Фильтрация выполняется в памяти по полям из filterset_fields с теми же
+    параметрами запроса, что и у DjangoFilterBackend (?type=2, ?category=3).
+
+    Асинхронный вариант (AsyncReferenceListView) загружает снимок заранее
+    и сохраняет его в атрибуте references.
+    """
+    references = None
+
+    def get_references(self):
+        return self.references or reference_cache.get()
+
+    def get_cached_objects(self):
+        objects = self.get_references().objects(self.queryset.model)
+        for field in self.filterset_fields:
+            value = self.request.query_params.get(field)
+            if not value:
+                continue
+            if not value.isdigit():
+                raise ValidationError({field: ['Выберите корректный вариант. Вашего варианта нет среди допустимых значений.']})
+            objects = [obj for obj in objects if getattr(obj, f'{field}_id') == int(value)]
+        return objects
+
+    def get_list_rows(self, lookups):
+        columns = set(lookups.values()) | {field.lstrip('-') for field in self.get_ordering()}
+        return [
+            {column: getattr(obj, column) for column in columns}
+            for obj in self.get_cached_objects()
+        ]
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            instance = self.get_references().get(self.queryset.model, int(kwargs[self.lookup_field]))
+        except (KeyError, ValueError):
+            raise Http404
+        self.check_object_permissions(request, instance)
+        return Response(self.get_serializer(instance).data)
+
+
+class CategoryViewSet(CachedReferenceMixin, BaseModelViewSet):
     """
     ViewSet для получения списка категорий (Category)
 
     Особенности:
         - Только чтение
-        - Оптимизированные запросы select_related('type')
+        - Данные из кеша справочников (reference_cache)
+        - ETag / Last-Modified по версии таблицы категорий
         - Фильтрация по типу
     Пример запроса:
         - /category/?type=2
@@ -33,17 +272,19 @@ class CategoryViewSet(ModelViewSet):
     http_method_names = ['get', ]
     queryset = Category.objects.select_related('type').all()
     serializer_class = CategorySerializer
+    version_models = (Category,)
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['type']
 
 
-class SubcategoryViewSet(ModelViewSet):
+class SubcategoryViewSet(CachedReferenceMixin, BaseModelViewSet):
     """
     ViewSet для получения списка подкатегорий (Subcategory)
 
     Особенности:
         - Только чтение
-        - Оптимизированные запросы select_related('category')
+        - Данные из кеша справочников (reference_cache)
+        - ETag / Last-Modified по версии таблицы подкатегорий
         - Фильтрация по категории
     Пример запроса:
         - /subcategory/?category=3
@@ -63,5 +304,284 @@ class SubcategoryViewSet(ModelViewSet):
     http_method_names = ['get', ]
     queryset = Subcategory.objects.select_related('category').all()
     serializer_class = SubcategorySerializer
+    version_models = (Subcategory,)
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['category']
+
+
+class AsyncReferenceListView(View):
+    """
+    Асинхронный вариант list ViewSet справочников для развертывания через ASGI.
+
+    DRF не поддерживает асинхронные представления: под ASGI синхронный ViewSet
+    выполняется через sync_to_async в общем для всех запросов потоке. Это
+    представление читает снимок справочников через reference_cache.aget,
+    а фильтрацию, ?fields=, курсорную пагинацию и ETag выполняет код ViewSet
+    viewset_class - ответ совпадает с ответом ViewSet в формате JSON
+    (без Browsable API).
+
+    Подключается вместо list ViewSet настройкой DDS_ASYNC_VIEWS.
+    """
+    viewset_class = None
+    renderer_format = 'json'
+
+    async def get(self, request, *args, **kwargs):
+        viewset = self.viewset_class(
+            request=Request(request),
+            args=args,
+            kwargs=kwargs,
+            format_kwarg=None,
+            action='list',
+        )
+        states = await sync_to_async(get_table_states)(viewset.version_models)
+        etag, last_modified = conditional_state(states, viewset.version_models, self.renderer_format)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            viewset.references = await reference_cache.aget()
+            try:
+                data = viewset.list(viewset.request).data
+            except APIException as exc:
+                error = exception_handler(exc, {'view': viewset, 'request': viewset.request})
+                return HttpResponse(
+                    JSONRenderer().render(error.data),
+                    status=error.status_code,
+                    content_type='application/json',
+                )
+            response = HttpResponse(JSONRenderer().render(data), content_type='application/json')
+        patch_conditional_headers(response, etag, last_modified)
+        return response
+
+
+class AsyncCategoryListView(AsyncReferenceListView):
+    viewset_class = CategoryViewSet
+
+
+class AsyncSubcategoryListView(AsyncReferenceListView):
+    viewset_class = SubcategoryViewSet
+
+
+class HierarchyViewSet(ConditionalResponseMixin, ViewSet):
+    """
+    ViewSet для получения всего дерева справочников одним запросом.
+
+    Особенности:
+        - Только чтение
+        - Данные из кеша справочников (reference_cache), дерево строится
+          один раз на версию справочников
+        - ETag / Last-Modified по версиям таблиц типов, категорий и подкатегорий
+    Пример ответа /hierarchy/:
+        "id": 2,
+        "type_name": "Списание",
+        "categories": [
+            "id": 1,
+            "category_name": "Маркетинг",
+            "subcategories": [{"id": 1, "subcategory_name": "Farpost"}, ...]
+        ]
+    """
+    version_models = (Type, Category, Subcategory)
+
+    def list(self, request):
+        return Response(reference_cache.get().hierarchy())
+
+
+class CashFlowViewSet(BaseModelViewSet):
+    """
+    ViewSet для операций (CashFlow): чтение, создание, изменение и удаление.
+
+    Особенности:
+        - Фильтрация теми же параметрами, что и на главной странице:
+          date_from, date_to, status, type_obj, category, subcategory
+        - Поиск ?search= по комментарию и названиям справочников (dds.search):
+          результаты упорядочены по релевантности, затем по дате
+        - Курсорная пагинация по (creation_date, id) и выбор полей (?fields=)
+        - Пакетная загрузка: POST /cashflow/bulk/ с JSON-массивом операций,
+          пакетное изменение: PATCH /cashflow/bulk/ с JSON-массивом изменений
+
+    Пример запроса:
+        - /cashflow/?date_from=2024-01-01&type_obj=2
+        - /cashflow/?search=avito&fields=id,comment
+
+    Пакетная загрузка проверяет все строки, выполняя по одному запросу на
+    таблицу справочника, и вставляет их через bulk_create в одной транзакции
+    (изменение - через bulk_update). По умолчанию при ошибке хотя бы в одной
+    строке ничего не сохраняется; с параметром ?partial=true сохраняются корректные строки.
+    Ответ содержит ID созданных операций и ошибки по индексам строк:
+        {"created": [101, 102], "errors": [{"index": 2, "errors": {"category": ["..."]}}]}
+    """
+    serializer_class = CashFlowSerializer
+    ordering = '-creation_date', '-id'
+    search_ordering = 'search_rank', '-creation_date', '-id'
+
+    def is_search(self):
+        return self.action == 'list' and bool(parse_search_terms(self.request.query_params.get(SEARCH_PARAM)))
+
+    def get_ordering(self):
+        return self.search_ordering if self.is_search() else self.ordering
+
+    def get_queryset(self):
+        queryset = filter_cash_flows(CashFlow.objects.all(), self.request.query_params)
+        if self.is_search():
+            queryset = search_cash_flows(queryset, self.request.query_params[SEARCH_PARAM])
+        return queryset
+
+    def get_bulk_rows(self, request):
+        rows = request.data
+        max_rows = getattr(settings, 'DDS_API_BULK_MAX_ROWS', 5000)
+        if not isinstance(rows, list):
+            raise ValidationError({'detail': 'Ожидается JSON-массив операций'})
+        if len(rows) > max_rows:
+            raise ValidationError({'detail': f'Не более {max_rows} операций в одном запросе'})
+        return rows
+
+    def is_partial_bulk(self, request):
+        return request.query_params.get('partial') in ('1', 'true')
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        rows = self.get_bulk_rows(request)
+        lookup = ReferenceLookup()
+        today = timezone.localdate()
+        instances = []
+        errors = []
+        for index, row in enumerate(rows):
+            item = CashFlowBulkItemSerializer(data=row)
+            if not item.is_valid():
+                errors.append({'index': index, 'errors': item.errors})
+                continue
+            data = item.validated_data
+            try:
+                lookup.check_ids(data['status'], data['type'], data['category'], data['subcategory'])
+            except DjangoValidationError as exc:
+                errors.append({'index': index, 'errors': exc.message_dict})
+                continue
+            instances.append(CashFlow(
+                creation_date=data.get('creation_date') or today,
+                status_id=data['status'],
+                type_id=data['type'],
+                category_id=data['category'],
+                subcategory_id=data['subcategory'],
+                amount=data['amount'],
+                comment=data.get('comment') or None,
+            ))
+
+        if errors and not self.is_partial_bulk(request):
+            return Response({'created': [], 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = bulk_insert_cash_flows(instances)
+        return Response(
+            {'created': [obj.pk for obj in created], 'errors': errors},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @bulk.mapping.patch
+    def bulk_update(self, request):
+        """
+        PATCH /cashflow/bulk/: изменение операций JSON-массивом {"id": 101, "amount": "50.00", ...}.
+
+        В строке передаются только изменяемые поля. Операции загружаются одним
+        запросом, справочники итоговых значений проверяются пакетно, изменения
+        записываются через bulk_update в одной транзакции. Ответ:
+            {"updated": [101], "errors": [{"index": 1, "errors": {"id": ["..."]}}]}
+        """
+        rows = self.get_bulk_rows(request)
+        items = {}
+        errors = []
+        for index, row in enumerate(rows):
+            item = CashFlowBulkUpdateItemSerializer(data=row, partial=True)
+            if item.is_valid():
+                items[index] = item.validated_data
+            else:
+                errors.append({'index': index, 'errors': item.errors})
+
+        lookup = ReferenceLookup()
+        with transaction.atomic():
+            existing = CashFlow.objects.in_bulk({data['id'] for data in items.values()})
+            instances = {}
+            dates = set()
+            fields = set()
+            for index, data in items.items():
+                obj = existing.get(data['id'])
+                if obj is None:
+                    errors.append({'index': index, 'errors': {'id': [f'Операция {data["id"]} не существует']}})
+                    continue
+                if obj.pk in instances:
+                    errors.append({'index': index, 'errors': {'id': [f'Операция {obj.pk} указана повторно']}})
+                    continue
+                previous_date = obj.creation_date
+                for name, value in data.items():
+                    if name == 'id':
+                        continue
+                    attname = CashFlow._meta.get_field(name).attname
+                    setattr(obj, attname, (value or None) if name == 'comment' else value)
+                    fields.add(attname)
+                try:
+                    lookup.check_ids(obj.status_id, obj.type_id, obj.category_id, obj.subcategory_id)
+                except DjangoValidationError as exc:
+                    errors.append({'index': index, 'errors': exc.message_dict})
+                    continue
+                dates.add(previous_date)
+                instances[obj.pk] = obj
+
+            errors.sort(key=lambda error: error['index'])
+            if errors and not self.is_partial_bulk(request):
+                return Response({'updated': [], 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+            bulk_save_cash_flows(list(instances.values()), fields, dates)
+        return Response({'updated': list(instances), 'errors': errors})
+
+
+def decimals_to_str(value):
+    """
+    Заменяет Decimal строками, как DecimalField сериализаторов
+    (JSONEncoder DRF преобразовал бы их во float).
+    """
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: decimals_to_str(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decimals_to_str(item) for item in value]
+    return value
+
+
+class ReportAPIView(ConditionalResponseMixin, APIView):
+    """
+    API отчета: суммы и количество операций по периодам и измерениям.
+
+    Параметры:
+        - period: day, week, month, quarter, year (по умолчанию month)
+        - group_by: status, type, category, subcategory через запятую (по умолчанию type)
+        - layout: rows (по умолчанию) или pivot
+        - фильтры главной страницы: date_from, date_to, status, type_obj, category, subcategory
+
+    Пример запроса:
+        - /reports/?period=quarter&group_by=type,category&date_from=2024-01-01
+
+    Ответ layout=rows:
+        {"period": "quarter", "group_by": ["type", "category"], "rows": [
+            {"period": "2024-01-01", "type": 2, "type_name": "Списание",
+             "category": 1, "category_name": "Маркетинг",
+             "total_amount": "125000.00", "operations_count": 17}, ...]}
+    Ответ layout=pivot:
+        {"period": ..., "group_by": ..., "periods": [...], "series": [...], "totals": {...}}
+
+    Отчет кешируется по сигнатуре параметров; ETag / Last-Modified строятся
+    по версиям таблицы дневных итогов и справочников.
+    """
+    version_models = REPORT_VERSION_MODELS
+
+    def get(self, request):
+        try:
+            params = parse_report_params(request.query_params)
+        except ValueError as exc:
+            raise ValidationError({'detail': str(exc)})
+        layout = request.query_params.get('layout') or 'rows'
+        if layout not in ('rows', 'pivot'):
+            raise ValidationError({'layout': ['Допустимые значения: rows, pivot']})
+
+        rows = get_report(**params)
+        data = {'period': params['period'], 'group_by': list(params['group_by'])}
+        if layout == 'pivot':
+            data.update(pivot_report(rows, params['group_by']))
+        else:
+            data['rows'] = rows
+        return Response(decimals_to_str(data))
@@ -5,3 +5,11 @@ class DdsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dds'
     verbose_name = 'Справочники'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks, signals  # noqa: F401
+        from .db import configure_sqlite
+
+        connection_created.connect(configure_sqlite, dispatch_uid='dds_configure_sqlite')
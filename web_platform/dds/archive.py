@@ -0,0 +1,102 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import BooleanField, Value
+
+from .models import ArchivedCashFlow, CashFlow
+from .versions import bump_table_version, get_cache, get_table_version
+
+# Столбцы CashFlow, переносимые в архив, в порядке полей моделей
+ARCHIVE_FIELDS = 'id', 'creation_date', 'status_id', 'type_id', 'category_id', 'subcategory_id', 'amount', 'comment'
+
+# Ограничение на количество параметров запроса (999 в старых версиях SQLite)
+MAX_IDS_PER_QUERY = 500
+
+
+def get_archive_boundary():
+    """
+    Возвращает дату самой поздней операции в архиве или None, если архив пуст.
+
+    Граница кешируется в кеше DDS_CACHE_ALIAS по версии таблицы архива,
+    поэтому главная страница узнает ее без запроса к базе данных.
+    """
+    cache = get_cache()
+    key = f'dds:archive:boundary:{get_table_version(ArchivedCashFlow)}'
+    value = cache.get(key)
+    if value is None:
+        boundary = ArchivedCashFlow.objects.order_by('-creation_date').values_list('creation_date', flat=True).first()
+        value = boundary.isoformat() if boundary else ''
+        cache.set(key, value)
+    return datetime.date.fromisoformat(value) if value else None
+
+
+def reaches_archive(params, boundary):
+    """
+    Проверяет, заходит ли фильтр "Дата с" (date_from) в архив.
+
+    Без date_from (и с некорректной датой) архив не читается: список
+    показывает оперативную таблицу CashFlow.
+
+    Args:
+        params (QueryDict | dict): GET-параметры запроса
+        boundary (date | None): Граница архива (get_archive_boundary)
+    """
+    if boundary is None:
+        return False
+    try:
+        date_from = datetime.date.fromisoformat(params.get('date_from') or '')
+    except ValueError:
+        return False
+    return date_from <= boundary
+
+
+def with_archive(queryset, archive_queryset):
+    """
+    Объединяет queryset операций CashFlow с queryset архива через UNION ALL.
+
+    Столбцы моделей совпадают, аннотации обоих queryset должны совпадать
+    по именам и порядку. Строки возвращаются экземплярами CashFlow
+    с атрибутом archived; связанные объекты не загружаются (select_related
+    в UNION недоступен). К результату применимы только order_by, срезы и count.
+    """
+    queryset = queryset.select_related(None).annotate(archived=Value(False, output_field=BooleanField()))
+    archive_queryset = archive_queryset.annotate(archived=Value(True, output_field=BooleanField()))
+    return queryset.union(archive_queryset, all=True)
+
+
+def archive_cash_flows(before, batch_size=5000, progress=None):
+    """
+    Переносит операции с датой раньше before из CashFlow в ArchivedCashFlow.
+
+    Операции переносятся начиная с самых ранних, отдельными транзакциями
+    по batch_size строк: блокировка базы данных держится только на время
+    одной пачки, прерванный перенос продолжается повторным запуском.
+    Дневные агрегаты и остатки не меняются - операции остаются в учете,
+    меняется только таблица хранения. Полнотекстовый индекс очищается
+    триггерами при удалении строк из CashFlow.
+
+    Args:
+        before (date): Операции с creation_date < before переносятся в архив
+        batch_size (int): Количество операций в пачке
+        progress (callable): Вызывается с количеством перенесенных операций после каждой пачки
+
+    Returns:
+        int: Количество перенесенных операций
+    """
+    source = CashFlow.objects.filter(creation_date__lt=before).order_by('creation_date', 'id')
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(source.select_for_update().values(*ARCHIVE_FIELDS)[:batch_size])
+            if not rows:
+                break
+            ArchivedCashFlow.objects.bulk_create([ArchivedCashFlow(**row) for row in rows])
+            ids = [row['id'] for row in rows]
+            for i in range(0, len(ids), MAX_IDS_PER_QUERY):
+                CashFlow.objects.filter(pk__in=ids[i:i + MAX_IDS_PER_QUERY]).delete()
+            bump_table_version(CashFlow)
+            bump_table_version(ArchivedCashFlow)
+        moved += len(rows)
+        if progress:
+            progress(moved)
+    return moved
@@ -0,0 +1,40 @@
+import math
+import time
+
+
+def percentile(values, pct):
+    """
+    Возвращает перцентиль pct (0-100) списка значений методом ближайшего ранга.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def measure(func, repeat=20, warmup=1):
+    """
+    Замеряет время выполнения func.
+
+    Args:
+        func (callable): Замеряемая функция без аргументов
+        repeat (int): Количество замеров
+        warmup (int): Количество прогревочных вызовов, не попадающих в статистику
+
+    Returns:
+        dict: Время в миллисекундах - p50, p95, max и mean
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'p50': round(percentile(timings, 50), 3),
+        'p95': round(percentile(timings, 95), 3),
+        'max': round(max(timings), 3),
+        'mean': round(sum(timings) / len(timings), 3),
+    }
@@ -0,0 +1,200 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .forms import hierarchy_error
+from .models import (
+    Status,
+    Type,
+    Category,
+    Subcategory,
+    CashFlow,
+    DailyCashFlowAggregate,
+)
+
+
+class ReferenceLookup:
+    """
+    Справочники в памяти для пакетной проверки операций.
+
+    Загружает Status, Type, Category и Subcategory одним запросом на таблицу
+    и проверяет ссылки и иерархию тип -> категория -> подкатегория
+    по тем же правилам, что и CreateCashFlowForm.clean, без запросов на строку.
+
+    Названия категорий и подкатегорий ищутся в пределах родителя, поэтому
+    одинаковые названия в разных ветках иерархии не конфликтуют.
+    """
+
+    def __init__(self):
+        self.statuses = dict(Status.objects.values_list('id', 'status_name'))
+        self.types = dict(Type.objects.values_list('id', 'type_name'))
+        self.categories = {
+            pk: (type_id, name)
+            for pk, type_id, name in Category.objects.values_list('id', 'type_id', 'category_name')
+        }
+        self.subcategories = {
+            pk: (category_id, name)
+            for pk, category_id, name in Subcategory.objects.values_list('id', 'category_id', 'subcategory_name')
+        }
+
+        self.status_by_name = {self._key(name): pk for pk, name in self.statuses.items()}
+        self.type_by_name = {self._key(name): pk for pk, name in self.types.items()}
+        self.category_by_name = {
+            (type_id, self._key(name)): pk for pk, (type_id, name) in self.categories.items()
+        }
+        self.subcategory_by_name = {
+            (category_id, self._key(name)): pk for pk, (category_id, name) in self.subcategories.items()
+        }
+
+    @staticmethod
+    def _key(name):
+        return str(name).strip().casefold()
+
+    def resolve_names(self, status, type_name, category, subcategory):
+        """
+        Преобразует названия справочников в ID.
+
+        Returns:
+            dict: status_id, type_id, category_id, subcategory_id
+
+        Raises:
+            ValidationError: Если название не найдено или нарушена иерархия
+        """
+        status_id = self.status_by_name.get(self._key(status))
+        if status_id is None:
+            raise ValidationError({'status': f'Статус "{status}" не существует'})
+
+        type_id = self.type_by_name.get(self._key(type_name))
+        if type_id is None:
+            raise ValidationError({'type': f'Тип "{type_name}" не существует'})
+
+        category_id = self.category_by_name.get((type_id, self._key(category)))
+        if category_id is None:
+            raise hierarchy_error('category', category, type_name)
+
+        subcategory_id = self.subcategory_by_name.get((category_id, self._key(subcategory)))
+        if subcategory_id is None:
+            raise hierarchy_error('subcategory', subcategory, category)
+
+        return {
+            'status_id': status_id,
+            'type_id': type_id,
+            'category_id': category_id,
+            'subcategory_id': subcategory_id,
+        }
+
+    def check_ids(self, status_id, type_id, category_id, subcategory_id):
+        """
+        Проверяет существование ID справочников и их иерархию.
+
+        Raises:
+            ValidationError: При нарушении правил CreateCashFlowForm.clean
+        """
+        if status_id not in self.statuses:
+            raise ValidationError({'status': 'Выберите существующий статус'})
+
+        if type_id not in self.types:
+            raise ValidationError({'type': 'Выбранный тип не существует'})
+
+        if category_id not in self.categories:
+            raise ValidationError({'category': 'Выбранная категория не существует'})
+
+        if subcategory_id not in self.subcategories:
+            raise ValidationError({'subcategory': 'Выбранная подкатегория не существует'})
+
+        category_type_id, category_name = self.categories[category_id]
+        if category_type_id != type_id:
+            raise hierarchy_error('category', category_name, self.types[type_id])
+
+        subcategory_category_id, subcategory_name = self.subcategories[subcategory_id]
+        if subcategory_category_id != category_id:
+            raise hierarchy_error('subcategory', subcategory_name, category_name)
+
+
+def bulk_insert_cash_flows(instances, batch_size=1000, rebuild=True):
+    """
+    Вставляет операции через bulk_create в одной транзакции.
+
+    bulk_create не вызывает CashFlow.save, поэтому дневные агрегаты
+    затронутых дат пересчитываются в той же транзакции. С rebuild=False
+    пересчет выполняет вызывающий код - например, один раз после всех
+    пачек импорта: пересчет остатков по дням идет от самой ранней даты
+    до конца таблицы, и пересчет на каждую пачку делает импорт квадратичным.
+
+    Returns:
+        list: Созданные объекты CashFlow
+    """
+    if not instances:
+        return []
+    with transaction.atomic():
+        created = CashFlow.objects.bulk_create(instances, batch_size=batch_size)
+        if rebuild:
+            DailyCashFlowAggregate.objects.rebuild(dates={obj.creation_date for obj in instances})
+    return created
+
+
+def bulk_save_cash_flows(instances, fields, dates, batch_size=1000):
+    """
+    Сохраняет измененные операции через bulk_update в одной транзакции.
+
+    bulk_update не вызывает CashFlow.save, поэтому дневные агрегаты
+    пересчитываются по датам операций до изменения (dates) и после него.
+
+    Returns:
+        int: Количество измененных операций
+    """
+    if not instances or not fields:
+        return 0
+    with transaction.atomic():
+        updated = CashFlow.objects.bulk_update(instances, fields, batch_size=batch_size)
+        DailyCashFlowAggregate.objects.rebuild(dates=set(dates) | {obj.creation_date for obj in instances})
+    return updated
+
+
+def _affected_dates(queryset):
+    return set(queryset.order_by().values_list('creation_date', flat=True).distinct())
+
+
+def bulk_update_cash_flows(queryset, **values):
+    """
+    Изменяет операции queryset одним запросом UPDATE ... WHERE.
+
+    QuerySet.update не вызывает CashFlow.save, поэтому дневные агрегаты
+    и остатки затронутых дат пересчитываются в той же транзакции (пересчет
+    увеличивает и версию таблицы операций). Даты читаются до изменения:
+    после смены статуса или категории строки могут больше не подходить
+    под фильтр queryset. Полнотекстовый индекс обновляется триггером.
+
+    Args:
+        queryset (QuerySet): Операции CashFlow, в том числе с фильтрами и поиском
+        **values: Новые значения полей, например status_id=3
+
+    Returns:
+        int: Количество измененных операций
+    """
+    with transaction.atomic():
+        dates = _affected_dates(queryset)
+        if not dates:
+            return 0
+        updated = queryset.update(**values)
+        DailyCashFlowAggregate.objects.rebuild(dates=dates)
+    return updated
+
+
+def bulk_delete_cash_flows(queryset):
+    """
+    Удаляет операции queryset одним запросом DELETE ... WHERE.
+
+    У CashFlow нет обработчиков удаления и каскадно удаляемых объектов,
+    поэтому QuerySet.delete не загружает строки. Дневные агрегаты и остатки
+    затронутых дат пересчитываются в той же транзакции.
+
+    Returns:
+        int: Количество удаленных операций
+    """
+    with transaction.atomic():
+        dates = _affected_dates(queryset)
+        if not dates:
+            return 0
+        _, deleted = queryset.delete()
+        DailyCashFlowAggregate.objects.rebuild(dates=dates)
+    return deleted.get(CashFlow._meta.label, 0)
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Проверяет, что кеш версий таблиц (DDS_CACHE_ALIAS) общий для всех процессов.
+
+    Версии таблиц - ключи инвалидации кеша справочников, отчетов и фрагментов
+    главной страницы. В LocMemCache у каждого процесса свои версии, и процессы,
+    не выполнявшие изменение, продолжают отдавать устаревшие данные.
+    Выполняется командой check --deploy, при DEBUG проверка пропускается.
+    """
+    if settings.DEBUG:
+        return []
+    alias = getattr(settings, 'DDS_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend in LOCAL_CACHE_BACKENDS:
+        return [Error(
+            f'Кеш "{alias}" (DDS_CACHE_ALIAS) использует {backend}: версии таблиц не общие для процессов.',
+            hint='Задайте CACHE_BACKEND=database (и выполните createcachetable) или CACHE_BACKEND=redis.',
+            id='dds.E001',
+        )]
+    return []
@@ -0,0 +1,17 @@
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Применяет DDS_SQLITE_PRAGMAS к каждому новому соединению SQLite.
+
+    Подключается к сигналу connection_created в DdsConfig.ready().
+    Для других СУБД ничего не делает.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'DDS_SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if value not in (None, ''):
+                cursor.execute(f'PRAGMA {name} = {value}')
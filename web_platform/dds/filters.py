@@ -0,0 +1,53 @@
+FILTER_PARAMS = 'date_from', 'date_to', 'status', 'type_obj', 'category', 'subcategory'
+
+
+def filter_cash_flows(queryset, params, date_field='creation_date'):
+    """
+    Применяет к queryset операций фильтры главной страницы.
+
+    Обрабатывает параметры:
+        - date_from: начальная дата (включительно)
+        - date_to: конечная дата (включительно)
+        - status: ID статуса операции
+        - type_obj: ID типа операции
+        - category: ID категории
+        - subcategory: ID подкатегории
+
+    Args:
+        queryset (QuerySet): Исходный queryset CashFlow
+        params (QueryDict | dict): GET-параметры запроса
+        date_field (str): Поле даты в queryset ('date' для DailyCashFlowAggregate)
+
+    Returns:
+        QuerySet: Отфильтрованный queryset
+
+    Note:
+        Фильтрация по ID выполняется только для цифровых значений.
+        Используется IndexView, экспортом, отчетами и API, чтобы фильтры везде совпадали.
+    """
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+    status = params.get('status')
+    type_obj = params.get('type_obj')
+    category = params.get('category')
+    subcategory = params.get('subcategory')
+
+    if date_from:
+        queryset = queryset.filter(**{f'{date_field}__gte': date_from})
+
+    if date_to:
+        queryset = queryset.filter(**{f'{date_field}__lte': date_to})
+
+    if status and status.isdigit():
+        queryset = queryset.filter(status=int(status))
+
+    if type_obj and type_obj.isdigit():
+        queryset = queryset.filter(type=int(type_obj))
+
+    if category and category.isdigit():
+        queryset = queryset.filter(category=int(category))
+
+    if subcategory and subcategory.isdigit():
+        queryset = queryset.filter(subcategory=int(subcategory))
+
+    return queryset
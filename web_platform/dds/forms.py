@@ -1,5 +1,6 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
 
 from .models import (
     Status,
@@ -8,6 +9,84 @@ from .models import (
     Subcategory,
     CashFlow
 )
+from .reference_cache import reference_cache
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    """
+    Итератор вариантов выбора, читающий объекты из кеша справочников вместо queryset.
+    """
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in self.field.get_cached_objects():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.get_cached_objects()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.get_cached_objects())
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField для справочников, работающий через reference_cache.
+
+    Варианты выбора и проверка выбранного значения берутся из снимка
+    справочников, поэтому при прогретом кеше отрисовка и валидация
+    поля не выполняют запросов к базе данных.
+    """
+    iterator = CachedModelChoiceIterator
+
+    def get_cached_objects(self):
+        return reference_cache.get().objects(self.queryset.model)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        try:
+            return reference_cache.get().get(self.queryset.model, int(value))
+        except (KeyError, ValueError, TypeError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+
+def hierarchy_error(field, name, parent_name):
+    """
+    Возвращает ошибку иерархии справочников для поля field ('category' или 'subcategory').
+
+    Общая для форм, API и пакетной проверки (dds.bulk.ReferenceLookup),
+    которая сверяет иерархию по названиям и ID без объектов моделей.
+    """
+    if field == 'category':
+        message = f'Категория "{name}" не принадлежит типу "{parent_name}"'
+    else:
+        message = f'Подкатегория "{name}" не принадлежит категории "{parent_name}"'
+    return ValidationError({field: message})
+
+
+def validate_hierarchy(type_obj, category, subcategory):
+    """
+    Проверяет иерархию Тип -> Категория -> Подкатегория.
+
+    Связи сверяются по *_id, без ленивой загрузки category.type
+    и subcategory.category. Незаполненные значения не проверяются.
+
+    Raises:
+        ValidationError: Если категория не принадлежит типу или подкатегория - категории
+    """
+    if type_obj and category and category.type_id != type_obj.pk:
+        raise hierarchy_error('category', category, type_obj)
+
+    if category and subcategory and subcategory.category_id != category.pk:
+        raise hierarchy_error('subcategory', subcategory, category)
 
 
 class CreateCashFlowForm(forms.ModelForm):
@@ -22,10 +101,22 @@ class CreateCashFlowForm(forms.ModelForm):
     - Проверки соответствия категории выбранному типу операции
     - Проверки соответствия подкатегории выбранной категории
     - Проверки положительности суммы операции
+
+    Существование связанных объектов проверяется один раз, полями
+    CachedModelChoiceField по кешу справочников: повторная проверка
+    ForeignKey.validate при валидации модели отключена через reference_fields.
     """
+    reference_fields = 'status', 'type', 'category', 'subcategory'
+
     class Meta:
         model = CashFlow
         fields = 'status', 'type', 'category', 'subcategory', 'amount', 'comment'
+        field_classes = {
+            'status': CachedModelChoiceField,
+            'type': CachedModelChoiceField,
+            'category': CachedModelChoiceField,
+            'subcategory': CachedModelChoiceField,
+        }
         widgets = {
             'creation_date': forms.DateInput(
                 attrs={
@@ -36,12 +127,24 @@ class CreateCashFlowForm(forms.ModelForm):
             ),
         }
 
+    def _get_validation_exclusions(self):
+        """
+        Исключает справочные поля из валидации модели.
+
+        ForeignKey.validate выполняет по запросу exists() на каждое поле,
+        хотя CachedModelChoiceField уже нашел выбранные объекты.
+        """
+        exclude = super()._get_validation_exclusions()
+        exclude.update(self.reference_fields)
+        return exclude
+
     def clean(self):
         """
         Выполняет комплексную валидацию данных формы.
 
         Проверяет:
         1. Существование всех выбранных связанных объектов в базе данных
+           (выполняется полями CachedModelChoiceField, без запросов к базе данных)
         2. Логическую корректность связей:
            - Категория должна принадлежать выбранному типу
            - Подкатегория должна принадлежать выбранной категории
@@ -55,33 +158,14 @@ class CreateCashFlowForm(forms.ModelForm):
         """
         cleaned_data = super().clean()
 
-        status = cleaned_data.get('status')
         type_obj = cleaned_data.get('type')
         category = cleaned_data.get('category')
         subcategory = cleaned_data.get('subcategory')
         amount = cleaned_data.get('amount')
 
-        if status and not Status.objects.filter(id=status.id).exists():
-            raise ValidationError({'status': 'Выберите существующий статус'})
-
-        if type_obj and not Type.objects.filter(id=type_obj.id).exists():
-            raise ValidationError({'type': 'Выбранный тип не существует'})
-
-        if category and not Category.objects.filter(id=category.id).exists():
-            raise ValidationError({'category': 'Выбранная категория не существует'})
-
-        if subcategory and not Subcategory.objects.filter(id=subcategory.id).exists():
-            raise ValidationError({'subcategory': 'Выбранная подкатегория не существует'})
-
-        if type_obj and category and category.type != type_obj:
-            raise ValidationError({
-                'category': f'Категория "{category}" не принадлежит типу "{type_obj}"'
-            })
-
-        if category and subcategory and subcategory.category != category:
-            raise ValidationError({
-                'subcategory': f'Подкатегория "{subcategory}" не принадлежит категории "{category}"'
-            })
+        # Существование status, type, category и subcategory уже проверено
+        # полями CachedModelChoiceField по кешу справочников
+        validate_hierarchy(type_obj, category, subcategory)
 
         if amount and amount < 0:
             raise ValidationError({
@@ -105,6 +189,118 @@ class UpdateCashFlowForm(CreateCashFlowForm):
         fields = 'creation_date', 'status', 'type', 'category', 'subcategory', 'amount', 'comment'
 
 
+class IdListField(forms.Field):
+    """
+    Список ID из повторяющегося параметра (ids=1&ids=2), без дубликатов.
+    """
+    widget = forms.MultipleHiddenInput
+    default_error_messages = {
+        'invalid': 'Некорректный ID операции',
+        'max_count': 'Можно отметить не более %(max_count)s операций',
+    }
+
+    def __init__(self, *, max_count=None, **kwargs):
+        self.max_count = max_count
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            ids = sorted({int(item) for item in value})
+        except (TypeError, ValueError):
+            raise ValidationError(self.error_messages['invalid'], code='invalid')
+        if self.max_count is not None and len(ids) > self.max_count:
+            raise ValidationError(
+                self.error_messages['max_count'],
+                code='max_count',
+                params={'max_count': self.max_count},
+            )
+        return ids
+
+
+class BulkCashFlowForm(forms.Form):
+    """
+    Форма массового действия над операциями главной страницы.
+
+    Действия:
+        - status: установить статус
+        - category: установить тип, категорию и подкатегорию; иерархия
+          проверяется так же, как в CreateCashFlowForm
+        - delete: удалить операции
+
+    Действие применяется к отмеченным операциям (scope=selected, ids)
+    или ко всем операциям, подходящим под фильтры и поиск главной
+    страницы (scope=filtered). Справочники проверяются по кешу справочников.
+    """
+    ACTION_STATUS = 'status'
+    ACTION_CATEGORY = 'category'
+    ACTION_DELETE = 'delete'
+    ACTIONS = (
+        (ACTION_STATUS, 'Сменить статус'),
+        (ACTION_CATEGORY, 'Сменить категорию'),
+        (ACTION_DELETE, 'Удалить'),
+    )
+    SCOPE_SELECTED = 'selected'
+    SCOPE_FILTERED = 'filtered'
+    SCOPES = (
+        (SCOPE_SELECTED, 'Отмеченные операции'),
+        (SCOPE_FILTERED, 'Все операции по фильтру'),
+    )
+
+    action = forms.ChoiceField(choices=ACTIONS)
+    scope = forms.ChoiceField(choices=SCOPES, initial=SCOPE_SELECTED)
+    # Отмеченные строки одной страницы; ограничение - число параметров запроса в старых SQLite
+    ids = IdListField(required=False, max_count=500)
+    status = CachedModelChoiceField(queryset=Status.objects.all(), required=False)
+    type = CachedModelChoiceField(queryset=Type.objects.all(), required=False)
+    category = CachedModelChoiceField(queryset=Category.objects.all(), required=False)
+    subcategory = CachedModelChoiceField(queryset=Subcategory.objects.all(), required=False)
+
+    def clean(self):
+        """
+        Проверяет, что для действия заполнены нужные поля, а для scope=selected отмечены операции.
+
+        Returns:
+            dict: Валидированные данные формы
+
+        Raises:
+            ValidationError: Если не хватает значений или нарушена иерархия справочников
+        """
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+
+        if cleaned_data.get('scope') == self.SCOPE_SELECTED and 'ids' in cleaned_data and not cleaned_data['ids']:
+            raise ValidationError('Отметьте операции или выберите все операции по фильтру')
+
+        if action == self.ACTION_STATUS and not cleaned_data.get('status'):
+            raise ValidationError({'status': 'Выберите статус'})
+
+        if action == self.ACTION_CATEGORY:
+            missing = {
+                name: 'Обязательное поле'
+                for name in ('type', 'category', 'subcategory')
+                if not cleaned_data.get(name)
+            }
+            if missing:
+                raise ValidationError(missing)
+            validate_hierarchy(cleaned_data['type'], cleaned_data['category'], cleaned_data['subcategory'])
+
+        return cleaned_data
+
+    def get_values(self):
+        """
+        Возвращает значения полей операций для UPDATE выбранного действия.
+        """
+        if self.cleaned_data['action'] == self.ACTION_STATUS:
+            return {'status_id': self.cleaned_data['status'].pk}
+        return {
+            'type_id': self.cleaned_data['type'].pk,
+            'category_id': self.cleaned_data['category'].pk,
+            'subcategory_id': self.cleaned_data['subcategory'].pk,
+        }
+
+
 class CreateStatusForm(forms.ModelForm):
     """
     Форма для создания нового статуса операции в системе ДДС.
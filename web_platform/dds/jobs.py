@@ -0,0 +1,245 @@
+import datetime
+import logging
+import traceback
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import ArchivedCashFlow, CashFlow, CashFlowChange, DailyBalance, DailyCashFlowAggregate, Job
+from .versions import bump_table_version
+
+logger = logging.getLogger('dds.jobs')
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """
+    Декоратор: регистрирует функцию-обработчик задач вида kind.
+
+    Обработчик вызывается как func(job, **job.params) и сообщает прогресс
+    через set_progress. Исключение переводит задачу в статус failed.
+    """
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, description='', **params):
+    """
+    Ставит задачу в очередь.
+
+    Returns:
+        Job: Созданная задача в статусе pending
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f'Неизвестный вид задачи: {kind}')
+    return Job.objects.create(kind=kind, params=params, description=description)
+
+
+def set_progress(job, processed, total=None):
+    """
+    Сохраняет прогресс задачи (и время обновления - признак того, что задача выполняется).
+    """
+    job.processed = processed
+    if total is not None:
+        job.total = total
+    Job.objects.filter(pk=job.pk).update(processed=job.processed, total=job.total, updated_at=timezone.now())
+
+
+def requeue_stale(seconds=None):
+    """
+    Возвращает в очередь задачи running, которые не обновлялись дольше seconds
+    (процесс обработчика был остановлен). Обработчики должны допускать повторный запуск.
+
+    Returns:
+        int: Количество возвращенных задач
+    """
+    if seconds is None:
+        seconds = getattr(settings, 'DDS_JOB_STALE_SECONDS', 300)
+    deadline = timezone.now() - datetime.timedelta(seconds=seconds)
+    return Job.objects.filter(status=Job.RUNNING, updated_at__lt=deadline).update(status=Job.PENDING)
+
+
+def prune_changes(days=None):
+    """
+    Удаляет записи журнала измененных дат (CashFlowChange) старше days дней
+    (по умолчанию DDS_ANALYTICS_CHANGES_DAYS).
+
+    Журнал пополняется при каждом изменении операций, а снимок dds.analytics,
+    который тоже его очищает, обновляется только с DDS_REPORT_BACKEND=analytics,
+    поэтому очистку выполняет и обработчик задач run_jobs. Снимок старше срока
+    хранения строится заново, записи старше этого срока ему не нужны.
+
+    Returns:
+        int: Количество удаленных записей
+    """
+    if days is None:
+        days = getattr(settings, 'DDS_ANALYTICS_CHANGES_DAYS', 30)
+    return CashFlowChange.objects.prune(timezone.now() - datetime.timedelta(days=days))
+
+
+def claim_job():
+    """
+    Забирает первую задачу из очереди, переводя ее в статус running.
+
+    Захват - условный UPDATE по статусу, поэтому одну задачу не заберут
+    два обработчика одновременно.
+
+    Returns:
+        Job | None: Захваченная задача или None, если очередь пуста
+    """
+    while True:
+        job = Job.objects.filter(status=Job.PENDING).order_by('id').first()
+        if job is None:
+            return None
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job.pk, status=Job.PENDING).update(
+            status=Job.RUNNING, started_at=now, updated_at=now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """
+    Выполняет захваченную задачу и сохраняет итоговый статус.
+
+    Returns:
+        bool: True, если задача выполнена без ошибок
+    """
+    try:
+        func = HANDLERS.get(job.kind)
+        if func is None:
+            raise LookupError(f'Неизвестный вид задачи: {job.kind}')
+        func(job, **job.params)
+    except Exception:
+        logger.exception('Задача %s (%s) завершилась ошибкой', job.pk, job.kind)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, error=traceback.format_exc(), finished_at=timezone.now(),
+        )
+        return False
+    Job.objects.filter(pk=job.pk).update(status=Job.DONE, finished_at=timezone.now())
+    logger.info('Задача %s (%s) выполнена', job.pk, job.kind)
+    return True
+
+
+def run_pending(limit=None):
+    """
+    Выполняет задачи из очереди, пока она не опустеет (или не более limit задач).
+
+    Returns:
+        int: Количество выполненных задач
+    """
+    count = 0
+    while limit is None or count < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+def active_delete_job(obj):
+    """
+    Возвращает незавершенную задачу удаления объекта справочника или None.
+    """
+    return (
+        Job.objects.filter(
+            kind='delete_reference',
+            status__in=Job.ACTIVE_STATUSES,
+            params__model=obj._meta.label_lower,
+            params__pk=obj.pk,
+        )
+        .order_by('-id')
+        .first()
+    )
+
+
+def enqueue_delete(obj):
+    """
+    Ставит в очередь удаление объекта справочника, если оно еще не поставлено.
+
+    Returns:
+        Job: Новая или уже выполняющаяся задача удаления
+    """
+    with transaction.atomic():
+        job = active_delete_job(obj)
+        if job is None:
+            job = enqueue(
+                'delete_reference',
+                description=f'Удаление: {obj._meta.verbose_name} "{obj}"',
+                model=obj._meta.label_lower,
+                pk=obj.pk,
+            )
+    return job
+
+
+@handler('delete_reference')
+def delete_reference(job, model, pk, batch_size=None):
+    """
+    Удаляет запись справочника (статус, тип, категорию, подкатегорию) вместе
+    с операциями, отдельными транзакциями по batch_size операций.
+
+    Операции удаляются по дням, начиная с самого раннего: границы пачки
+    выбираются по таблице дневных итогов, а операции пачки (в том числе
+    архивные) удаляются DELETE по диапазону дат вместе с их дневными
+    итогами - отчеты остаются согласованными после каждой пачки,
+    блокировка базы данных держится только на время одной пачки. Остатки по дням пересчитываются
+    только за дни пачки, последующие сдвигаются одним UPDATE. Каскадное удаление самого справочника в конце затрагивает
+    только дочерние справочники.
+
+    Повторный запуск продолжает удаление с оставшихся операций.
+    """
+    model_class = apps.get_model(model)
+    obj = model_class.objects.filter(pk=pk).first()
+    if obj is None:
+        return
+    batch_size = batch_size or getattr(settings, 'DDS_DELETE_BATCH_SIZE', 5000)
+    # Поле CashFlow и DailyCashFlowAggregate совпадает с именем модели справочника
+    field = model_class._meta.model_name
+    cash_flows = CashFlow.objects.filter(**{field: pk})
+    archived = ArchivedCashFlow.objects.filter(**{field: pk})
+    aggregates = DailyCashFlowAggregate.objects.filter(**{field: pk})
+
+    remaining = aggregates.aggregate(count=Sum('operations_count'))['count'] or 0
+    processed = job.processed if job.total else 0
+    set_progress(job, processed, total=processed + remaining)
+
+    days = aggregates.values('date').annotate(count=Sum('operations_count')).order_by('date')
+    while True:
+        # В пачку входит хотя бы один день, поэтому дней не больше batch_size
+        date_from = date_to = None
+        count = 0
+        for row in days[:batch_size]:
+            date_from = date_from or row['date']
+            date_to = row['date']
+            count += row['count']
+            if count >= batch_size:
+                break
+        if date_to is None:
+            break
+        with transaction.atomic():
+            deleted, _ = cash_flows.filter(creation_date__lte=date_to).delete()
+            archived_deleted, _ = archived.filter(creation_date__lte=date_to).delete()
+            deleted += archived_deleted
+            aggregates.filter(date__lte=date_to).delete()
+            CashFlowChange.objects.record(date_from=date_from, date_to=date_to)
+            bump_table_version(CashFlow)
+            bump_table_version(ArchivedCashFlow)
+            bump_table_version(DailyCashFlowAggregate)
+            DailyBalance.objects.rebuild(date_from=date_from, date_to=date_to)
+        processed += deleted
+        set_progress(job, processed)
+
+    with transaction.atomic():
+        # Операции, не отраженные в дневных итогах, и дочерние справочники
+        deleted, _ = cash_flows.delete()
+        obj.delete()
+    set_progress(job, processed + deleted)
@@ -0,0 +1,60 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...archive import archive_cash_flows
+from ...models import ArchivedCashFlow, CashFlow
+
+
+class Command(BaseCommand):
+    """
+    Переносит старые операции из CashFlow в архив (ArchivedCashFlow).
+
+    Граница задается датой (--before) или количеством дней истории, которые
+    остаются в оперативной таблице (--keep-days). Операции переносятся
+    пачками по --batch-size строк, каждая пачка - отдельная транзакция;
+    прерванный перенос продолжается повторным запуском. Дневные агрегаты
+    и остатки по дням не меняются, поэтому отчеты и остатки не зависят
+    от переноса. Главная страница читает архив, только если "Дата с"
+    заходит за его границу.
+
+    Пример:
+        python manage.py archive_cashflows --before 2024-01-01
+        python manage.py archive_cashflows --keep-days 730 --batch-size 10000
+    """
+    help = 'Перенести старые операции ДДС в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Перенести операции раньше этой даты, YYYY-MM-DD')
+        parser.add_argument('--keep-days', type=int, help='Оставить в оперативной таблице операции за N последних дней')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Количество операций в пачке')
+
+    def handle(self, *args, **options):
+        if (options['before'] is None) == (options['keep_days'] is None):
+            raise CommandError('Укажите --before или --keep-days')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        if options['before'] is not None:
+            try:
+                before = datetime.date.fromisoformat(options['before'])
+            except ValueError as exc:
+                raise CommandError(f'Некорректная дата: {exc}')
+        else:
+            if options['keep_days'] < 0:
+                raise CommandError('--keep-days не может быть отрицательным')
+            before = timezone.localdate() - datetime.timedelta(days=options['keep_days'])
+
+        total = CashFlow.objects.filter(creation_date__lt=before).count()
+        self.stdout.write(f'Операций раньше {before}: {total}')
+        started = time.perf_counter()
+
+        def progress(moved):
+            self.stdout.write(f'  перенесено {moved} из {total}')
+
+        moved = archive_cash_flows(before, batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив: {moved} за {time.perf_counter() - started:.1f} с. '
+            f'В оперативной таблице: {CashFlow.objects.count()}, в архиве: {ArchivedCashFlow.objects.count()}'
+        ))
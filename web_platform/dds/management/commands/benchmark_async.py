@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from ...benchmark import percentile
+from ...models import CashFlow
+
+MODES = 'wsgi', 'asgi', 'both'
+
+
+class Command(BaseCommand):
+    """
+    Сравнение синхронных (WSGI) и асинхронных (ASGI, DDS_ASYNC_VIEWS) представлений
+    под параллельной нагрузкой.
+
+    Для каждого адреса (главная страница, глубокая страница, список статусов,
+    категории и подкатегории в API) выполняется --requests запросов при
+    --concurrency одновременных запросах:
+        - wsgi: потоки с django.test.Client - как потоки gunicorn
+        - asgi: задачи asyncio с django.test.AsyncClient - как один процесс uvicorn
+        - both: оба режима в отдельных процессах (DDS_ASYNC_VIEWS=0 и 1)
+          и сравнение результатов
+
+    Выводятся пропускная способность (запросов в секунду) и p50/p95 времени ответа.
+    Замер выполняется внутри процесса, без сетевого стека; для замера
+    развернутого сервера используйте load_test --base-url.
+
+    Пример:
+        python manage.py benchmark_async --concurrency 16 --requests 300
+        python manage.py benchmark_async --mode both --json async.json
+    """
+    help = 'Сравнение синхронных и асинхронных представлений ДДС под нагрузкой'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=MODES, default='both', help='Режим: wsgi, asgi или both')
+        parser.add_argument('--concurrency', type=int, default=8, help='Количество одновременных запросов')
+        parser.add_argument('--requests', type=int, default=200, help='Количество запросов на адрес')
+        parser.add_argument('--deep-page', type=int, default=200, help='Номер глубокой страницы главной')
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency и --requests должны быть положительными')
+        self.options = options
+        if options['mode'] == 'both':
+            report = self._both()
+        else:
+            report = self._run(options['mode'])
+            self._print(report)
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["json_path"]}')
+
+    def _urls(self):
+        sample = CashFlow.objects.order_by('-id').first()
+        if sample is None:
+            raise CommandError('Таблица операций пуста, заполните ее командой seed_dds')
+        return {
+            'index': reverse('dds:index'),
+            'index_deep_page': f'{reverse("dds:index")}?page={self.options["deep_page"]}',
+            'statuses': reverse('dds:statuses'),
+            'api_category': reverse('api-root:category-list'),
+            'api_subcategory': f'{reverse("api-root:subcategory-list")}?category={sample.category_id}',
+        }
+
+    def _run(self, mode):
+        # AsyncClient в Django 4.2 всегда передает Host: testserver
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        report = {
+            'mode': mode,
+            'async_views': getattr(settings, 'DDS_ASYNC_VIEWS', False),
+            'database': connection.vendor,
+            'concurrency': self.options['concurrency'],
+            'urls': {},
+        }
+        if mode == 'asgi' and not report['async_views']:
+            self.stderr.write('DDS_ASYNC_VIEWS выключен: под ASGI замеряются синхронные представления')
+        measure = self._measure_wsgi if mode == 'wsgi' else self._measure_asgi
+        for name, url in self._urls().items():
+            # Прогрев: кеш справочников, шаблоны
+            measure(url, self.options['concurrency'])
+            timings, errors, elapsed = measure(url, self.options['requests'])
+            report['urls'][name] = {
+                'url': url,
+                'count': len(timings),
+                'errors': errors,
+                'rps': round(len(timings) / elapsed, 1) if elapsed else 0,
+                'p50': round(percentile(timings, 50), 2),
+                'p95': round(percentile(timings, 95), 2),
+            }
+        return report
+
+    def _measure_wsgi(self, url, count):
+        local = threading.local()
+        lock = threading.Lock()
+        timings = []
+        errors = 0
+
+        def request(_):
+            nonlocal errors
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.get(url)
+            duration = (time.perf_counter() - started) * 1000
+            with lock:
+                if response.status_code == 200:
+                    timings.append(duration)
+                else:
+                    errors += 1
+
+        def close(_):
+            # Каждый поток открывает собственное соединение с базой данных
+            connections.close_all()
+
+        concurrency = self.options['concurrency']
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            started = time.perf_counter()
+            list(executor.map(request, range(count)))
+            elapsed = time.perf_counter() - started
+            list(executor.map(close, range(concurrency)))
+        return timings, errors, elapsed
+
+    def _measure_asgi(self, url, count):
+        async def run():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(self.options['concurrency'])
+
+            async def request():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.get(url)
+                    return response.status_code, (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(request() for _ in range(count)))
+            return results, time.perf_counter() - started
+
+        results, elapsed = asyncio.run(run())
+        timings = [duration for status, duration in results if status == 200]
+        return timings, len(results) - len(timings), elapsed
+
+    def _both(self):
+        reports = {}
+        for mode, async_views in ('wsgi', '0'), ('asgi', '1'):
+            with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as fh:
+                path = fh.name
+            try:
+                command = [
+                    sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_async',
+                    '--mode', mode,
+                    '--concurrency', str(self.options['concurrency']),
+                    '--requests', str(self.options['requests']),
+                    '--deep-page', str(self.options['deep_page']),
+                    '--json', path,
+                ]
+                # Маршруты выбираются при импорте dds.urls, поэтому каждый режим - в своем процессе
+                env = {**os.environ, 'DDS_ASYNC_VIEWS': async_views}
+                result = subprocess.run(command, env=env, capture_output=True, text=True)
+                if result.returncode:
+                    raise CommandError(f'Замер {mode} завершился ошибкой:\n{result.stderr}')
+                with open(path, encoding='utf-8') as fh:
+                    reports[mode] = json.load(fh)
+            finally:
+                os.unlink(path)
+            self._print(reports[mode])
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n== ASGI относительно WSGI =='))
+        for name, sync_stats in reports['wsgi']['urls'].items():
+            async_stats = reports['asgi']['urls'][name]
+            change = (async_stats['rps'] - sync_stats['rps']) / sync_stats['rps'] * 100 if sync_stats['rps'] else 0
+            self.stdout.write(
+                f'{name:<18} запр/с {sync_stats["rps"]:>8} -> {async_stats["rps"]:>8} ({change:+.0f}%)  '
+                f'p95 {sync_stats["p95"]:>8} -> {async_stats["p95"]:>8} мс'
+            )
+        return reports
+
+    def _print(self, report):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\n== {report["mode"].upper()}, асинхронные представления: '
+            f'{"да" if report["async_views"] else "нет"}, одновременных запросов: {report["concurrency"]} =='
+        ))
+        for name, stats in report['urls'].items():
+            self.stdout.write(
+                f'{name:<18} {stats["count"]:>6} запросов  {stats["rps"]:>8} запр/с  '
+                f'p50 {stats["p50"]:>8} мс  p95 {stats["p95"]:>8} мс  ошибок: {stats["errors"]}'
+            )
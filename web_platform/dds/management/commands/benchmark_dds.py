@@ -0,0 +1,243 @@
+import datetime
+import itertools
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from ...benchmark import measure
+from ...forms import CreateCashFlowForm
+from ...models import CashFlow, Subcategory
+from ...pagination import encode_cursor
+from ...reference_cache import reference_cache
+from ...synthetic import generate_cash_flows
+from ...views import IndexView
+from .benchmark_indexes import HIERARCHY_FILTERS
+
+GROUPS = 'index', 'pagination', 'forms', 'api', 'delete'
+
+
+class Command(BaseCommand):
+    """
+    Набор замеров производительности приложения dds.
+
+    Для каждого размера таблицы из --sizes догенерирует синтетические операции
+    (dds.synthetic) и замеряет сценарии групп:
+        - index: главная страница с каждой комбинацией фильтров и с поиском
+        - pagination: глубокая страница в режимах offset и cursor
+        - forms: валидация формы создания операции
+        - api: списки справочников, дерево, операции и отчет API
+        - delete: страницы подтверждения удаления операции и справочников
+
+    Для каждого сценария записываются количество SQL-запросов (при первом
+    выполнении) и время в миллисекундах - p50, p95, max, mean. Результаты
+    сохраняются в JSON; с --compare выводится изменение p95 и количества
+    запросов относительно предыдущего запуска.
+
+    Размеры только увеличиваются: если в таблице уже больше строк, замер
+    выполняется на фактическом количестве.
+
+    Пример:
+        python manage.py benchmark_dds --sizes 10000,1000000,5000000 --json bench.json
+        python manage.py benchmark_dds --only index,api --repeat 50 --compare bench.json
+    """
+    help = 'Замеры времени и количества запросов страниц, форм и API ДДС'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='',
+                            help='Размеры таблицы операций через запятую (по умолчанию - текущий)')
+        parser.add_argument('--repeat', type=int, default=20, help='Количество замеров на сценарий')
+        parser.add_argument('--deep-page', type=int, default=2000, help='Номер глубокой страницы главной')
+        parser.add_argument('--only', default=','.join(GROUPS), help=f'Группы сценариев: {", ".join(GROUPS)}')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора синтетических данных')
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON-файл')
+        parser.add_argument('--compare', help='JSON предыдущего запуска для сравнения')
+
+    def handle(self, *args, **options):
+        groups = [name.strip() for name in options['only'].split(',') if name.strip()]
+        unknown = set(groups) - set(GROUPS)
+        if unknown:
+            raise CommandError(f'Неизвестные группы: {", ".join(sorted(unknown))}')
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(',') if size.strip())
+        except ValueError:
+            raise CommandError('--sizes: ожидаются целые числа через запятую')
+
+        host = (settings.ALLOWED_HOSTS or ['localhost'])[0].lstrip('.').replace('*', 'localhost')
+        self.client = Client(HTTP_HOST=host)
+        self.options = options
+        results = {'vendor': connection.vendor, 'repeat': options['repeat'], 'runs': []}
+        for size in sizes or [None]:
+            if size is not None:
+                self._ensure_rows(size)
+            rows = CashFlow.objects.count()
+            if not rows:
+                raise CommandError('Таблица операций пуста, укажите --sizes')
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {rows} операций =='))
+            self.sample = CashFlow.objects.order_by('-id').first()
+            scenarios = {}
+            for group in groups:
+                for name, func in getattr(self, f'_{group}_scenarios')():
+                    scenarios[f'{group}:{name}'] = self._measure(func)
+                    self._print(f'{group}:{name}', scenarios[f'{group}:{name}'])
+            results['runs'].append({'rows': rows, 'scenarios': scenarios})
+
+        if options['compare']:
+            self._compare(results, options['compare'])
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["json_path"]}')
+
+    def _ensure_rows(self, size):
+        missing = size - CashFlow.objects.count()
+        if missing > 0:
+            self.stdout.write(f'Генерация {missing} операций...')
+            generate_cash_flows(missing, seed=self.options['seed'] + size)
+
+    def _measure(self, func):
+        # При DEBUG=True журнал запросов ограничен 9000 записями
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        stats = measure(func, repeat=self.options['repeat'], warmup=0)
+        stats['queries'] = len(queries)
+        return stats
+
+    def _get(self, url):
+        def request():
+            response = self.client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: HTTP {response.status_code}')
+            # Потребление тела ответа входит в замер (потоковые ответы, шаблоны)
+            b''.join(response) if response.streaming else response.content
+        return request
+
+    def _index_scenarios(self):
+        sample = self.sample
+        values = {
+            'date_from': (sample.creation_date - datetime.timedelta(days=90)).isoformat(),
+            'date_to': sample.creation_date.isoformat(),
+            'status': sample.status_id,
+            'type_obj': sample.type_id,
+            'category': sample.category_id,
+            'subcategory': sample.subcategory_id,
+        }
+        index = reverse('dds:index')
+        for use_dates, use_status, hierarchy in itertools.product((False, True), (False, True), HIERARCHY_FILTERS):
+            keys = list(hierarchy)
+            if use_status:
+                keys.insert(0, 'status')
+            if use_dates:
+                keys[:0] = ['date_from', 'date_to']
+            query = '&'.join(f'{key}={values[key]}' for key in keys)
+            yield '+'.join(keys) or 'none', self._get(f'{index}?{query}')
+
+        # Поиск по названию подкатегории и по слову комментария (индекс FTS5)
+        words = [reference_cache.get().get(Subcategory, sample.subcategory_id).subcategory_name]
+        if sample.comment:
+            words.append(sample.comment)
+        for word in words:
+            term = word.split()[0]
+            yield f'search={term}', self._get(f'{index}?{urlencode({"search": term})}')
+
+    def _pagination_scenarios(self):
+        index = reverse('dds:index')
+        page = self.options['deep_page']
+        yield f'offset_page_{page}', self._get(f'{index}?page={page}')
+
+        offset = (page - 1) * IndexView.paginate_by
+        row = (
+            CashFlow.objects.order_by('-creation_date', '-id')
+            .values('creation_date', 'id')[offset - 1:offset]
+            .first()
+        )
+        if row is not None:
+            # Курсор последней строки предыдущей страницы - та же позиция, что и ?page=
+            token = encode_cursor(row['creation_date'], row['id'], number=page)
+            yield f'cursor_page_{page}', self._get(f'{index}?cursor={token}')
+
+    def _forms_scenarios(self):
+        sample = self.sample
+        data = {
+            'creation_date': sample.creation_date.isoformat(),
+            'status': sample.status_id,
+            'type': sample.type_id,
+            'category': sample.category_id,
+            'subcategory': sample.subcategory_id,
+            'amount': '1500.00',
+            'comment': 'Замер',
+        }
+
+        def validate():
+            form = CreateCashFlowForm(data=data)
+            if not form.is_valid():
+                raise CommandError(f'Форма не прошла проверку: {form.errors.as_json()}')
+
+        reference_cache.get()
+        yield 'create_form_valid', validate
+
+    def _api_scenarios(self):
+        sample = self.sample
+        yield 'category_list', self._get(reverse('api-root:category-list'))
+        yield 'subcategory_by_category', self._get(
+            f'{reverse("api-root:subcategory-list")}?category={sample.category_id}'
+        )
+        yield 'hierarchy', self._get(reverse('api-root:hierarchy-list'))
+        yield 'cashflow_page', self._get(f'{reverse("api-root:cashflow-list")}?page_size=100')
+        yield 'cashflow_by_type_fields', self._get(
+            f'{reverse("api-root:cashflow-list")}?type_obj={sample.type_id}&fields=id,creation_date,amount'
+        )
+        yield 'cashflow_search', self._get(
+            f'{reverse("api-root:cashflow-list")}?{urlencode({"search": "тест", "fields": "id,comment"})}'
+        )
+        yield 'report_month_by_type', self._get(f'{reverse("api-root:reports")}?period=month&group_by=type')
+
+    def _delete_scenarios(self):
+        sample = self.sample
+        yield 'dds', self._get(reverse('dds:delete_dds', kwargs={'pk': sample.pk}))
+        yield 'status', self._get(reverse('dds:delete_status', kwargs={'pk': sample.status_id}))
+        yield 'type', self._get(reverse('dds:delete_type', kwargs={'pk': sample.type_id}))
+        yield 'category', self._get(reverse('dds:delete_category', kwargs={'pk': sample.category_id}))
+        yield 'subcategory', self._get(reverse('dds:delete_subcategory', kwargs={'pk': sample.subcategory_id}))
+
+    def _print(self, name, stats):
+        self.stdout.write(
+            f'{name:<55} p50 {stats["p50"]:>9.2f} мс  p95 {stats["p95"]:>9.2f} мс  '
+            f'запросов {stats["queries"]:>4}'
+        )
+
+    def _compare(self, results, path):
+        try:
+            with open(path, encoding='utf-8') as fh:
+                previous = json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Не удалось прочитать {path}: {exc}')
+
+        previous_runs = {run['rows']: run['scenarios'] for run in previous.get('runs', [])}
+        for run in results['runs']:
+            before = previous_runs.get(run['rows'])
+            if before is None:
+                self.stdout.write(f'\nВ {path} нет замеров для {run["rows"]} операций')
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n== Сравнение, {run["rows"]} операций =='))
+            for name, stats in run['scenarios'].items():
+                old = before.get(name)
+                if old is None:
+                    continue
+                change = (stats['p95'] - old['p95']) / old['p95'] * 100 if old['p95'] else 0
+                line = (
+                    f'{name:<55} p95 {old["p95"]:>9.2f} -> {stats["p95"]:>9.2f} мс ({change:+.0f}%)  '
+                    f'запросов {old["queries"]} -> {stats["queries"]}'
+                )
+                regressed = change > 20 or stats['queries'] > old['queries']
+                self.stdout.write(self.style.WARNING(line) if regressed else line)
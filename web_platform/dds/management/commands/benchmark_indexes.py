@@ -0,0 +1,156 @@
+import datetime
+import itertools
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from ...benchmark import measure
+from ...models import CashFlow
+from ...synthetic import generate_cash_flows
+from ...views import IndexView
+
+# Индексы, которые существовали до миграции 0004: неявные индексы внешних ключей
+BASELINE_INDEXES = {
+    'bench_cashflow_status_id': 'status_id',
+    'bench_cashflow_type_id': 'type_id',
+    'bench_cashflow_category_id': 'category_id',
+    'bench_cashflow_subcategory_id': 'subcategory_id',
+}
+
+HIERARCHY_FILTERS = (
+    (),
+    ('type_obj',),
+    ('category',),
+    ('subcategory',),
+    ('type_obj', 'category'),
+    ('type_obj', 'category', 'subcategory'),
+)
+
+
+class Command(BaseCommand):
+    """
+    Сравнивает планы и время запросов IndexView до и после составных индексов.
+
+    Для каждой комбинации фильтров IndexView (период, статус, тип/категория/
+    подкатегория) строит queryset через IndexView.get_queryset и замеряет:
+        - first_page: выборку первой страницы
+        - count: COUNT(*) для пагинатора
+        - deep_page: выборку страницы со смещением --deep-offset
+
+    Режим baseline выполняется в транзакции, которая откатывается: индексы
+    модели CashFlow удаляются и вместо них создаются одиночные индексы внешних
+    ключей, как до миграции 0004.
+
+    Пример:
+        python manage.py benchmark_indexes --rows 5000000 --repeat 30 --json bench.json
+    """
+    help = 'EXPLAIN-планы и p95 запросов IndexView до и после составных индексов CashFlow'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0,
+                            help='Догенерировать синтетические операции до указанного количества')
+        parser.add_argument('--repeat', type=int, default=20, help='Количество замеров на запрос')
+        parser.add_argument('--deep-offset', type=int, default=10000, help='Смещение для глубокой страницы')
+        parser.add_argument('--only', choices=['baseline', 'indexed'], help='Выполнить только один режим')
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        existing = CashFlow.objects.count()
+        if options['rows'] > existing:
+            missing = options['rows'] - existing
+            self.stdout.write(f'Генерация {missing} операций...')
+            generate_cash_flows(
+                missing,
+                progress=lambda done: self.stdout.write(f'  {done}/{missing}') if done % 500000 == 0 else None,
+            )
+
+        sample = CashFlow.objects.order_by('-id').values(
+            'status_id', 'type_id', 'category_id', 'subcategory_id', 'creation_date',
+        ).first()
+        if sample is None:
+            raise CommandError('Таблица операций пуста, укажите --rows')
+
+        modes = [options['only']] if options['only'] else ['baseline', 'indexed']
+        results = {'rows': CashFlow.objects.count(), 'vendor': connection.vendor, 'modes': {}}
+        for mode in modes:
+            if mode == 'baseline':
+                results['modes'][mode] = self._run_baseline(sample, options)
+            else:
+                results['modes'][mode] = self._run(sample, options)
+
+        self._print(results)
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, ensure_ascii=False, indent=2)
+
+    def _run_baseline(self, sample, options):
+        """
+        Выполняет замеры с индексами, существовавшими до миграции 0004.
+        """
+        quote = connection.ops.quote_name
+        table = quote(CashFlow._meta.db_table)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for index in CashFlow._meta.indexes:
+                    cursor.execute(f'DROP INDEX {quote(index.name)}')
+                for name, column in BASELINE_INDEXES.items():
+                    cursor.execute(f'CREATE INDEX {quote(name)} ON {table} ({quote(column)})')
+            result = self._run(sample, options)
+            transaction.set_rollback(True)
+        return result
+
+    def _run(self, sample, options):
+        if connection.vendor == 'sqlite':
+            # Без статистики sqlite_stat1 планировщик SQLite часто выбирает не тот индекс
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        values = {
+            'date_from': (sample['creation_date'] - datetime.timedelta(days=90)).isoformat(),
+            'date_to': sample['creation_date'].isoformat(),
+            'status': str(sample['status_id']),
+            'type_obj': str(sample['type_id']),
+            'category': str(sample['category_id']),
+            'subcategory': str(sample['subcategory_id']),
+        }
+        factory = RequestFactory()
+        per_page = IndexView.paginate_by
+        offset = options['deep_offset']
+        report = []
+
+        for use_dates, use_status, hierarchy in itertools.product((False, True), (False, True), HIERARCHY_FILTERS):
+            keys = list(hierarchy)
+            if use_status:
+                keys.insert(0, 'status')
+            if use_dates:
+                keys[:0] = ['date_from', 'date_to']
+            params = {key: values[key] for key in keys}
+
+            view = IndexView()
+            view.setup(factory.get('/', params))
+            queryset = view.get_queryset()
+
+            report.append({
+                'filters': '+'.join(keys) or 'none',
+                'plan': queryset[:per_page].explain(),
+                'first_page': measure(lambda: list(queryset[:per_page]), repeat=options['repeat']),
+                'count': measure(queryset.count, repeat=options['repeat']),
+                'deep_page': measure(lambda: list(queryset[offset:offset + per_page]), repeat=options['repeat']),
+            })
+        return report
+
+    def _print(self, results):
+        self.stdout.write(f"Строк: {results['rows']}, СУБД: {results['vendor']}")
+        for mode, report in results['modes'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {mode} =='))
+            for item in report:
+                self.stdout.write(
+                    f"{item['filters']:<50} "
+                    f"page p95={item['first_page']['p95']:>9.2f}ms  "
+                    f"count p95={item['count']['p95']:>9.2f}ms  "
+                    f"deep p95={item['deep_page']['p95']:>9.2f}ms"
+                )
+                for line in item['plan'].splitlines():
+                    self.stdout.write(f'    {line}')
@@ -0,0 +1,227 @@
+import csv
+import datetime
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from ...bulk import ReferenceLookup, bulk_insert_cash_flows
+from ...models import CashFlow, DailyCashFlowAggregate
+
+FIELDS = 'creation_date', 'status', 'type', 'category', 'subcategory', 'amount', 'comment'
+REQUIRED_FIELDS = 'status', 'type', 'category', 'subcategory', 'amount'
+DATE_FORMATS = '%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y'
+
+
+def read_csv(path, encoding, delimiter):
+    """
+    Построчно читает CSV-файл, не загружая его в память целиком.
+    """
+    with open(path, newline='', encoding=encoding) as fh:
+        yield from csv.reader(fh, delimiter=delimiter)
+
+
+def read_xlsx(path):
+    """
+    Построчно читает первый лист XLSX-файла в режиме read_only.
+
+    Raises:
+        CommandError: Если не установлен openpyxl
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise CommandError('Для импорта XLSX установите пакет openpyxl: pip install openpyxl')
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def parse_date(value):
+    if value in (None, ''):
+        return timezone.localdate()
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    value = str(value).strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValidationError({'creation_date': f'Некорректная дата: {value}'})
+
+
+def parse_amount(value):
+    try:
+        amount = Decimal(str(value).replace('\xa0', '').replace(' ', '').replace(',', '.'))
+    except InvalidOperation:
+        raise ValidationError({'amount': f'Некорректная сумма: {value}'})
+    if not amount.is_finite():
+        raise ValidationError({'amount': f'Некорректная сумма: {value}'})
+    if amount < 0:
+        raise ValidationError({'amount': f'Сумма должна быть положительной: {amount}'})
+    return amount.quantize(Decimal('0.01'))
+
+
+class Command(BaseCommand):
+    """
+    Потоковый импорт операций ДДС из CSV или XLSX.
+
+    Первая строка файла - заголовок. Допустимые названия колонок - имена полей
+    CashFlow (creation_date, status, type, category, subcategory, amount, comment)
+    или их verbose_name ("Дата создания", "Статус операции" и т.д.).
+    Справочники указываются названиями.
+
+    Файл читается построчно, строки проверяются по справочникам в памяти
+    (ReferenceLookup) и записываются пачками через bulk_create, каждая пачка -
+    в своей транзакции. Дневные агрегаты и остатки пересчитываются один раз
+    в конце импорта (в том числе при его прерывании) по датам записанных
+    операций; до этого отчеты и остатки не учитывают импортируемые строки.
+
+    --on-error skip (по умолчанию) пропускает некорректные строки, их
+    с причиной можно сохранить в CSV (--rejects). --on-error abort
+    выполняет импорт в одной транзакции и отменяет его на первой
+    некорректной строке.
+
+    Пример:
+        python manage.py import_cashflows statement.csv --batch-size 5000 --rejects rejects.csv
+        python manage.py import_cashflows statement.xlsx --on-error abort
+    """
+    help = 'Импорт операций ДДС из CSV/XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к CSV или XLSX файлу')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], help='Формат файла (по умолчанию - по расширению)')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Кодировка CSV')
+        parser.add_argument('--delimiter', default=',', help='Разделитель CSV')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Количество строк в транзакции')
+        parser.add_argument('--rejects', help='CSV-файл для отклоненных строк')
+        parser.add_argument(
+            '--on-error',
+            choices=['skip', 'abort'],
+            default='skip',
+            help='skip - пропускать некорректные строки, abort - отменить импорт на первой из них',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить файл, ничего не записывая')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'Файл не найден: {path}')
+
+        file_format = options['format'] or path.suffix.lower().lstrip('.')
+        if file_format == 'xlsx':
+            rows = read_xlsx(path)
+        elif file_format == 'csv':
+            rows = read_csv(path, options['encoding'], options['delimiter'])
+        else:
+            raise CommandError('Неизвестный формат файла, укажите --format')
+
+        columns = self._map_header(next(rows, None))
+        lookup = ReferenceLookup()
+        rejects_file = rejects_writer = None
+        if options['rejects']:
+            rejects_file = open(options['rejects'], 'w', newline='', encoding='utf-8')
+            rejects_writer = csv.writer(rejects_file)
+            rejects_writer.writerow(['line', 'error', *FIELDS])
+
+        started = time.perf_counter()
+        dates = set()
+        try:
+            if options['on_error'] == 'abort':
+                with transaction.atomic():
+                    imported, rejected = self._import(rows, columns, lookup, rejects_writer, options, dates, started)
+                    self._rebuild(dates)
+            else:
+                try:
+                    imported, rejected = self._import(rows, columns, lookup, rejects_writer, options, dates, started)
+                finally:
+                    # Пачки уже зафиксированы: агрегаты пересчитываются и при прерывании импорта
+                    self._rebuild(dates)
+        finally:
+            if rejects_file:
+                rejects_file.close()
+
+        self._report(imported, rejected, started, final=True)
+
+    def _import(self, rows, columns, lookup, rejects_writer, options, dates, started):
+        imported = rejected = 0
+        batch = []
+        for line, row in enumerate(rows, start=2):
+            if not any(cell not in (None, '') for cell in row):
+                continue
+            values = {field: row[index] if index < len(row) else None for field, index in columns.items()}
+            try:
+                batch.append(self._build(values, lookup))
+            except ValidationError as exc:
+                rejected += 1
+                if rejects_writer:
+                    rejects_writer.writerow([line, '; '.join(exc.messages), *(values.get(f) for f in FIELDS)])
+                if options['on_error'] == 'abort':
+                    raise CommandError(f'Строка {line}: {"; ".join(exc.messages)}. Импорт отменен')
+                continue
+
+            if len(batch) >= options['batch_size']:
+                imported += self._flush(batch, options, dates)
+                batch = []
+                self._report(imported, rejected, started)
+        imported += self._flush(batch, options, dates)
+        return imported, rejected
+
+    def _map_header(self, header):
+        if not header:
+            raise CommandError('Файл пуст')
+        aliases = {}
+        for field in FIELDS:
+            aliases[field] = field
+            aliases[str(CashFlow._meta.get_field(field).verbose_name).casefold()] = field
+
+        columns = {}
+        for index, title in enumerate(header):
+            field = aliases.get(str(title or '').strip().casefold())
+            if field:
+                columns[field] = index
+
+        missing = [field for field in REQUIRED_FIELDS if field not in columns]
+        if missing:
+            raise CommandError(f'В заголовке нет колонок: {", ".join(missing)}')
+        return columns
+
+    def _build(self, values, lookup):
+        for field in REQUIRED_FIELDS:
+            if values.get(field) in (None, ''):
+                raise ValidationError({field: 'Обязательное поле'})
+        ids = lookup.resolve_names(values['status'], values['type'], values['category'], values['subcategory'])
+        comment = values.get('comment')
+        return CashFlow(
+            creation_date=parse_date(values.get('creation_date')),
+            amount=parse_amount(values['amount']),
+            comment=str(comment)[:150] if comment not in (None, '') else None,
+            **ids,
+        )
+
+    def _flush(self, batch, options, dates):
+        if options['dry_run']:
+            return len(batch)
+        created = bulk_insert_cash_flows(batch, batch_size=options['batch_size'], rebuild=False)
+        dates.update(obj.creation_date for obj in created)
+        return len(created)
+
+    def _rebuild(self, dates):
+        if dates:
+            DailyCashFlowAggregate.objects.rebuild(dates=dates)
+
+    def _report(self, imported, rejected, started, final=False):
+        elapsed = time.perf_counter() - started
+        rate = (imported + rejected) / elapsed if elapsed else 0
+        message = f'Импортировано: {imported}, отклонено: {rejected}, {rate:.0f} строк/с, {elapsed:.1f} с'
+        self.stdout.write(self.style.SUCCESS(message) if final else message)
@@ -0,0 +1,191 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from ...benchmark import percentile
+from ...models import CashFlow, DailyCashFlowAggregate
+from ...synthetic import ensure_reference_data
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочный тест: параллельное создание и чтение операций.
+
+    Каждый поток в течение --duration секунд выполняет запросы:
+        - create: POST /api/cashflow/ (доля --write-ratio)
+        - list: GET главной страницы с фильтром по типу
+    и записывает время ответа и ошибки. В конце выводится пропускная
+    способность (запросов в секунду) и p50/p95 времени ответа по каждому виду запросов.
+
+    По умолчанию запросы выполняются внутри процесса через django.test.Client -
+    каждый поток со своим соединением с базой данных, как потоки gunicorn.
+    С --base-url запросы отправляются по HTTP на запущенный сервер.
+
+    Созданные операции удаляются после теста (кроме режима --base-url и --keep).
+
+    Пример:
+        python manage.py load_test --workers 8 --duration 20 --write-ratio 0.3
+        DB_ENGINE=postgres python manage.py load_test --workers 16 --json pg.json
+        python manage.py load_test --sqlite-default   # без WAL, для сравнения
+    """
+    help = 'Нагрузочный тест создания и чтения операций ДДС'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Количество параллельных потоков')
+        parser.add_argument('--duration', type=float, default=10, help='Длительность теста, секунд')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Доля запросов на создание (0-1)')
+        parser.add_argument('--base-url', help='Адрес запущенного сервера, например http://127.0.0.1:8000')
+        parser.add_argument('--sqlite-default', action='store_true',
+                            help='SQLite с настройками по умолчанию: journal_mode=DELETE, synchronous=FULL, '
+                                 'ожидание блокировки 5 с')
+        parser.add_argument('--keep', action='store_true', help='Не удалять созданные операции')
+        parser.add_argument('--seed', type=int, help='Зерно генератора случайных чисел')
+        parser.add_argument('--json', help='Сохранить результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['write_ratio'] <= 1:
+            raise CommandError('--write-ratio должен быть в диапазоне 0-1')
+
+        if options['sqlite_default']:
+            if connection.vendor != 'sqlite':
+                raise CommandError('--sqlite-default применим только к SQLite')
+            # Настройки читаются при открытии каждого соединения (dds.db.configure_sqlite)
+            settings.DDS_SQLITE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000}
+            connection.close()
+
+        status_ids, leaves = ensure_reference_data()
+        self.status_ids = status_ids
+        self.leaves = leaves
+        self.options = options
+        self.host = (settings.ALLOWED_HOSTS or ['localhost'])[0].lstrip('.').replace('*', 'localhost')
+        self.deadline = time.perf_counter() + options['duration']
+        self.results = {'create': [], 'list': []}
+        self.errors = {'create': 0, 'list': 0}
+        self.created_ids = []
+        self.lock = threading.Lock()
+
+        threads = [
+            threading.Thread(target=self._worker, args=(index,))
+            for index in range(options['workers'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        report = self._report(elapsed)
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["json"]}')
+
+        if self.created_ids and not options['keep']:
+            self._cleanup()
+
+    def _worker(self, index):
+        seed = self.options['seed']
+        rng = random.Random(None if seed is None else seed + index)
+        client = None if self.options['base_url'] else Client(HTTP_HOST=self.host)
+        try:
+            while time.perf_counter() < self.deadline:
+                kind = 'create' if rng.random() < self.options['write_ratio'] else 'list'
+                started = time.perf_counter()
+                try:
+                    ok, pk = self._create(client, rng) if kind == 'create' else self._list(client, rng)
+                except Exception:
+                    ok, pk = False, None
+                duration = (time.perf_counter() - started) * 1000
+                with self.lock:
+                    if ok:
+                        self.results[kind].append(duration)
+                        if pk is not None:
+                            self.created_ids.append(pk)
+                    else:
+                        self.errors[kind] += 1
+        finally:
+            # Каждый поток открывает собственное соединение с базой данных
+            connections.close_all()
+
+    def _create(self, client, rng):
+        type_id, category_id, subcategory_id = rng.choice(self.leaves)
+        payload = {
+            'status': rng.choice(self.status_ids),
+            'type': type_id,
+            'category': category_id,
+            'subcategory': subcategory_id,
+            'amount': f'{rng.uniform(100, 50000):.2f}',
+            'comment': 'Нагрузочный тест',
+        }
+        status, data = self._request(client, 'POST', reverse('api-root:cashflow-list'), payload)
+        return status == 201, data.get('id') if status == 201 else None
+
+    def _list(self, client, rng):
+        type_id = rng.choice(self.leaves)[0]
+        status, _ = self._request(client, 'GET', f'{reverse("dds:index")}?type_obj={type_id}')
+        return status == 200, None
+
+    def _request(self, client, method, path, payload=None):
+        if client is not None:
+            if method == 'POST':
+                response = client.post(path, payload, content_type='application/json')
+                return response.status_code, response.json() if response.status_code == 201 else {}
+            response = client.get(path)
+            return response.status_code, {}
+
+        request = urllib.request.Request(
+            self.options['base_url'].rstrip('/') + path,
+            data=json.dumps(payload).encode() if payload is not None else None,
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
+            method=method,
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                body = response.read()
+                is_json = response.headers.get_content_type() == 'application/json'
+                return response.status, json.loads(body) if is_json else {}
+        except urllib.error.HTTPError as exc:
+            return exc.code, {}
+
+    def _report(self, elapsed):
+        report = {
+            'database': connection.vendor,
+            'pragmas': getattr(settings, 'DDS_SQLITE_PRAGMAS', None) if connection.vendor == 'sqlite' else None,
+            'workers': self.options['workers'],
+            'duration': round(elapsed, 2),
+            'requests': {},
+        }
+        self.stdout.write(f'База данных: {connection.vendor}, потоков: {self.options["workers"]}, {elapsed:.1f} с')
+        for kind, timings in self.results.items():
+            stats = {
+                'count': len(timings),
+                'errors': self.errors[kind],
+                'rps': round(len(timings) / elapsed, 1) if elapsed else 0,
+                'p50': round(percentile(timings, 50), 2),
+                'p95': round(percentile(timings, 95), 2),
+            }
+            report['requests'][kind] = stats
+            self.stdout.write(
+                f'{kind:<7} {stats["count"]:>7} запросов  {stats["rps"]:>8} запр/с  '
+                f'p50 {stats["p50"]:>8} мс  p95 {stats["p95"]:>8} мс  ошибок: {stats["errors"]}'
+            )
+        return report
+
+    def _cleanup(self):
+        ids = self.created_ids
+        for start in range(0, len(ids), 500):
+            CashFlow.objects.filter(pk__in=ids[start:start + 500]).delete()
+        # Операции создавались текущей датой, удаление в обход CashFlow.delete
+        DailyCashFlowAggregate.objects.rebuild(dates=[timezone.localdate()])
+        self.stdout.write(f'Удалено созданных операций: {len(ids)}')
@@ -0,0 +1,43 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import DailyCashFlowAggregate
+
+
+class Command(BaseCommand):
+    """
+    Пересчитывает таблицу дневных агрегатов операций из таблиц CashFlow
+    и ArchivedCashFlow (архив операций).
+
+    Используется после массовых изменений в обход ORM, для восстановления
+    агрегатов и для проверки инкрементального обновления.
+
+    Пример:
+        python manage.py rebuild_cashflow_aggregates
+        python manage.py rebuild_cashflow_aggregates --date-from 2024-01-01 --date-to 2024-12-31
+    """
+    help = 'Пересчитать дневные агрегаты операций ДДС'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='Начальная дата (включительно), YYYY-MM-DD')
+        parser.add_argument('--date-to', help='Конечная дата (включительно), YYYY-MM-DD')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+
+    def handle(self, *args, **options):
+        try:
+            date_from = options['date_from'] and datetime.date.fromisoformat(options['date_from'])
+            date_to = options['date_to'] and datetime.date.fromisoformat(options['date_to'])
+        except ValueError as exc:
+            raise CommandError(f'Некорректная дата: {exc}')
+
+        started = time.perf_counter()
+        created = DailyCashFlowAggregate.objects.rebuild(
+            date_from=date_from,
+            date_to=date_to,
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк агрегатов: {created} за {time.perf_counter() - started:.1f} с'
+        ))
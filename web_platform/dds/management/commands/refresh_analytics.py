@@ -0,0 +1,46 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from ...analytics import get_snapshot_dir, refresh_snapshot
+
+
+class Command(BaseCommand):
+    """
+    Строит или обновляет столбцовый снимок операций для dds.analytics.
+
+    По умолчанию снимок обновляется инкрементально: дописываются операции
+    с ID больше водяного знака, а даты из журнала изменений CashFlowChange
+    и дни, итоги которых разошлись с таблицей дневных агрегатов, перечитываются
+    целиком.
+    --full строит снимок заново. Отчеты с DDS_REPORT_BACKEND = 'analytics'
+    обновляют снимок сами при изменении данных; команда нужна для первого
+    построения и для обновления по расписанию, чтобы не обновлять снимок
+    в запросе пользователя.
+
+    Пример:
+        python manage.py refresh_analytics
+        python manage.py refresh_analytics --full --dir /var/lib/dds/analytics
+    """
+    help = 'Обновить столбцовый снимок операций ДДС (dds.analytics)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Построить снимок заново')
+        parser.add_argument('--dir', help='Каталог снимка (по умолчанию DDS_ANALYTICS_DIR)')
+
+    def handle(self, *args, **options):
+        root = options['dir'] or get_snapshot_dir()
+        started = time.perf_counter()
+        try:
+            snapshot, stats = refresh_snapshot(root, full=options['full'])
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+        mode = 'построен заново' if stats['full'] else (
+            f'обновлен: добавлено {stats["appended"]}, перечитано дней {stats["reloaded_dates"]}, '
+            f'диапазонов {stats["reloaded_ranges"]}'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Снимок {mode} за {time.perf_counter() - started:.2f} с. '
+            f'Операций: {len(snapshot)}, каталог: {snapshot.path}'
+        ))
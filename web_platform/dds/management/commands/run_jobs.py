@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ...jobs import claim_job, prune_changes, requeue_stale, run_job
+
+# Интервал очистки журнала измененных дат, секунд
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    """
+    Обработчик фоновых задач из очереди в базе данных (модель Job).
+
+    Забирает задачи по одной в порядке постановки и выполняет их; при пустой
+    очереди опрашивает базу данных раз в --interval секунд. Можно запускать
+    несколько обработчиков: задача захватывается условным UPDATE.
+
+    Задачи, прерванные остановкой обработчика, возвращаются в очередь
+    через DDS_JOB_STALE_SECONDS после последнего обновления прогресса.
+    Раз в час (и при запуске) удаляются записи журнала измененных дат
+    старше DDS_ANALYTICS_CHANGES_DAYS (jobs.prune_changes).
+
+    Пример:
+        python manage.py run_jobs
+        python manage.py run_jobs --once   # выполнить очередь и завершиться (cron)
+    """
+    help = 'Выполнять фоновые задачи ДДС из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2, help='Интервал опроса очереди, секунд')
+        parser.add_argument('--once', action='store_true', help='Выполнить задачи из очереди и завершиться')
+        parser.add_argument('--max-jobs', type=int, help='Завершиться после выполнения указанного количества задач')
+
+    def handle(self, *args, **options):
+        processed = 0
+        pruned_at = None
+        try:
+            while options['max_jobs'] is None or processed < options['max_jobs']:
+                close_old_connections()
+                if pruned_at is None or time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                    pruned = prune_changes()
+                    pruned_at = time.monotonic()
+                    if pruned:
+                        self.stdout.write(f'Удалено записей журнала изменений: {pruned}')
+                requeued = requeue_stale()
+                if requeued:
+                    self.stdout.write(f'Возвращено в очередь прерванных задач: {requeued}')
+                job = claim_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+
+                self.stdout.write(f'Задача {job.pk}: {job.description or job.kind}')
+                started = time.perf_counter()
+                ok = run_job(job)
+                job.refresh_from_db()
+                message = f'Задача {job.pk}: {job.get_status_display()} за {time.perf_counter() - started:.1f} с'
+                self.stdout.write(self.style.SUCCESS(message) if ok else self.style.ERROR(message))
+                processed += 1
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Выполнено задач: {processed}')
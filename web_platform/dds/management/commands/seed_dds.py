@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ...models import CashFlow, DailyCashFlowAggregate
+from ...synthetic import ensure_reference_data, generate_cash_flows
+
+
+class Command(BaseCommand):
+    """
+    Заполняет базу синтетическими данными ДДС.
+
+    Создает справочники (статусы, типы, категории, подкатегории) из
+    dds.synthetic.HIERARCHY, если их еще нет, и --rows операций через
+    bulk_create пачками по --batch-size строк. Дневные агрегаты
+    пересчитываются после вставки.
+
+    Пример:
+        python manage.py seed_dds --rows 1000000
+        python manage.py seed_dds --rows 5000000 --total --seed 42
+        python manage.py seed_dds --rows 10000 --flush
+    """
+    help = 'Сгенерировать синтетические справочники и операции ДДС'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, required=True, help='Количество операций')
+        parser.add_argument('--total', action='store_true',
+                            help='--rows - итоговое количество операций в таблице, создаются недостающие')
+        parser.add_argument('--flush', action='store_true', help='Предварительно удалить все операции')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Размер пачки bulk_create')
+        parser.add_argument('--years', type=int, default=5, help='Глубина истории в годах')
+        parser.add_argument('--seed', type=int, help='Зерно генератора для воспроизводимых данных')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 0:
+            raise CommandError('--rows не может быть отрицательным')
+
+        if options['flush']:
+            with transaction.atomic():
+                DailyCashFlowAggregate.objects.all().delete()
+                deleted = CashFlow.objects.all().delete()[0]
+            self.stdout.write(f'Удалено операций: {deleted}')
+
+        rows = options['rows']
+        if options['total']:
+            rows = max(rows - CashFlow.objects.count(), 0)
+
+        ensure_reference_data()
+        started = time.perf_counter()
+        step = max(rows // 10, options['batch_size'])
+
+        def progress(done):
+            if done % step < options['batch_size'] or done == rows:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'  {done}/{rows}, {done / elapsed:.0f} строк/с')
+
+        created = generate_cash_flows(
+            rows,
+            batch_size=options['batch_size'],
+            years=options['years'],
+            seed=options['seed'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано операций: {created} за {time.perf_counter() - started:.1f} с, '
+            f'всего в таблице: {CashFlow.objects.count()}'
+        ))
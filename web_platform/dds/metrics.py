@@ -0,0 +1,96 @@
+import bisect
+import threading
+from collections import defaultdict
+
+# Границы корзин гистограмм: время в секундах и количество запросов
+DURATION_BUCKETS = 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+QUERY_BUCKETS = 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000
+
+
+class Histogram:
+    """
+    Гистограмма в формате Prometheus: накопительные корзины, сумма и количество.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Метрики запросов процесса: гистограммы времени ответа, времени в базе данных
+    и количества SQL-запросов, счетчик повторяющихся запросов - в разрезе
+    представления и HTTP-метода.
+
+    Метрики хранятся в памяти процесса: при нескольких процессах (gunicorn workers)
+    каждый отдает свои значения, суммирование выполняет Prometheus.
+    """
+    metrics = (
+        ('dds_request_duration_seconds', 'Время обработки запроса', DURATION_BUCKETS),
+        ('dds_request_db_duration_seconds', 'Время выполнения SQL-запросов за запрос', DURATION_BUCKETS),
+        ('dds_request_queries', 'Количество SQL-запросов за запрос', QUERY_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._histograms = {
+                name: defaultdict(lambda buckets=buckets: Histogram(buckets))
+                for name, _, buckets in self.metrics
+            }
+            self._duplicates = defaultdict(int)
+
+    def observe(self, view, method, duration, db_duration, queries, duplicates):
+        key = view, method
+        with self._lock:
+            self._histograms['dds_request_duration_seconds'][key].observe(duration)
+            self._histograms['dds_request_db_duration_seconds'][key].observe(db_duration)
+            self._histograms['dds_request_queries'][key].observe(queries)
+            self._duplicates[key] += duplicates
+
+    def render(self):
+        """
+        Возвращает метрики в текстовом формате Prometheus (version 0.0.4).
+        """
+        lines = []
+        with self._lock:
+            for name, description, _ in self.metrics:
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (view, method), histogram in sorted(self._histograms[name].items()):
+                    lines.extend(histogram.render(name, _labels(view, method)))
+            name = 'dds_request_duplicate_queries_total'
+            lines.append(f'# HELP {name} Повторные SQL-запросы с теми же параметрами в пределах запроса')
+            lines.append(f'# TYPE {name} counter')
+            for (view, method), value in sorted(self._duplicates.items()):
+                lines.append(f'{name}{{{_labels(view, method)}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(view, method):
+    view = view.replace('\\', '\\\\').replace('"', '\\"')
+    return f'view="{view}",method="{method}"'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,107 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger('dds.metrics')
+
+
+class QueryRecorder:
+    """
+    Обертка выполнения SQL (connection.execute_wrapper): время и текст запросов.
+
+    Работает без DEBUG=True и не хранит журнал запросов соединения.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.duration += duration
+            self.queries.append((sql, params, duration))
+
+    def duplicates(self):
+        """
+        Количество повторов одного и того же SQL с теми же параметрами.
+        """
+        counter = Counter((sql, repr(params)) for sql, params, _ in self.queries)
+        return sum(count - 1 for count in counter.values())
+
+    def similar(self):
+        """
+        Количество повторов одного и того же SQL с разными параметрами (признак N+1).
+        """
+        counter = Counter(sql for sql, _, _ in self.queries)
+        return sum(count - 1 for count in counter.values())
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет каждый запрос: представление, общее время, время в базе данных,
+    количество SQL-запросов и количество повторяющихся запросов.
+
+    Значения добавляются в гистограммы dds.metrics.registry (отдаются по /metrics).
+    Запросы дольше DDS_SLOW_REQUEST_MS или с количеством SQL-запросов больше
+    DDS_SLOW_REQUEST_QUERIES записываются в лог dds.metrics вместе с текстом SQL.
+
+    При DDS_METRICS_ENABLED=False middleware исключается из цепочки при запуске
+    (MiddlewareNotUsed) и не добавляет накладных расходов.
+
+    Для потоковых ответов (экспорт) замеряется время до начала передачи.
+
+    Настройки:
+        DDS_METRICS_ENABLED: Включить замеры
+        DDS_SLOW_REQUEST_MS: Порог времени ответа для лога медленных запросов, мс
+        DDS_SLOW_REQUEST_QUERIES: Порог количества SQL-запросов для лога
+        DDS_SLOW_REQUEST_SQL_LIMIT: Сколько SQL-запросов выводить в лог
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DDS_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'DDS_SLOW_REQUEST_MS', 500)
+        self.slow_queries = getattr(settings, 'DDS_SLOW_REQUEST_QUERIES', 50)
+        self.sql_limit = getattr(settings, 'DDS_SLOW_REQUEST_SQL_LIMIT', 50)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        duplicates = recorder.duplicates()
+        registry.observe(view, request.method, duration, recorder.duration, len(recorder.queries), duplicates)
+
+        if duration * 1000 >= self.slow_ms or len(recorder.queries) > self.slow_queries:
+            self.log_slow_request(request, response, view, duration, recorder, duplicates)
+        return response
+
+    def log_slow_request(self, request, response, view, duration, recorder, duplicates):
+        lines = [
+            f'Медленный запрос {request.method} {request.get_full_path()} ({view}): '
+            f'статус {response.status_code}, {duration * 1000:.1f} мс, '
+            f'SQL {recorder.duration * 1000:.1f} мс, запросов {len(recorder.queries)}, '
+            f'повторов {duplicates}, похожих {recorder.similar()}'
+        ]
+        slowest = sorted(recorder.queries, key=lambda query: query[2], reverse=True)[:self.sql_limit]
+        for sql, params, query_duration in slowest:
+            lines.append(f'  {query_duration * 1000:8.2f} мс  {sql}  {params!r}')
+        logger.warning('\n'.join(lines))
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.24 on 2026-10-17 05:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0003_alter_cashflow_creation_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cashflow',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='category_cash_flows', to='dds.category', verbose_name='Категория'),
+        ),
+        migrations.AlterField(
+            model_name='cashflow',
+            name='status',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='status_cash_flows', to='dds.status', verbose_name='Статус операции'),
+        ),
+        migrations.AlterField(
+            model_name='cashflow',
+            name='subcategory',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subcategory_cash_flows', to='dds.subcategory', verbose_name='Подкатегория'),
+        ),
+        migrations.AlterField(
+            model_name='cashflow',
+            name='type',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='type_cash_flows', to='dds.type', verbose_name='Тип операции'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(fields=['-creation_date', '-id'], name='cashflow_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(fields=['status', '-creation_date', '-id'], name='cashflow_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(fields=['type', '-creation_date', '-id'], name='cashflow_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(fields=['type', 'category', '-creation_date'], name='cashflow_type_cat_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(fields=['category', '-creation_date'], name='cashflow_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(fields=['subcategory', '-creation_date'], name='cashflow_subcat_date_idx'),
+        ),
+    ]
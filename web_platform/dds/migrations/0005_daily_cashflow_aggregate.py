@@ -0,0 +1,60 @@
+# Generated by Django 4.2.24 on 2026-10-17 05:53
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def fill_aggregates(apps, schema_editor):
+    CashFlow = apps.get_model('dds', 'CashFlow')
+    DailyCashFlowAggregate = apps.get_model('dds', 'DailyCashFlowAggregate')
+    rows = CashFlow.objects.order_by().values(
+        'creation_date', 'status_id', 'type_id', 'category_id', 'subcategory_id',
+    ).annotate(sum_amount=Sum('amount'), count=Count('id'))
+    DailyCashFlowAggregate.objects.bulk_create(
+        (
+            DailyCashFlowAggregate(
+                date=row['creation_date'],
+                status_id=row['status_id'],
+                type_id=row['type_id'],
+                category_id=row['category_id'],
+                subcategory_id=row['subcategory_id'],
+                total_amount=row['sum_amount'],
+                operations_count=row['count'],
+            )
+            for row in rows.iterator(chunk_size=5000)
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0004_cashflow_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCashFlowAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=30, verbose_name='Сумма')),
+                ('operations_count', models.PositiveIntegerField(default=0, verbose_name='Количество операций')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.category', verbose_name='Категория')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.status', verbose_name='Статус операции')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.subcategory', verbose_name='Подкатегория')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.type', verbose_name='Тип операции')),
+            ],
+            options={
+                'verbose_name': 'Дневной итог операций',
+                'verbose_name_plural': 'Дневные итоги операций',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailycashflowaggregate',
+            constraint=models.UniqueConstraint(fields=('date', 'status', 'type', 'category', 'subcategory'), name='daily_aggregate_unique_key'),
+        ),
+        migrations.RunPython(fill_aggregates, migrations.RunPython.noop),
+    ]
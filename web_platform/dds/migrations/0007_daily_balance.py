@@ -0,0 +1,68 @@
+# Generated by Django 4.2.24 on 2026-10-17 06:18
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+# Типы с такими названиями считаются списаниями, остальные - поступлениями
+EXPENSE_NAME_PREFIXES = 'спис', 'расход', 'выплат', 'оплат'
+
+
+def fill_type_signs(apps, schema_editor):
+    Type = apps.get_model('dds', 'Type')
+    for type_obj in Type.objects.all():
+        if type_obj.type_name.strip().lower().startswith(EXPENSE_NAME_PREFIXES):
+            type_obj.sign = -1
+            type_obj.save(update_fields=['sign'])
+
+
+def fill_balances(apps, schema_editor):
+    DailyCashFlowAggregate = apps.get_model('dds', 'DailyCashFlowAggregate')
+    DailyBalance = apps.get_model('dds', 'DailyBalance')
+    rows = DailyCashFlowAggregate.objects.order_by('date').values('date').annotate(
+        signed_amount=Sum(F('total_amount') * F('type__sign'), output_field=models.DecimalField()),
+        count=Sum('operations_count'),
+    )
+    balance = Decimal('0.00')
+    objs = []
+    for row in rows:
+        balance += row['signed_amount']
+        objs.append(DailyBalance(
+            date=row['date'],
+            amount=row['signed_amount'],
+            operations_count=row['count'],
+            balance=balance,
+        ))
+    DailyBalance.objects.bulk_create(objs, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0006_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=30, verbose_name='Движение за день')),
+                ('operations_count', models.PositiveIntegerField(default=0, verbose_name='Количество операций')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=30, verbose_name='Остаток на конец дня')),
+            ],
+            options={
+                'verbose_name': 'Остаток на конец дня',
+                'verbose_name_plural': 'Остатки на конец дня',
+            },
+        ),
+        migrations.AddField(
+            model_name='type',
+            name='sign',
+            field=models.SmallIntegerField(choices=[(1, 'Поступление'), (-1, 'Списание')], default=1, verbose_name='Направление'),
+        ),
+        migrations.RunPython(fill_type_signs, migrations.RunPython.noop),
+        migrations.RunPython(fill_balances, migrations.RunPython.noop),
+    ]
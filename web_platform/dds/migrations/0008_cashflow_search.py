@@ -0,0 +1,92 @@
+# Generated by Django 4.2.24 on 2026-10-17 06:28
+
+import dds.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def refs(row):
+    # Служебные слова справочников операции, см. CashFlowSearch
+    return (
+        f"'status' || {row}.status_id || ' type' || {row}.type_id || "
+        f"' category' || {row}.category_id || ' subcategory' || {row}.subcategory_id"
+    )
+
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE dds_cashflow_fts USING fts5("
+    "comment, refs, content='', tokenize='unicode61 remove_diacritics 2')",
+    # Совпадение в комментарии весит больше совпадения по справочнику
+    "INSERT INTO dds_cashflow_fts(dds_cashflow_fts, rank) VALUES ('rank', 'bm25(4.0, 1.0)')",
+    f"""
+    CREATE TRIGGER dds_cashflow_fts_insert AFTER INSERT ON dds_cashflow BEGIN
+        INSERT INTO dds_cashflow_fts(rowid, comment, refs) VALUES (NEW.id, NEW.comment, {refs('NEW')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER dds_cashflow_fts_delete AFTER DELETE ON dds_cashflow BEGIN
+        INSERT INTO dds_cashflow_fts(dds_cashflow_fts, rowid, comment, refs)
+        VALUES ('delete', OLD.id, OLD.comment, {refs('OLD')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER dds_cashflow_fts_update
+    AFTER UPDATE OF comment, status_id, type_id, category_id, subcategory_id ON dds_cashflow BEGIN
+        INSERT INTO dds_cashflow_fts(dds_cashflow_fts, rowid, comment, refs)
+        VALUES ('delete', OLD.id, OLD.comment, {refs('OLD')});
+        INSERT INTO dds_cashflow_fts(rowid, comment, refs) VALUES (NEW.id, NEW.comment, {refs('NEW')});
+    END
+    """,
+    f"INSERT INTO dds_cashflow_fts(rowid, comment, refs) SELECT id, comment, {refs('dds_cashflow')} FROM dds_cashflow",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS dds_cashflow_fts_insert',
+    'DROP TRIGGER IF EXISTS dds_cashflow_fts_delete',
+    'DROP TRIGGER IF EXISTS dds_cashflow_fts_update',
+    'DROP TABLE IF EXISTS dds_cashflow_fts',
+]
+
+# icontains в PostgreSQL - UPPER(comment::text) LIKE UPPER(%s): индекс по тому же выражению
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS cashflow_comment_trgm_idx ON dds_cashflow USING gin (UPPER(comment::text) gin_trgm_ops)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS cashflow_comment_trgm_idx',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, ()):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0007_daily_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFlowSearch',
+            fields=[
+                ('cash_flow', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='dds.cashflow')),
+                ('document', dds.models.SearchDocumentField(db_column='dds_cashflow_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'dds_cashflow_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
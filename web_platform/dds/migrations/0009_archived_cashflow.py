@@ -0,0 +1,32 @@
+# Generated by Django 4.2.24 on 2026-10-17 06:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0008_cashflow_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCashFlow',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('creation_date', models.DateField(verbose_name='Дата создания')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=30, verbose_name='Сумма')),
+                ('comment', models.CharField(blank=True, max_length=150, null=True, verbose_name='Комментарий')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.category', verbose_name='Категория')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.status', verbose_name='Статус операции')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.subcategory', verbose_name='Подкатегория')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.type', verbose_name='Тип операции')),
+            ],
+            options={
+                'verbose_name': 'Архивная операция',
+                'verbose_name_plural': 'Архив операций',
+                'indexes': [models.Index(fields=['-creation_date', '-id'], name='archive_date_id_idx')],
+            },
+        ),
+    ]
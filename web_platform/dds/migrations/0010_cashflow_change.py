@@ -0,0 +1,27 @@
+# Generated by Django 4.2.24 on 2026-10-17 07:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0009_archived_cashflow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFlowChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_from', models.DateField(blank=True, null=True, verbose_name='Дата с')),
+                ('date_to', models.DateField(blank=True, null=True, verbose_name='Дата по')),
+                ('changed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Изменено')),
+            ],
+            options={
+                'verbose_name': 'Изменение операций',
+                'verbose_name_plural': 'Изменения операций',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.24 on 2026-10-17 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0010_cashflow_change'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cashflow',
+            name='cashflow_type_cat_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cashflow',
+            name='cashflow_category_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cashflow',
+            name='cashflow_subcat_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(fields=['type', 'category', '-creation_date', '-id'], name='cashflow_type_cat_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(fields=['category', '-creation_date', '-id'], name='cashflow_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(fields=['subcategory', '-creation_date', '-id'], name='cashflow_subcat_date_idx'),
+        ),
+    ]
@@ -1,6 +1,12 @@
-from django.db import models
+import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Sum
 from django.utils import timezone
 
+from .versions import bump_table_version
+
 
 class Status(models.Model):
     status_name = models.CharField(
@@ -19,12 +25,24 @@ class Status(models.Model):
 
 
 class Type(models.Model):
+    INCOME = 1
+    EXPENSE = -1
+    SIGN_CHOICES = [
+        (INCOME, 'Поступление'),
+        (EXPENSE, 'Списание'),
+    ]
+
     type_name = models.CharField(
         max_length=50,
         blank=False,
         null=False,
         verbose_name='Тип операции',
     )
+    sign = models.SmallIntegerField(
+        choices=SIGN_CHOICES,
+        default=INCOME,
+        verbose_name='Направление',
+    )
 
     class Meta:
         verbose_name = 'Тип'
@@ -33,6 +51,18 @@ class Type(models.Model):
     def __str__(self):
         return self.type_name
 
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет тип и пересчитывает остатки, если изменилось направление.
+        """
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = Type.objects.filter(pk=self.pk).values_list('sign', flat=True).first()
+            super().save(*args, **kwargs)
+            if previous is not None and previous != self.sign:
+                DailyBalance.objects.rebuild()
+
 
 class Category(models.Model):
     type = models.ForeignKey(
@@ -88,25 +118,29 @@ class CashFlow(models.Model):
         to=Status,
         on_delete=models.CASCADE,
         verbose_name='Статус операции',
-        related_name='status_cash_flows'
+        related_name='status_cash_flows',
+        db_index=False,
     )
     type = models.ForeignKey(
         to=Type,
         on_delete=models.CASCADE,
         verbose_name='Тип операции',
-        related_name='type_cash_flows'
+        related_name='type_cash_flows',
+        db_index=False,
     )
     category = models.ForeignKey(
         to=Category,
         on_delete=models.CASCADE,
         verbose_name='Категория',
-        related_name='category_cash_flows'
+        related_name='category_cash_flows',
+        db_index=False,
     )
     subcategory = models.ForeignKey(
         to=Subcategory,
         on_delete=models.CASCADE,
         verbose_name='Подкатегория',
-        related_name='subcategory_cash_flows'
+        related_name='subcategory_cash_flows',
+        db_index=False,
     )
     amount = models.DecimalField(
         default=0.00,
@@ -127,6 +161,655 @@ class CashFlow(models.Model):
     class Meta:
         verbose_name = 'Движение денежных средств'
         verbose_name_plural = 'Движение денежных средств'
+        # Индексы повторяют матрицу фильтров IndexView: каждый внешний ключ
+        # является префиксом составного индекса с датой, поэтому отдельные
+        # индексы по внешним ключам не создаются (db_index=False). Последний
+        # столбец -id совпадает с порядком страниц (creation_date, id).
+        indexes = [
+            models.Index(fields=['-creation_date', '-id'], name='cashflow_date_id_idx'),
+            models.Index(fields=['status', '-creation_date', '-id'], name='cashflow_status_date_idx'),
+            models.Index(fields=['type', '-creation_date', '-id'], name='cashflow_type_date_idx'),
+            models.Index(fields=['type', 'category', '-creation_date', '-id'], name='cashflow_type_cat_date_idx'),
+            models.Index(fields=['category', '-creation_date', '-id'], name='cashflow_category_date_idx'),
+            models.Index(fields=['subcategory', '-creation_date', '-id'], name='cashflow_subcat_date_idx'),
+        ]
 
     def __str__(self):
         return f'Операция: {self.type} на сумму: {self.amount} от {self.creation_date}'
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет операцию и переносит ее сумму в дневных агрегатах.
+
+        При обновлении из агрегата вычитается прежнее состояние строки
+        (дата и справочники могли измениться) и добавляется новое одним
+        вызовом add_rows; оба состояния читаются из базы данных вместе
+        с направлением типа. Версия таблицы операций (ключ кеша фрагментов главной страницы)
+        увеличивается после фиксации транзакции.
+        """
+        with transaction.atomic():
+            bump_table_version(CashFlow)
+            previous = self._aggregate_row() if self.pk is not None else None
+            super().save(*args, **kwargs)
+            rows = [(previous, -1)] if previous is not None else []
+            rows.append((self._aggregate_row(), 1))
+            DailyCashFlowAggregate.objects.add_rows(rows)
+
+    def delete(self, *args, **kwargs):
+        """
+        Удаляет операцию и вычитает ее сумму из дневных агрегатов.
+
+        Агрегаты поддерживаются переопределением save/delete, а не сигналами:
+        обработчик post_delete на CashFlow отключил бы быстрое каскадное удаление
+        операций при удалении справочников. Агрегаты удаленных каскадом операций
+        удаляются тем же каскадом по внешним ключам DailyCashFlowAggregate.
+        """
+        with transaction.atomic():
+            bump_table_version(CashFlow)
+            row = self._aggregate_row()
+            result = super().delete(*args, **kwargs)
+            if row is not None:
+                DailyCashFlowAggregate.objects.add_row(row, sign=-1)
+        return result
+
+    def _aggregate_row(self):
+        """
+        Значения полей строки операции в базе данных для дневных агрегатов.
+
+        Атрибуты экземпляра для этого не подходят: они могут быть строками
+        (amount='100', creation_date='2024-06-01' - '100' * -1 дает пустую строку),
+        не округлены до decimal_places или устареть относительно базы данных.
+        """
+        return CashFlow.objects.filter(pk=self.pk).values(
+            'amount', 'type__sign', *DailyCashFlowAggregate.objects.source_key_fields,
+        ).first()
+
+
+class ArchivedCashFlow(models.Model):
+    """
+    Архив операций: закрытая история, перенесенная из CashFlow командой
+    archive_cashflows (dds.archive.archive_cash_flows).
+
+    Столбцы и ID совпадают с CashFlow, поэтому главная страница и выгрузка
+    объединяют таблицы через UNION, когда фильтр "Дата с" заходит в архив.
+    Дневные агрегаты и остатки архивных операций остаются на месте: отчеты
+    и остатки не зависят от того, в какой таблице хранится операция.
+    Справочники удаляются вместе с архивными операциями (CASCADE).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    creation_date = models.DateField(verbose_name='Дата создания')
+    status = models.ForeignKey(
+        to=Status,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Статус операции',
+    )
+    type = models.ForeignKey(
+        to=Type,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Тип операции',
+    )
+    category = models.ForeignKey(
+        to=Category,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Категория',
+    )
+    subcategory = models.ForeignKey(
+        to=Subcategory,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Подкатегория',
+    )
+    amount = models.DecimalField(
+        max_digits=30,
+        decimal_places=2,
+        verbose_name='Сумма',
+    )
+    comment = models.CharField(
+        max_length=150,
+        blank=True,
+        null=True,
+        verbose_name='Комментарий'
+    )
+
+    class Meta:
+        verbose_name = 'Архивная операция'
+        verbose_name_plural = 'Архив операций'
+        indexes = [
+            models.Index(fields=['-creation_date', '-id'], name='archive_date_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'Архивная операция: {self.type_id} на сумму: {self.amount} от {self.creation_date}'
+
+
+class SearchDocumentField(models.TextField):
+    """
+    Скрытый столбец виртуальной таблицы FTS5 с именем самой таблицы -
+    левая часть полнотекстового условия MATCH по всем столбцам.
+    """
+
+
+@SearchDocumentField.register_lookup
+class FullTextMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class CashFlowSearch(models.Model):
+    """
+    Полнотекстовый индекс операций - виртуальная таблица FTS5 (только SQLite).
+
+    Документ операции состоит из комментария (столбец comment) и служебных
+    слов справочников status<id> type<id> category<id> subcategory<id>
+    (столбец refs): совпадение с названием справочника ищется по ID, поэтому
+    переименование справочника не требует переиндексации операций.
+
+    Таблица без собственного содержимого (content=''), поддерживается
+    триггерами на dds_cashflow (миграция 0008), поэтому в индекс попадают
+    и операции, созданные bulk_create, импортом и фоновыми задачами.
+    Запросы строит dds.search.search_cash_flows.
+    """
+    cash_flow = models.OneToOneField(
+        to=CashFlow,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search',
+    )
+    document = SearchDocumentField(db_column='dds_cashflow_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'dds_cashflow_fts'
+
+
+class DailyCashFlowAggregateManager(models.Manager):
+    """
+    Менеджер дневных агрегатов операций.
+
+    Предоставляет инкрементальное обновление агрегатов для отдельных операций
+    и пересчет из таблицы CashFlow для массовых изменений, которые выполняются
+    в обход CashFlow.save/delete (bulk_create, QuerySet.update/delete).
+    """
+    source_key_fields = 'creation_date', 'status_id', 'type_id', 'category_id', 'subcategory_id'
+    max_dates_per_query = 500
+
+    def add_row(self, row, sign):
+        """
+        Добавляет (sign=1) или вычитает (sign=-1) одну операцию из агрегата ее дня.
+
+        Args:
+            row (dict): Значения полей операции: amount, creation_date, *_id справочников
+                и type__sign (направление типа)
+            sign (int): 1 или -1
+        """
+        self.add_rows([(row, sign)])
+
+    def add_rows(self, rows):
+        """
+        Переносит в агрегаты и остатки по дням несколько изменений операций.
+
+        Изменения с одинаковым ключом агрегата и одинаковой датой складываются
+        заранее: при сохранении операции вычитание прежнего состояния и добавление
+        нового дают один UPDATE агрегата и один сдвиг остатков на дату, а без
+        изменения суммы, даты и справочников - ни одного.
+
+        Args:
+            rows (list): Пары (row, sign) - значения полей операции, как в add_row, и 1 или -1
+        """
+        aggregates = {}
+        balances = {}
+        for row, sign in rows:
+            key = tuple(row[field] for field in self.source_key_fields)
+            amount, count = aggregates.get(key, (0, 0))
+            aggregates[key] = amount + row['amount'] * sign, count + sign
+            amount, count = balances.get(key[0], (0, 0))
+            balances[key[0]] = amount + row['amount'] * sign * row['type__sign'], count + sign
+        aggregates = {key: value for key, value in aggregates.items() if any(value)}
+        if not aggregates:
+            return
+        CashFlowChange.objects.record(dates={key[0] for key in aggregates})
+        for date, (amount, count) in balances.items():
+            DailyBalance.objects.add(date, amount, count)
+        for key, (amount, count) in aggregates.items():
+            date, status_id, type_id, category_id, subcategory_id = key
+            self.add({
+                'date': date,
+                'status_id': status_id,
+                'type_id': type_id,
+                'category_id': category_id,
+                'subcategory_id': subcategory_id,
+            }, amount, count)
+
+    def add(self, key, amount, count):
+        """
+        Прибавляет amount и count к агрегату с ключом key, создавая или удаляя строку при необходимости.
+
+        Остатки по дням и журнал изменений обновляет add_rows.
+        """
+        bump_table_version(self.model)
+        updated = self.filter(**key).update(
+            total_amount=F('total_amount') + amount,
+            operations_count=F('operations_count') + count,
+        )
+        if not updated and count > 0:
+            try:
+                with transaction.atomic():
+                    self.create(total_amount=amount, operations_count=count, **key)
+            except IntegrityError:
+                # Строку успел создать параллельный запрос
+                self.filter(**key).update(
+                    total_amount=F('total_amount') + amount,
+                    operations_count=F('operations_count') + count,
+                )
+        elif count < 0:
+            self.filter(operations_count__lte=0, **key).delete()
+
+    def rebuild(self, date_from=None, date_to=None, dates=None, batch_size=5000):
+        """
+        Пересчитывает агрегаты из таблиц CashFlow и ArchivedCashFlow.
+
+        Без аргументов пересчитывает всю таблицу. Иначе пересчет ограничивается
+        диапазоном дат (включительно) и/или набором дат. Остатки по дням
+        пересчитываются начиная с самой ранней затронутой даты.
+
+        Returns:
+            int: Количество созданных строк агрегатов
+        """
+        if dates is not None:
+            dates = sorted(dates)
+        with transaction.atomic():
+            # Пересчет выполняется после массовых изменений операций в обход save/delete
+            bump_table_version(CashFlow)
+            if dates is not None:
+                CashFlowChange.objects.record(dates=dates)
+            else:
+                CashFlowChange.objects.record(date_from=date_from, date_to=date_to)
+            # Ограничение на количество параметров запроса (999 в старых версиях SQLite)
+            step = self.max_dates_per_query
+            if dates is not None and len(dates) > step:
+                created = sum(
+                    self._rebuild(date_from, date_to, dates[i:i + step], batch_size)
+                    for i in range(0, len(dates), step)
+                )
+            else:
+                created = self._rebuild(date_from, date_to, dates, batch_size)
+
+            if dates is None:
+                DailyBalance.objects.rebuild(date_from=date_from)
+            elif dates:
+                DailyBalance.objects.rebuild(date_from=max(dates[0], date_from) if date_from else dates[0])
+        return created
+
+    def _rebuild(self, date_from, date_to, dates, batch_size):
+        aggregates = self.all()
+        sources = [CashFlow.objects.all(), ArchivedCashFlow.objects.all()]
+        if date_from:
+            aggregates = aggregates.filter(date__gte=date_from)
+            sources = [source.filter(creation_date__gte=date_from) for source in sources]
+        if date_to:
+            aggregates = aggregates.filter(date__lte=date_to)
+            sources = [source.filter(creation_date__lte=date_to) for source in sources]
+        if dates is not None:
+            aggregates = aggregates.filter(date__in=dates)
+            sources = [source.filter(creation_date__in=dates) for source in sources]
+
+        rows, archived_rows = (
+            source.order_by().values(*self.source_key_fields).annotate(
+                sum_amount=Sum('amount'),
+                count=Count('id'),
+            )
+            for source in sources
+        )
+        # Архивные операции входят в те же агрегаты, что и операции CashFlow
+        archived = {
+            tuple(row[field] for field in self.source_key_fields): row
+            for row in archived_rows.iterator(chunk_size=batch_size)
+        }
+
+        def merged_rows():
+            for row in rows.iterator(chunk_size=batch_size):
+                extra = archived.pop(tuple(row[field] for field in self.source_key_fields), None)
+                if extra is not None:
+                    row['sum_amount'] += extra['sum_amount']
+                    row['count'] += extra['count']
+                yield row
+            yield from archived.values()
+
+        created = 0
+        with transaction.atomic():
+            bump_table_version(self.model)
+            aggregates.delete()
+            batch = []
+            for row in merged_rows():
+                batch.append(self.model(
+                    date=row['creation_date'],
+                    status_id=row['status_id'],
+                    type_id=row['type_id'],
+                    category_id=row['category_id'],
+                    subcategory_id=row['subcategory_id'],
+                    total_amount=row['sum_amount'],
+                    operations_count=row['count'],
+                ))
+                if len(batch) >= batch_size:
+                    created += len(self.bulk_create(batch))
+                    batch = []
+            created += len(self.bulk_create(batch))
+        return created
+
+
+class DailyCashFlowAggregate(models.Model):
+    """
+    Сумма и количество операций за день в разрезе статуса, типа, категории и подкатегории.
+
+    Поддерживается инкрементально методами CashFlow.save/delete. Массовые
+    изменения должны вызывать DailyCashFlowAggregate.objects.rebuild(dates=...)
+    для затронутых дат; полный пересчет - команда rebuild_cashflow_aggregates.
+    """
+    date = models.DateField(verbose_name='Дата')
+    status = models.ForeignKey(
+        to=Status,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Статус операции',
+    )
+    type = models.ForeignKey(
+        to=Type,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Тип операции',
+    )
+    category = models.ForeignKey(
+        to=Category,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Категория',
+    )
+    subcategory = models.ForeignKey(
+        to=Subcategory,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Подкатегория',
+    )
+    total_amount = models.DecimalField(
+        default=0,
+        max_digits=30,
+        decimal_places=2,
+        verbose_name='Сумма',
+    )
+    operations_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество операций',
+    )
+
+    objects = DailyCashFlowAggregateManager()
+
+    class Meta:
+        verbose_name = 'Дневной итог операций'
+        verbose_name_plural = 'Дневные итоги операций'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'status', 'type', 'category', 'subcategory'],
+                name='daily_aggregate_unique_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.date}: {self.total_amount} ({self.operations_count})'
+
+
+class DailyBalanceManager(models.Manager):
+    """
+    Менеджер остатков по дням.
+
+    Остаток на дату - одна строка, найденная по индексу даты (balance_at),
+    без суммирования операций.
+    """
+
+    def balance_at(self, date):
+        """
+        Возвращает остаток на конец дня date (с учетом всех операций до этой даты включительно).
+        """
+        balance = self.filter(date__lte=date).order_by('-date').values_list('balance', flat=True).first()
+        return balance if balance is not None else Decimal('0.00')
+
+    async def abalance_at(self, date):
+        """
+        Асинхронный вариант balance_at.
+        """
+        balance = await self.filter(date__lte=date).order_by('-date').values_list('balance', flat=True).afirst()
+        return balance if balance is not None else Decimal('0.00')
+
+    def add(self, date, amount, count):
+        """
+        Прибавляет к дню date операции на сумму amount (со знаком направления типа) и количеством count.
+
+        Изменение дня сдвигает остатки всех последующих дней одним UPDATE - их
+        количество равно количеству дней с операциями, а не количеству операций.
+        """
+        if not amount and not count:
+            return
+        bump_table_version(self.model)
+        updated = self.filter(date=date).update(
+            amount=F('amount') + amount,
+            operations_count=F('operations_count') + count,
+        )
+        if not updated:
+            if count <= 0:
+                return
+            try:
+                with transaction.atomic():
+                    # Остаток нового дня - остаток предыдущего; amount добавится ниже
+                    self.create(date=date, amount=amount, operations_count=count, balance=self.balance_at(date))
+            except IntegrityError:
+                # Строку успел создать параллельный запрос
+                self.filter(date=date).update(
+                    amount=F('amount') + amount,
+                    operations_count=F('operations_count') + count,
+                )
+        if amount:
+            self.filter(date__gte=date).update(balance=F('balance') + amount)
+        if count < 0:
+            self.filter(date=date, operations_count__lte=0).delete()
+
+    def rebuild(self, date_from=None, date_to=None):
+        """
+        Пересчитывает остатки по таблице дневных агрегатов начиная с date_from
+        (без аргумента - полностью).
+
+        С date_to пересчитываются только дни date_from..date_to, а остатки
+        последующих дней сдвигаются одним UPDATE на изменение остатка на конец
+        date_to - так пересчет пачки не зависит от количества дней после нее.
+
+        Returns:
+            int: Количество созданных строк
+        """
+        days = DailyCashFlowAggregate.objects.all()
+        balances = self.all()
+        balance = Decimal('0.00')
+        if date_from:
+            days = days.filter(date__gte=date_from)
+            balances = balances.filter(date__gte=date_from)
+            balance = self.balance_at(date_from - datetime.timedelta(days=1))
+        if date_to:
+            days = days.filter(date__lte=date_to)
+            balances = balances.filter(date__lte=date_to)
+        rows = days.order_by('date').values('date').annotate(
+            signed_amount=Sum(F('total_amount') * F('type__sign'), output_field=models.DecimalField()),
+            count=Sum('operations_count'),
+        )
+        with transaction.atomic():
+            bump_table_version(self.model)
+            if date_to:
+                old_balance = self.balance_at(date_to)
+            balances.delete()
+            objs = []
+            for row in rows:
+                balance += row['signed_amount']
+                objs.append(self.model(
+                    date=row['date'],
+                    amount=row['signed_amount'],
+                    operations_count=row['count'],
+                    balance=balance,
+                ))
+            created = len(self.bulk_create(objs, batch_size=5000))
+            if date_to and balance != old_balance:
+                self.filter(date__gt=date_to).update(balance=F('balance') + (balance - old_balance))
+            return created
+
+
+class DailyBalance(models.Model):
+    """
+    Движение и остаток денежных средств на конец каждого дня с операциями.
+
+    amount - сумма операций дня со знаком направления типа (Type.sign),
+    balance - накопленный итог amount по всем дням до этой даты включительно.
+
+    Поддерживается вместе с дневными агрегатами (DailyCashFlowAggregateManager.add
+    и rebuild), при изменении направления типа пересчитывается полностью.
+    """
+    date = models.DateField(unique=True, verbose_name='Дата')
+    amount = models.DecimalField(
+        default=0,
+        max_digits=30,
+        decimal_places=2,
+        verbose_name='Движение за день',
+    )
+    operations_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество операций',
+    )
+    balance = models.DecimalField(
+        default=0,
+        max_digits=30,
+        decimal_places=2,
+        verbose_name='Остаток на конец дня',
+    )
+
+    objects = DailyBalanceManager()
+
+    class Meta:
+        verbose_name = 'Остаток на конец дня'
+        verbose_name_plural = 'Остатки на конец дня'
+
+    def __str__(self):
+        return f'{self.date}: {self.balance}'
+
+
+class CashFlowChangeManager(models.Manager):
+    """
+    Менеджер журнала измененных дат операций.
+    """
+
+    def record(self, dates=None, date_from=None, date_to=None):
+        """
+        Записывает изменение операций за даты dates или за диапазон
+        date_from..date_to включительно (пустая граница - без ограничения).
+        """
+        if dates is not None:
+            self.bulk_create([self.model(date_from=date, date_to=date) for date in set(dates)], batch_size=500)
+        else:
+            self.create(date_from=date_from, date_to=date_to)
+
+    def prune(self, before):
+        """
+        Удаляет записи журнала, сделанные раньше момента before.
+        """
+        return self.filter(changed_at__lt=before).delete()[0]
+
+
+class CashFlowChange(models.Model):
+    """
+    Журнал дат, операции которых изменены или удалены.
+
+    Записи добавляются в одной транзакции с изменением операций
+    (DailyCashFlowAggregateManager.add и rebuild, удаление справочников).
+    Столбцовый снимок dds.analytics перечитывает даты из записей с ID больше
+    последней обработанной - итоги дня не обнаруживают взаимно
+    компенсирующие изменения (например, обмен сумм двух операций).
+    """
+    date_from = models.DateField(null=True, blank=True, verbose_name='Дата с')
+    date_to = models.DateField(null=True, blank=True, verbose_name='Дата по')
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Изменено')
+
+    objects = CashFlowChangeManager()
+
+    class Meta:
+        verbose_name = 'Изменение операций'
+        verbose_name_plural = 'Изменения операций'
+
+    def __str__(self):
+        return f'{self.date_from or "..."} - {self.date_to or "..."}'
+
+
+class Job(models.Model):
+    """
+    Фоновая задача в очереди на базе данных.
+
+    Задачи ставятся в очередь функцией dds.jobs.enqueue и выполняются командой
+    run_jobs. Обработчик задачи сообщает прогресс (processed из total) - он
+    отображается на странице задачи.
+
+    Поле updated_at обновляется при каждом сообщении о прогрессе: задача
+    в статусе running, которая давно не обновлялась, считается прерванной
+    (процесс обработчика остановлен) и возвращается в очередь.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершена'),
+        (FAILED, 'Ошибка'),
+    ]
+    ACTIVE_STATUSES = PENDING, RUNNING
+
+    kind = models.CharField(max_length=50, verbose_name='Вид задачи')
+    params = models.JSONField(default=dict, blank=True, verbose_name='Параметры')
+    description = models.CharField(max_length=255, blank=True, verbose_name='Описание')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name='Статус задачи',
+    )
+    total = models.PositiveBigIntegerField(default=0, verbose_name='Всего')
+    processed = models.PositiveBigIntegerField(default=0, verbose_name='Обработано')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создана')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлена')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начата')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершена')
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'id'], name='job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.description or self.kind} ({self.get_status_display()})'
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    @property
+    def percent(self):
+        if self.status == self.DONE:
+            return 100
+        if not self.total:
+            return 0
+        return min(int(self.processed * 100 / self.total), 100)
@@ -0,0 +1,239 @@
+import asyncio
+import base64
+import binascii
+import datetime
+import json
+import math
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def encode_cursor(creation_date, pk, reverse=False, number=1):
+    """
+    Кодирует позицию в списке операций в непрозрачный токен.
+
+    Args:
+        creation_date (date): Дата операции, от которой строится страница
+        pk (int): ID операции, от которой строится страница
+        reverse (bool): True - токен ведет на предыдущую страницу
+        number (int): Порядковый номер страницы, на которую ведет токен
+
+    Returns:
+        str: URL-безопасная base64-строка без паддинга
+    """
+    payload = json.dumps(
+        {'d': creation_date.isoformat(), 'i': pk, 'r': int(reverse), 'p': number},
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Декодирует токен, созданный encode_cursor.
+
+    Returns:
+        tuple: (creation_date, pk, reverse, number)
+
+    Raises:
+        ValueError: Если токен поврежден или подделан
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        return (
+            datetime.date.fromisoformat(payload['d']),
+            int(payload['i']),
+            bool(payload['r']),
+            max(int(payload['p']), 1),
+        )
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as exc:
+        raise ValueError('Некорректный курсор') from exc
+
+
+def capped_count(queryset, limit):
+    """
+    Считает строки queryset, но не больше limit + 1.
+
+    COUNT выполняется по подзапросу с LIMIT, поэтому стоимость подсчета
+    ограничена limit строками независимо от размера таблицы.
+
+    Returns:
+        tuple: (количество, True если реальное количество больше limit)
+    """
+    count = queryset.order_by().values('pk')[:limit + 1].count()
+    return min(count, limit), count > limit
+
+
+async def acapped_count(queryset, limit):
+    """
+    Асинхронный вариант capped_count.
+    """
+    count = await queryset.order_by().values('pk')[:limit + 1].acount()
+    return min(count, limit), count > limit
+
+
+class KeysetPage:
+    """
+    Страница операций, выбранная по ключу (creation_date, id).
+
+    Совместима с page_obj из ListView в той части, которую использует шаблон:
+    has_next, has_previous, has_other_pages, number и object_list.
+    Вместо номеров соседних страниц предоставляет курсоры next_cursor и
+    previous_cursor.
+    """
+
+    def __init__(self, object_list, number, next_cursor, previous_cursor, count, count_is_capped, per_page):
+        self.object_list = object_list
+        self.number = number
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+        self.count_is_capped = count_is_capped
+        self.num_pages = max(math.ceil(count / per_page), 1)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по ключу (creation_date, id) для списка операций.
+
+    В отличие от django.core.paginator.Paginator не выполняет полный COUNT(*)
+    и не использует OFFSET: каждая страница выбирается условием
+    "строго после/до ключа граничной строки" и LIMIT per_page + 1, поэтому
+    время ответа не зависит от глубины страницы.
+
+    Ожидает queryset, отсортированный по ('-creation_date', '-id').
+
+    Атрибуты:
+        per_page (int): Количество операций на странице
+        count_limit (int): Верхняя граница подсчета строк для оценки числа страниц
+    """
+
+    def __init__(self, queryset, per_page, count_limit=1000):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count_limit = count_limit
+
+    def page(self, token=None):
+        """
+        Возвращает страницу, на которую указывает токен (None - первая страница).
+
+        Raises:
+            ValueError: Если токен некорректен
+        """
+        queryset, number, reverse = self._select(token)
+        rows = list(queryset[:self.per_page + 1])
+        count, count_is_capped = capped_count(self.queryset, self.count_limit)
+        return self._build_page(rows, token, number, reverse, count, count_is_capped)
+
+    async def apage(self, token=None):
+        """
+        Асинхронный вариант page: выборка страницы и подсчет строк выполняются конкурентно.
+
+        Raises:
+            ValueError: Если токен некорректен
+        """
+        queryset, number, reverse = self._select(token)
+
+        async def fetch():
+            return [row async for row in queryset[:self.per_page + 1]]
+
+        rows, (count, count_is_capped) = await asyncio.gather(
+            fetch(),
+            acapped_count(self.queryset, self.count_limit),
+        )
+        return self._build_page(rows, token, number, reverse, count, count_is_capped)
+
+    def _select(self, token):
+        number = 1
+        reverse = False
+        queryset = self.queryset
+
+        if token:
+            creation_date, pk, reverse, number = decode_cursor(token)
+            # Избыточное условие creation_date >=/<= позволяет использовать индекс по дате
+            # как диапазон: для одного только OR SQLite выбирает MULTI-INDEX OR
+            # с сортировкой всех подходящих строк во временном B-дереве.
+            if reverse:
+                queryset = queryset.filter(
+                    Q(creation_date__gte=creation_date),
+                    Q(creation_date__gt=creation_date) | Q(creation_date=creation_date, id__gt=pk),
+                ).order_by('creation_date', 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(creation_date__lte=creation_date),
+                    Q(creation_date__lt=creation_date) | Q(creation_date=creation_date, id__lt=pk),
+                )
+        return queryset, number, reverse
+
+    def _build_page(self, rows, token, number, reverse, count, count_is_capped):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            # При движении назад "лишняя" строка означает наличие еще более новых записей
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = bool(token), has_more
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            last = rows[-1]
+            next_cursor = encode_cursor(last.creation_date, last.pk, number=number + 1)
+        if rows and has_previous:
+            first = rows[0]
+            previous_cursor = encode_cursor(first.creation_date, first.pk, reverse=True, number=max(number - 1, 1))
+
+        return KeysetPage(
+            object_list=rows,
+            number=number,
+            next_cursor=next_cursor,
+            previous_cursor=previous_cursor,
+            count=count,
+            count_is_capped=count_is_capped,
+            per_page=self.per_page,
+        )
+
+
+class UnionPaginator(Paginator):
+    """
+    Paginator для UNION ALL нескольких queryset (операции и их архив).
+
+    COUNT(*) по UNION читает строки обеих таблиц целиком, поэтому количество
+    строк считается отдельным COUNT(*) по каждой части - по индексу
+    и без чтения столбцов.
+
+    Атрибуты:
+        parts (list): Объединяемые queryset (до union)
+    """
+
+    def __init__(self, object_list, per_page, parts, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.parts = parts
+
+    @cached_property
+    def count(self):
+        return sum(part.count() for part in self.parts)
+
+    async def acount(self):
+        """
+        Асинхронный вариант count: части считаются конкурентно.
+        """
+        return sum(await asyncio.gather(*(part.acount() for part in self.parts)))
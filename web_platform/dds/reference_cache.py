@@ -0,0 +1,215 @@
+import asyncio
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import (
+    Status,
+    Type,
+    Category,
+    Subcategory,
+)
+from .versions import bump_table_version, get_cache, get_table_versions
+
+REFERENCE_MODELS = Status, Type, Category, Subcategory
+
+
+class ReferenceData:
+    """
+    Неизменяемый снимок справочников Status, Type, Category и Subcategory.
+
+    Объекты связаны между собой в памяти (category.type, subcategory.category),
+    поэтому обращение к родителю не выполняет запросов.
+
+    Атрибуты:
+        version (str): Версия снимка
+        statuses, types, categories, subcategories (list): Объекты, упорядоченные по ID
+    """
+
+    def __init__(self, version, statuses, types, categories, subcategories):
+        self.version = version
+        self.statuses = statuses
+        self.types = types
+        self.categories = categories
+        self.subcategories = subcategories
+        self._hierarchy = None
+        self._by_id = {
+            Status: {obj.pk: obj for obj in statuses},
+            Type: {obj.pk: obj for obj in types},
+            Category: {obj.pk: obj for obj in categories},
+            Subcategory: {obj.pk: obj for obj in subcategories},
+        }
+        for category in categories:
+            category.type = self._by_id[Type][category.type_id]
+        for subcategory in subcategories:
+            subcategory.category = self._by_id[Category][subcategory.category_id]
+
+    @classmethod
+    def load(cls, version):
+        """
+        Загружает снимок из базы данных - по одному запросу на таблицу.
+        """
+        return cls(
+            version=version,
+            statuses=list(Status.objects.order_by('pk')),
+            types=list(Type.objects.order_by('pk')),
+            categories=list(Category.objects.order_by('pk')),
+            subcategories=list(Subcategory.objects.order_by('pk')),
+        )
+
+    @classmethod
+    async def aload(cls, version):
+        """
+        Асинхронный вариант load: запросы к четырем таблицам выполняются конкурентно.
+
+        Примечание: в Django 4.2 асинхронный ORM выполняет запросы через
+        sync_to_async в общем потоке, поэтому запросы одного процесса
+        фактически выполняются по очереди; конкурентность появляется
+        с асинхронными драйверами базы данных.
+        """
+        async def fetch(model):
+            return [obj async for obj in model.objects.order_by('pk')]
+
+        statuses, types, categories, subcategories = await asyncio.gather(
+            *(fetch(model) for model in REFERENCE_MODELS)
+        )
+        return cls(version, statuses, types, categories, subcategories)
+
+    def objects(self, model):
+        """
+        Возвращает список объектов справочника model.
+        """
+        return list(self._by_id[model].values())
+
+    def hierarchy(self):
+        """
+        Возвращает дерево Тип -> Категория -> Подкатегория в виде списков словарей.
+
+        Дерево строится один раз на снимок и затем переиспользуется.
+        """
+        if self._hierarchy is None:
+            subcategories = {}
+            for subcategory in self.subcategories:
+                subcategories.setdefault(subcategory.category_id, []).append({
+                    'id': subcategory.pk,
+                    'subcategory_name': subcategory.subcategory_name,
+                })
+            categories = {}
+            for category in self.categories:
+                categories.setdefault(category.type_id, []).append({
+                    'id': category.pk,
+                    'category_name': category.category_name,
+                    'subcategories': subcategories.get(category.pk, []),
+                })
+            self._hierarchy = [
+                {'id': type_obj.pk, 'type_name': type_obj.type_name, 'categories': categories.get(type_obj.pk, [])}
+                for type_obj in self.types
+            ]
+        return self._hierarchy
+
+    def get(self, model, pk):
+        """
+        Возвращает объект справочника model по ID.
+
+        Raises:
+            KeyError: Если объекта нет в снимке
+        """
+        return self._by_id[model][pk]
+
+
+class ReferenceCache:
+    """
+    Кеш справочников: LRU в памяти процесса и, опционально, общий кеш Django.
+
+    Ключом служит версия снимка - комбинация версий четырех таблиц. Сохранение
+    или удаление записи любого справочника увеличивает версию его таблицы
+    (dds.signals), и следующий запрос загружает новый снимок.
+    Прогретый кеш обходится одним обращением к кешу Django за версиями
+    и не выполняет запросов к базе данных.
+
+    Настройки:
+        DDS_CACHE_ALIAS: Алиас кеша Django для версий и общего снимка
+        DDS_REFERENCE_CACHE_SIZE: Количество версий в LRU процесса
+        DDS_REFERENCE_CACHE_SHARED: Хранить снимок также в кеше Django
+    """
+
+    def __init__(self):
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_version(self):
+        versions = get_table_versions(REFERENCE_MODELS)
+        return '.'.join(str(versions[model]) for model in REFERENCE_MODELS)
+
+    def get(self):
+        """
+        Возвращает актуальный снимок справочников.
+        """
+        version = self.get_version()
+        snapshot = self._lookup(version)
+        if snapshot is not None:
+            return snapshot
+
+        shared = getattr(settings, 'DDS_REFERENCE_CACHE_SHARED', False)
+        shared_key = f'dds:references:{version}'
+        snapshot = get_cache().get(shared_key) if shared else None
+        if snapshot is None:
+            snapshot = ReferenceData.load(version)
+            if shared:
+                get_cache().set(shared_key, snapshot)
+        return self._store(version, snapshot)
+
+    async def aget(self):
+        """
+        Асинхронный вариант get для асинхронных представлений.
+        """
+        # Версии читаются из кеша Django, бэкенд которого может быть синхронным (база данных)
+        version = await sync_to_async(self.get_version)()
+        snapshot = self._lookup(version)
+        if snapshot is not None:
+            return snapshot
+
+        shared = getattr(settings, 'DDS_REFERENCE_CACHE_SHARED', False)
+        shared_key = f'dds:references:{version}'
+        snapshot = await get_cache().aget(shared_key) if shared else None
+        if snapshot is None:
+            snapshot = await ReferenceData.aload(version)
+            if shared:
+                await get_cache().aset(shared_key, snapshot)
+        return self._store(version, snapshot)
+
+    def _lookup(self, version):
+        with self._lock:
+            snapshot = self._snapshots.get(version)
+            if snapshot is not None:
+                self._snapshots.move_to_end(version)
+            return snapshot
+
+    def _store(self, version, snapshot):
+        with self._lock:
+            self._snapshots[version] = snapshot
+            self._snapshots.move_to_end(version)
+            while len(self._snapshots) > getattr(settings, 'DDS_REFERENCE_CACHE_SIZE', 4):
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def invalidate(self):
+        """
+        Сбрасывает снимок во всех процессах: увеличивает версии таблиц справочников
+        и очищает LRU процесса.
+
+        Нужен, когда справочник изменен в обход сигналов (QuerySet.delete, SQL)
+        и снимок расходится с базой данных.
+        """
+        for model in REFERENCE_MODELS:
+            bump_table_version(model)
+        self.clear()
+
+
+reference_cache = ReferenceCache()
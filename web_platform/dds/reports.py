@@ -0,0 +1,239 @@
+import datetime
+import hashlib
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncQuarter, TruncWeek, TruncYear
+
+from .filters import FILTER_PARAMS, filter_cash_flows
+from .models import (
+    Status,
+    Type,
+    Category,
+    Subcategory,
+    DailyCashFlowAggregate,
+)
+from .reference_cache import reference_cache
+from .versions import get_cache, get_table_versions
+
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+    'year': TruncYear,
+}
+DIMENSIONS = {
+    'status': (Status, 'status_name'),
+    'type': (Type, 'type_name'),
+    'category': (Category, 'category_name'),
+    'subcategory': (Subcategory, 'subcategory_name'),
+}
+DEFAULT_PERIOD = 'month'
+DEFAULT_GROUP_BY = ('type',)
+VERSION_MODELS = DailyCashFlowAggregate, Status, Type, Category, Subcategory
+ZERO = Decimal('0.00')
+# database - GROUP BY по таблице дневных итогов, analytics - снимок операций в NumPy
+REPORT_BACKENDS = 'database', 'analytics'
+
+
+def get_report_backend():
+    """
+    Возвращает движок построения отчетов (настройка DDS_REPORT_BACKEND).
+
+    Raises:
+        ImproperlyConfigured: Если движок неизвестен
+    """
+    backend = getattr(settings, 'DDS_REPORT_BACKEND', 'database')
+    if backend not in REPORT_BACKENDS:
+        raise ImproperlyConfigured(f'Неизвестный DDS_REPORT_BACKEND: {backend}')
+    return backend
+
+
+def parse_report_params(params):
+    """
+    Проверяет и нормализует параметры отчета.
+
+    Обрабатывает параметры:
+        - period: day, week, month, quarter или year (по умолчанию month)
+        - group_by: измерения через запятую - status, type, category,
+          subcategory (по умолчанию type; пустое значение - только по периодам)
+        - фильтры главной страницы (FILTER_PARAMS)
+
+    Args:
+        params (QueryDict | dict): GET-параметры запроса
+
+    Returns:
+        dict: {'period': str, 'group_by': tuple, 'filters': dict}
+
+    Raises:
+        ValueError: Если параметр имеет недопустимое значение
+    """
+    period = params.get('period') or DEFAULT_PERIOD
+    if period not in PERIODS:
+        raise ValueError(f'Недопустимый период: {period}')
+
+    group_by = params.get('group_by')
+    if group_by is None:
+        group_by = DEFAULT_GROUP_BY
+    else:
+        group_by = tuple(dict.fromkeys(name.strip() for name in group_by.split(',') if name.strip()))
+    unknown = [name for name in group_by if name not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f'Недопустимые измерения: {", ".join(unknown)}')
+
+    filters = {}
+    for name in FILTER_PARAMS:
+        value = params.get(name)
+        if not value:
+            continue
+        if name in ('date_from', 'date_to'):
+            try:
+                datetime.date.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f'Некорректная дата: {value}')
+        elif not value.isdigit():
+            # Как и в filter_cash_flows, нецифровые ID игнорируются
+            continue
+        filters[name] = value
+    return {'period': period, 'group_by': group_by, 'filters': filters}
+
+
+def build_report(period, group_by, filters):
+    """
+    Строит отчет: суммы и количество операций по периодам и измерениям.
+
+    Агрегация выполняется в базе данных по таблице дневных итогов
+    DailyCashFlowAggregate (GROUP BY усеченной даты и ID справочников), поэтому
+    время построения зависит от количества дней и комбинаций справочников,
+    а не от количества операций. При DDS_REPORT_BACKEND = 'analytics' строки
+    считаются по столбцовому снимку операций в NumPy (dds.analytics).
+    Названия справочников подставляются из кеша справочников без запросов.
+
+    Returns:
+        list[dict]: Строки, упорядоченные по периоду и измерениям:
+            {'period': date, 'type': 2, 'type_name': 'Списание',
+             'total_amount': Decimal, 'operations_count': int}
+    """
+    if get_report_backend() == 'analytics':
+        from .analytics import aggregate_report
+        rows = aggregate_report(period, group_by, filters)
+    else:
+        queryset = filter_cash_flows(DailyCashFlowAggregate.objects.all(), filters, date_field='date')
+        rows = (
+            queryset
+            .annotate(period=PERIODS[period]('date'))
+            .values('period', *group_by)
+            .annotate(amount=Sum('total_amount'), count=Sum('operations_count'))
+            .order_by('period', *group_by)
+        )
+    references = reference_cache.get()
+    result = []
+    for row in rows:
+        item = {'period': row['period']}
+        for name in group_by:
+            model, name_field = DIMENSIONS[name]
+            item[name] = row[name]
+            try:
+                item[f'{name}_name'] = getattr(references.get(model, row[name]), name_field)
+            except KeyError:
+                item[f'{name}_name'] = None
+        # SQLite возвращает сумму с лишними знаками после запятой
+        item['total_amount'] = row['amount'].quantize(ZERO)
+        item['operations_count'] = row['count']
+        result.append(item)
+    return result
+
+
+def get_report(period, group_by, filters):
+    """
+    Возвращает отчет из кеша или строит его.
+
+    Ключ кеша - сигнатура движка и параметров отчета вместе с версиями таблицы дневных
+    итогов и справочников: любое изменение операций или справочников делает
+    ранее построенные отчеты недоступными без явной очистки кеша.
+
+    Настройки:
+        DDS_REPORT_CACHE_TIMEOUT: Время хранения отчета в кеше, секунд
+    """
+    versions = get_table_versions(VERSION_MODELS)
+    signature = json.dumps(
+        [
+            get_report_backend(),
+            period,
+            list(group_by),
+            sorted(filters.items()),
+            [versions[model] for model in VERSION_MODELS],
+        ],
+        separators=(',', ':'),
+    )
+    key = f'dds:report:{hashlib.md5(signature.encode()).hexdigest()}'
+    cache = get_cache()
+    report = cache.get(key)
+    if report is None:
+        report = build_report(period, group_by, filters)
+        cache.set(key, report, getattr(settings, 'DDS_REPORT_CACHE_TIMEOUT', 600))
+    return report
+
+
+def pivot_report(rows, group_by):
+    """
+    Преобразует строки отчета в сводную таблицу: строки - комбинации измерений,
+    колонки - периоды.
+
+    Returns:
+        dict: {
+            'periods': [date, ...],
+            'series': [{'key': {'type': 2}, 'label': 'Списание',
+                        'amounts': [...], 'counts': [...],
+                        'total_amount': Decimal, 'operations_count': int}, ...],
+            'totals': {'amounts': [...], 'counts': [...],
+                       'total_amount': Decimal, 'operations_count': int},
+        }
+        Значения amounts/counts выровнены по periods, отсутствующие - 0.
+    """
+    periods = sorted({row['period'] for row in rows})
+    index = {period: position for position, period in enumerate(periods)}
+    zero_amounts = [ZERO] * len(periods)
+    zero_counts = [0] * len(periods)
+
+    series = {}
+    totals = {'amounts': list(zero_amounts), 'counts': list(zero_counts), 'total_amount': ZERO, 'operations_count': 0}
+    for row in rows:
+        key = tuple(row[name] for name in group_by)
+        item = series.get(key)
+        if item is None:
+            item = series[key] = {
+                'key': {name: row[name] for name in group_by},
+                'label': ' / '.join(str(row[f'{name}_name']) for name in group_by) or 'Итого',
+                'amounts': list(zero_amounts),
+                'counts': list(zero_counts),
+                'total_amount': ZERO,
+                'operations_count': 0,
+            }
+        position = index[row['period']]
+        for target in item, totals:
+            target['amounts'][position] += row['total_amount']
+            target['counts'][position] += row['operations_count']
+            target['total_amount'] += row['total_amount']
+            target['operations_count'] += row['operations_count']
+
+    return {'periods': periods, 'series': list(series.values()), 'totals': totals}
+
+
+def format_period(value, period):
+    """
+    Возвращает подпись периода для отображения: 05.2024, 2 кв. 2024 и т.д.
+    """
+    if period == 'year':
+        return str(value.year)
+    if period == 'quarter':
+        return f'{(value.month - 1) // 3 + 1} кв. {value.year}'
+    if period == 'month':
+        return value.strftime('%m.%Y')
+    if period == 'week':
+        return f'нед. {value.strftime("%d.%m.%Y")}'
+    return value.strftime('%d.%m.%Y')
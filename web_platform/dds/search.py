@@ -0,0 +1,117 @@
+import re
+
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+
+from .models import CashFlow
+from .reference_cache import reference_cache
+
+SEARCH_PARAM = 'search'
+MAX_TERMS = 8
+
+# Поле операции, атрибут названия в справочнике, служебное слово в индексе (CashFlowSearch)
+REFERENCE_FIELDS = (
+    ('status', 'statuses', 'status_name'),
+    ('type', 'types', 'type_name'),
+    ('category', 'categories', 'category_name'),
+    ('subcategory', 'subcategories', 'subcategory_name'),
+)
+
+# Слова, как их выделяет токенизатор unicode61 FTS5: буквы и цифры
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def parse_search_terms(value):
+    """
+    Разбивает строку поиска на слова (не больше MAX_TERMS).
+    """
+    return WORD_RE.findall((value or '').casefold())[:MAX_TERMS]
+
+
+def match_references(term, references):
+    """
+    Возвращает ID записей справочников, в названии которых есть слово,
+    начинающееся с term: {'status': [1], 'category': [3, 5], ...}.
+
+    Справочники небольшие и читаются из reference_cache, поэтому поиск
+    по названиям выполняется в памяти, без запросов к базе данных.
+    """
+    matches = {}
+    for field, attribute, name_field in REFERENCE_FIELDS:
+        ids = [
+            obj.pk for obj in getattr(references, attribute)
+            if any(word.startswith(term) for word in WORD_RE.findall(getattr(obj, name_field).casefold()))
+        ]
+        if ids:
+            matches[field] = ids
+    return matches
+
+
+def build_match_query(terms, references):
+    """
+    Строит запрос FTS5: каждое слово ищется как префикс слова комментария
+    или как служебное слово подходящего справочника, слова объединяются через AND.
+
+    Пример: "avito январь" ->
+        (comment:"avito"* OR refs:(subcategory7)) AND (comment:"январь"*)
+    """
+    groups = []
+    for term in terms:
+        alternatives = [f'comment:"{term}"*']
+        tokens = [
+            f'{field}{pk}'
+            for field, ids in match_references(term, references).items()
+            for pk in ids
+        ]
+        if tokens:
+            alternatives.append(f'refs:({" OR ".join(tokens)})')
+        groups.append(f'({" OR ".join(alternatives)})')
+    return ' AND '.join(groups)
+
+
+def search_cash_flows(queryset, value, references=None):
+    """
+    Фильтрует операции по строке поиска: слова ищутся в комментарии и в названиях
+    статуса, типа, категории и подкатегории операции.
+
+    Добавляет аннотацию search_rank - релевантность (меньше - выше в выдаче).
+
+    SQLite: полнотекстовый индекс FTS5 (CashFlowSearch), релевантность - bm25.
+    PostgreSQL: icontains по комментарию с GIN-индексом pg_trgm и фильтр
+    по ID справочников, релевантность - схожесть триграмм.
+    Другие СУБД и архив операций (ArchivedCashFlow): icontains без индекса,
+    без ранжирования.
+
+    Args:
+        queryset (QuerySet): Queryset CashFlow или ArchivedCashFlow
+        value (str): Строка поиска
+        references (ReferenceData): Снимок справочников (по умолчанию из reference_cache)
+
+    Returns:
+        QuerySet: Исходный queryset, если в строке нет слов
+    """
+    terms = parse_search_terms(value)
+    if not terms:
+        return queryset
+    references = references or reference_cache.get()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite' and queryset.model is CashFlow:
+        query = build_match_query(terms, references)
+        return queryset.filter(search__document__match=query).annotate(search_rank=F('search__rank'))
+
+    condition = Q()
+    for term in terms:
+        term_condition = Q(comment__icontains=term)
+        if vendor == 'sqlite' and not term.isascii():
+            # LIKE в SQLite не учитывает регистр только для ASCII
+            for variant in {term.capitalize(), term.upper()} - {term}:
+                term_condition |= Q(comment__contains=variant)
+        for field, ids in match_references(term, references).items():
+            term_condition |= Q(**{f'{field}__in': ids})
+        condition &= term_condition
+    queryset = queryset.filter(condition)
+    if vendor == 'postgresql' and queryset.model is CashFlow:
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        return queryset.annotate(search_rank=-TrigramWordSimilarity(' '.join(terms), 'comment'))
+    return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
@@ -0,0 +1,68 @@
+import threading
+
+from django.db.models import Max, Min
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from .models import CashFlowChange, DailyBalance, DailyCashFlowAggregate
+from .reference_cache import REFERENCE_MODELS
+from .versions import bump_table_version
+
+# Период операций, удаляемых каскадом вместе со справочниками: {база данных: (дата с, дата по)}
+_pending_deletes = threading.local()
+
+
+def bump_reference_version(sender, **kwargs):
+    """
+    Инвалидирует кеш справочников при сохранении или удалении записи справочника.
+    """
+    bump_table_version(sender)
+
+
+def collect_deleted_period(sender, instance, using, **kwargs):
+    """
+    Запоминает период операций удаляемой записи справочника до каскадного удаления.
+
+    Collector отправляет pre_delete для всех удаляемых объектов (включая
+    дочерние справочники) до удаления строк, поэтому период объединяется
+    по всему каскаду.
+    """
+    # Поле DailyCashFlowAggregate совпадает с именем модели справочника
+    period = DailyCashFlowAggregate.objects.using(using).filter(
+        **{sender._meta.model_name: instance.pk}
+    ).aggregate(date_from=Min('date'), date_to=Max('date'))
+    if period['date_from'] is None:
+        return
+    pending = getattr(_pending_deletes, 'periods', None)
+    if pending is None:
+        pending = _pending_deletes.periods = {}
+    if using in pending:
+        date_from, date_to = pending[using]
+        period = {'date_from': min(date_from, period['date_from']), 'date_to': max(date_to, period['date_to'])}
+    pending[using] = period['date_from'], period['date_to']
+
+
+def rebuild_deleted_period(sender, using, **kwargs):
+    """
+    Пересчитывает остатки по дням после каскадного удаления операций справочника.
+
+    Операции и дневные итоги удаляются каскадом в обход CashFlow.delete, поэтому
+    остатки пересчитываются с самой ранней даты удаленных операций, а период
+    записывается в журнал изменений. Объекты каскада удаляются в одной транзакции
+    после операций, поэтому пересчет выполняется один раз - для первого из них.
+    """
+    pending = getattr(_pending_deletes, 'periods', None)
+    if not pending or using not in pending:
+        return
+    date_from, date_to = pending.pop(using)
+    CashFlowChange.objects.db_manager(using).record(date_from=date_from, date_to=date_to)
+    DailyBalance.objects.db_manager(using).rebuild(date_from=date_from)
+
+
+# Обработчики подключаются к конкретным моделям: обработчик post_delete без
+# sender считался бы подписчиком и для CashFlow и отключил бы быстрое
+# каскадное удаление операций.
+for model in REFERENCE_MODELS:
+    post_save.connect(bump_reference_version, sender=model, dispatch_uid=f'dds_version_save_{model.__name__}')
+    post_delete.connect(bump_reference_version, sender=model, dispatch_uid=f'dds_version_delete_{model.__name__}')
+    pre_delete.connect(collect_deleted_period, sender=model, dispatch_uid=f'dds_collect_delete_{model.__name__}')
+    post_delete.connect(rebuild_deleted_period, sender=model, dispatch_uid=f'dds_rebuild_delete_{model.__name__}')
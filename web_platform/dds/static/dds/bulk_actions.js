@@ -0,0 +1,23 @@
+// Массовые действия главной страницы: флажок "Отметить все" и подтверждение
+// удаления. Флажки строк привязаны к форме bulk-form атрибутом form.
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('bulk-form');
+    const selectAll = document.getElementById('bulk-select-all');
+
+    if (!form) return;
+
+    if (selectAll) {
+        selectAll.addEventListener('change', function() {
+            document.querySelectorAll('.bulk-select').forEach(checkbox => {
+                checkbox.checked = selectAll.checked;
+            });
+        });
+    }
+
+    form.addEventListener('submit', function(event) {
+        const button = event.submitter;
+        if (button && button.dataset.confirm && !window.confirm(button.dataset.confirm)) {
+            event.preventDefault();
+        }
+    });
+});
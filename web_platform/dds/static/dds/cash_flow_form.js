@@ -0,0 +1,49 @@
+// Зависимые списки формы операции: категории выбранного типа и подкатегории
+// выбранной категории. Дерево справочников встроено в страницу (json_script
+// "dds-hierarchy"), поэтому списки фильтруются без запросов к API.
+document.addEventListener('DOMContentLoaded', function() {
+    const hierarchyScript = document.getElementById('dds-hierarchy');
+    const typeSelect = document.getElementById('id_type');
+    const categorySelect = document.getElementById('id_category');
+    const subcategorySelect = document.getElementById('id_subcategory');
+
+    if (!hierarchyScript || !typeSelect || !categorySelect || !subcategorySelect) return;
+
+    const categoriesByType = new Map();
+    const subcategoriesByCategory = new Map();
+
+    JSON.parse(hierarchyScript.textContent).forEach(typeObj => {
+        categoriesByType.set(String(typeObj.id), typeObj.categories);
+        typeObj.categories.forEach(category => {
+            subcategoriesByCategory.set(String(category.id), category.subcategories);
+        });
+    });
+
+    // Заменяет варианты списка, сохраняя выбранный, если он есть среди новых
+    function fillOptions(select, items, nameField) {
+        const selected = select.value;
+        const emptyLabel = select.options.length && select.options[0].value === ''
+            ? select.options[0].textContent
+            : '---------';
+
+        select.replaceChildren(new Option(emptyLabel, ''));
+        (items || []).forEach(item => {
+            const isSelected = String(item.id) === selected;
+            select.add(new Option(item[nameField], item.id, isSelected, isSelected));
+        });
+    }
+
+    function updateSubcategories() {
+        fillOptions(subcategorySelect, subcategoriesByCategory.get(categorySelect.value), 'subcategory_name');
+    }
+
+    function updateCategories() {
+        fillOptions(categorySelect, categoriesByType.get(typeSelect.value), 'category_name');
+        updateSubcategories();
+    }
+
+    typeSelect.addEventListener('change', updateCategories);
+    categorySelect.addEventListener('change', updateSubcategories);
+
+    updateCategories();
+});
@@ -0,0 +1,115 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import (
+    Status,
+    Type,
+    Category,
+    Subcategory,
+    CashFlow,
+    DailyCashFlowAggregate,
+)
+
+# Справочник для синтетических данных: тип -> категория -> подкатегории
+HIERARCHY = {
+    'Пополнение': {
+        'Продажа товаров и услуг': ['Продажа товара', 'Оказание услуги', 'Предоплата'],
+        'Прочие поступления': ['Проценты по вкладу', 'Возврат подотчетных средств', 'Кэшбэк'],
+        'Инвестиции': ['Дивиденды', 'Продажа ценных бумаг'],
+    },
+    'Списание': {
+        'Маркетинг': ['Avito', 'Farpost', 'Контекстная реклама', 'Полиграфия'],
+        'Офис и администрирование': ['Аренда помещения', 'Канцелярия и расходники', 'Хозяйственные товары'],
+        'Персонал': ['Заработная плата', 'Обучение', 'Командировки'],
+        'Налоги и сборы': ['НДС', 'Налог на прибыль', 'Страховые взносы'],
+        'Связь и ИТ': ['Интернет', 'Телефония', 'Хостинг', 'Подписки на сервисы'],
+    },
+}
+
+STATUSES = ['Бизнес', 'Личное', 'Налог', 'Доп. расходы']
+
+COMMENTS = [
+    'Оплата по счету', 'Поступление от клиента', 'Ежемесячный платеж',
+    'Закупка материалов', 'Возврат средств', 'Перевод между счетами', None,
+]
+
+
+def ensure_reference_data():
+    """
+    Создает недостающие записи справочников из HIERARCHY и STATUSES.
+
+    Существующие записи с такими же названиями переиспользуются, поэтому
+    функцию можно вызывать повторно.
+
+    Returns:
+        tuple: (список ID статусов, список кортежей (type_id, category_id, subcategory_id))
+    """
+    with transaction.atomic():
+        status_ids = [
+            Status.objects.get_or_create(status_name=name)[0].pk
+            for name in STATUSES
+        ]
+        leaves = []
+        for type_name, categories in HIERARCHY.items():
+            type_obj, _ = Type.objects.get_or_create(type_name=type_name)
+            for category_name, subcategories in categories.items():
+                category, _ = Category.objects.get_or_create(type=type_obj, category_name=category_name)
+                for subcategory_name in subcategories:
+                    subcategory, _ = Subcategory.objects.get_or_create(
+                        category=category,
+                        subcategory_name=subcategory_name,
+                    )
+                    leaves.append((type_obj.pk, category.pk, subcategory.pk))
+    return status_ids, leaves
+
+
+def generate_cash_flows(rows, batch_size=10000, years=5, seed=None, progress=None):
+    """
+    Создает rows синтетических операций через bulk_create.
+
+    Даты равномерно распределены по последним years годам, суммы имеют
+    логнормальное распределение, как у реальных платежей. После вставки
+    дневные агрегаты пересчитываются одним проходом по всему диапазону дат.
+
+    Args:
+        rows (int): Количество создаваемых операций
+        batch_size (int): Размер пачки bulk_create (одна транзакция на пачку)
+        years (int): Глубина истории в годах
+        seed (int): Зерно генератора для воспроизводимых наборов данных
+        progress (callable): Вызывается с количеством созданных строк после каждой пачки
+
+    Returns:
+        int: Количество созданных операций
+    """
+    rnd = random.Random(seed)
+    status_ids, leaves = ensure_reference_data()
+    today = datetime.date.today()
+    days = years * 365
+    created = 0
+
+    while created < rows:
+        size = min(batch_size, rows - created)
+        batch = []
+        for _ in range(size):
+            type_id, category_id, subcategory_id = rnd.choice(leaves)
+            batch.append(CashFlow(
+                creation_date=today - datetime.timedelta(days=rnd.randrange(days)),
+                status_id=rnd.choice(status_ids),
+                type_id=type_id,
+                category_id=category_id,
+                subcategory_id=subcategory_id,
+                amount=Decimal(round(rnd.lognormvariate(8, 1.2), 2)).quantize(Decimal('0.01')),
+                comment=rnd.choice(COMMENTS),
+            ))
+        with transaction.atomic():
+            CashFlow.objects.bulk_create(batch, batch_size=size)
+        created += size
+        if progress:
+            progress(created)
+
+    if created:
+        DailyCashFlowAggregate.objects.rebuild(date_from=today - datetime.timedelta(days=days - 1), date_to=today)
+    return created
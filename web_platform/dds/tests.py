@@ -1,3 +1,2276 @@
-from django.test import TestCase
+import csv
+import datetime
+import json
+import re
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.http import Http404
+from django.contrib.auth import get_user_model
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from .forms import (
+    CreateCashFlowForm,
+    UpdateCashFlowForm,
+)
+from .models import (
+    Status,
+    Type,
+    Category,
+    Subcategory,
+    CashFlow,
+    DailyBalance,
+    DailyCashFlowAggregate,
+    Job,
+    ArchivedCashFlow,
+    CashFlowChange,
+)
+from . import analytics
+from .api import urls as api_urls
+from .api.views import AsyncCategoryListView
+from .bulk import bulk_update_cash_flows
+from .checks import check_shared_cache
+from .jobs import requeue_stale, run_pending
+from .metrics import registry
+from .pagination import KeysetPaginator, decode_cursor, encode_cursor
+from .reference_cache import reference_cache
+from . import urls as dds_urls
+from .reports import PERIODS, build_report, get_report, pivot_report
+from .views import (
+    AsyncIndexView,
+    AsyncStatusesView,
+    DeleteCategoryView,
+    DeleteTypeView,
+    ExportDdsView,
+    IndexView,
+)
+
+
+def without_csrf_token(content):
+    """
+    Убирает из HTML значение CSRF-токена, которое отличается в каждом ответе.
+    """
+    return re.sub(rb'name="csrfmiddlewaretoken" value="[^"]*"', b'', content)
+
+
+class ReferenceCacheMixin:
+    """
+    Сбрасывает кеш справочников: в TestCase версии таблиц не увеличиваются,
+    потому что transaction.on_commit не выполняется внутри теста.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        reference_cache.clear()
+
+
+class CashFlowFormQueriesTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет количество запросов и правила иерархии при валидации форм операций.
+
+    Поля status, type, category и subcategory проверяются по кешу справочников:
+    при прогретом кеше валидация не выполняет запросов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.type = Type.objects.create(type_name='Списание')
+        cls.other_type = Type.objects.create(type_name='Пополнение')
+        cls.category = Category.objects.create(type=cls.type, category_name='Маркетинг')
+        cls.other_category = Category.objects.create(type=cls.other_type, category_name='Продажи')
+        cls.subcategory = Subcategory.objects.create(category=cls.category, subcategory_name='Avito')
+        cls.other_subcategory = Subcategory.objects.create(category=cls.other_category, subcategory_name='Товар')
+        cls.cash_flow = CashFlow.objects.create(
+            status=cls.status,
+            type=cls.type,
+            category=cls.category,
+            subcategory=cls.subcategory,
+            amount=100,
+        )
+
+    def get_data(self, **kwargs):
+        data = {
+            'creation_date': '2024-05-01',
+            'status': self.status.pk,
+            'type': self.type.pk,
+            'category': self.category.pk,
+            'subcategory': self.subcategory.pk,
+            'amount': '250.00',
+            'comment': 'Тест',
+        }
+        data.update(kwargs)
+        return data
+
+    def test_create_form_queries(self):
+        form = CreateCashFlowForm(data=self.get_data())
+        with self.assertNumQueries(4):
+            self.assertTrue(form.is_valid())
+        form = CreateCashFlowForm(data=self.get_data())
+        with self.assertNumQueries(0):
+            self.assertTrue(form.is_valid())
+
+    def test_update_form_queries(self):
+        reference_cache.get()
+        form = UpdateCashFlowForm(data=self.get_data(), instance=self.cash_flow)
+        with self.assertNumQueries(0):
+            self.assertTrue(form.is_valid())
+
+    def test_category_of_other_type(self):
+        reference_cache.get()
+        form = CreateCashFlowForm(data=self.get_data(category=self.other_category.pk))
+        with self.assertNumQueries(0):
+            self.assertFalse(form.is_valid())
+        self.assertIn('category', form.errors)
+
+    def test_subcategory_of_other_category(self):
+        reference_cache.get()
+        form = UpdateCashFlowForm(
+            data=self.get_data(subcategory=self.other_subcategory.pk),
+            instance=self.cash_flow,
+        )
+        with self.assertNumQueries(0):
+            self.assertFalse(form.is_valid())
+        self.assertIn('subcategory', form.errors)
+
+    def test_form_pages_embed_hierarchy(self):
+        reference_cache.get()
+        # Дерево справочников встроено в страницу, запросы - только за самой операцией
+        for url, queries in (
+            (reverse('dds:create_dds'), 0),
+            (reverse('dds:update_dds', kwargs={'pk': self.cash_flow.pk}), 1),
+        ):
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.context['hierarchy'], reference_cache.get().hierarchy())
+            self.assertContains(response, '<script id="dds-hierarchy" type="application/json">')
+            self.assertContains(response, 'dds/cash_flow_form.js')
+            self.assertNotContains(response, '/api/category/')
+
+    def test_unknown_reference(self):
+        form = CreateCashFlowForm(data=self.get_data(status=999))
+        self.assertFalse(form.is_valid())
+        self.assertIn('status', form.errors)
+
+    def test_negative_amount(self):
+        form = CreateCashFlowForm(data=self.get_data(amount='-1'))
+        self.assertFalse(form.is_valid())
+        self.assertIn('amount', form.errors)
+
+
+class StaleReferenceTestCase(ReferenceCacheMixin, TransactionTestCase):
+    """
+    Проверяет сохранение формы операции со справочником, удаленным в обход
+    сигналов: внешний ключ проверяется при фиксации транзакции, поэтому тест
+    выполняется без общей транзакции TestCase.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.status = Status.objects.create(status_name='Бизнес')
+        self.type = Type.objects.create(type_name='Списание')
+        self.category = Category.objects.create(type=self.type, category_name='Маркетинг')
+        self.subcategory = Subcategory.objects.create(category=self.category, subcategory_name='Avito')
+
+    def test_deleted_subcategory(self):
+        stale = reference_cache.get()
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM dds_subcategory WHERE id = %s', [self.subcategory.pk])
+        response = self.client.post(reverse('dds:create_dds'), {
+            'creation_date': '2024-05-01',
+            'status': self.status.pk,
+            'type': self.type.pk,
+            'category': self.category.pk,
+            'subcategory': self.subcategory.pk,
+            'amount': '250.00',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['form'].errors), ['subcategory'])
+        self.assertFalse(CashFlow.objects.exists())
+        self.assertNotEqual(reference_cache.get().version, stale.version)
+        self.assertEqual(response.context['hierarchy'][0]['categories'][0]['subcategories'], [])
+
+
+class ReferenceCacheTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет кеш справочников: отсутствие запросов при прогретом кеше
+    и инвалидацию при изменении справочника.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.type = Type.objects.create(type_name='Списание')
+        cls.category = Category.objects.create(type=cls.type, category_name='Маркетинг')
+        cls.subcategory = Subcategory.objects.create(category=cls.category, subcategory_name='Avito')
+        CashFlow.objects.create(
+            status=cls.status,
+            type=cls.type,
+            category=cls.category,
+            subcategory=cls.subcategory,
+            amount=100,
+        )
+
+    @override_settings(DDS_FRAGMENT_CACHE_TIMEOUT=0)
+    def test_index_without_reference_queries(self):
+        self.client.get(reverse('dds:index'))
+        # COUNT(*) пагинатора, выборка страницы операций, остатки дней страницы,
+        # суммы операций этих дней и остаток на дату
+        with self.assertNumQueries(5):
+            self.client.get(reverse('dds:index'))
+
+    def test_reference_lists_without_queries(self):
+        reference_cache.get()
+        for name in 'statuses', 'types', 'categories', 'subcategories':
+            with self.subTest(name=name), self.assertNumQueries(0):
+                self.client.get(reverse(f'dds:{name}'))
+
+    def test_invalidation_on_save(self):
+        self.assertEqual(reference_cache.get().statuses, [self.status])
+        with self.captureOnCommitCallbacks(execute=True):
+            status = Status.objects.create(status_name='Личное')
+        self.assertEqual(reference_cache.get().statuses, [self.status, status])
+
+    def test_invalidation_on_delete(self):
+        reference_cache.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subcategory.delete()
+        self.assertEqual(reference_cache.get().subcategories, [])
+
+    def test_shared_cache_check(self):
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'dds_cache'}}
+        with override_settings(DEBUG=False, CACHES=local):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['dds.E001'])
+        with override_settings(DEBUG=True, CACHES=local):
+            self.assertEqual(check_shared_cache(None), [])
+        with override_settings(DEBUG=False, CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class ApiPaginationTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет курсорную пагинацию и выбор полей в API.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.type = Type.objects.create(type_name='Списание')
+        cls.category = Category.objects.create(type=cls.type, category_name='Маркетинг')
+        cls.subcategory = Subcategory.objects.create(category=cls.category, subcategory_name='Avito')
+        cls.cash_flows = [
+            CashFlow.objects.create(
+                creation_date=f'2024-05-0{day}',
+                status=cls.status,
+                type=cls.type,
+                category=cls.category,
+                subcategory=cls.subcategory,
+                amount=100,
+            )
+            for day in (1, 2, 2, 3)
+        ]
+
+    def test_cash_flow_pages(self):
+        expected = [obj.pk for obj in sorted(self.cash_flows, key=lambda obj: (obj.creation_date, obj.pk), reverse=True)]
+        url = reverse('api-root:cashflow-list') + '?page_size=3&fields=id'
+        with self.assertNumQueries(1):
+            first = self.client.get(url).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in first['results'] + second['results']], expected)
+        self.assertIsNone(second['next'])
+        previous = self.client.get(second['previous']).json()
+        self.assertEqual(previous['results'], first['results'])
+        self.assertIsNone(previous['previous'])
+
+    def test_sparse_fields(self):
+        reference_cache.get()
+        url = reverse('api-root:category-list') + f'?type={self.type.pk}&fields=id,category_name'
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.json()['results'], [{'id': self.category.pk, 'category_name': 'Маркетинг'}])
+        response = self.client.get(reverse('api-root:category-list') + '?fields=unknown')
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('api-root:cashflow-list') + '?cursor=broken')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(DDS_INDEX_PAGINATION='cursor', DDS_FRAGMENT_CACHE_TIMEOUT=0)
+class CursorPaginationTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет пагинацию главной страницы по ключу (creation_date, id):
+    переходы вперед и назад, операции с одинаковой датой на границе страниц
+    и некорректный курсор.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        status = Status.objects.create(status_name='Бизнес')
+        type_obj = Type.objects.create(type_name='Списание')
+        category = Category.objects.create(type=type_obj, category_name='Маркетинг')
+        subcategory = Subcategory.objects.create(category=category, subcategory_name='Avito')
+        # 12 операций: по 4 за день, границы страниц (по 5) приходятся на середину дня
+        cls.cash_flows = [
+            CashFlow.objects.create(
+                creation_date=datetime.date(2024, 5, 1) + datetime.timedelta(days=i % 3),
+                status=status,
+                type=type_obj,
+                category=category,
+                subcategory=subcategory,
+                amount=100 + i,
+            )
+            for i in range(12)
+        ]
+        cls.expected = [
+            obj.pk for obj in sorted(cls.cash_flows, key=lambda obj: (obj.creation_date, obj.pk), reverse=True)
+        ]
+
+    def get_page(self, cursor=None):
+        params = {'cursor': cursor} if cursor else {}
+        response = self.client.get(reverse('dds:index'), params)
+        self.assertEqual(response.context['pagination_mode'], 'cursor')
+        return response.context['page_obj']
+
+    def test_next_and_previous(self):
+        pages = [self.get_page()]
+        while pages[-1].has_next():
+            pages.append(self.get_page(pages[-1].next_cursor))
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+        self.assertEqual([obj.pk for page in pages for obj in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+        self.assertEqual((pages[0].count, pages[0].num_pages), (12, 3))
+
+        # Назад с последней страницы - те же страницы в обратном порядке
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.get_page(page.previous_cursor)
+            self.assertEqual([obj.pk for obj in page], [obj.pk for obj in expected])
+            self.assertEqual(page.number, expected.number)
+            self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_same_date_ties(self):
+        paginator = KeysetPaginator(CashFlow.objects.order_by('-creation_date', '-id'), per_page=3)
+        page = paginator.page()
+        seen = [obj.pk for obj in page]
+        while page.has_next():
+            with CaptureQueriesContext(connection) as queries:
+                page = paginator.page(page.next_cursor)
+            seen += [obj.pk for obj in page]
+            # Избыточная граница по дате позволяет читать индекс по дате как диапазон
+            self.assertIn('"creation_date" <= ', queries[0]['sql'])
+        self.assertEqual(seen, self.expected)
+
+        cursor = encode_cursor(datetime.date(2024, 5, 2), self.expected[5], reverse=True, number=2)
+        self.assertEqual([obj.pk for obj in paginator.page(cursor)], self.expected[2:5])
+
+    def test_invalid_cursor(self):
+        for cursor in 'broken', encode_cursor(datetime.date(2024, 5, 1), 1)[:-3], 'eyJkIjoxfQ':
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('dds:index'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+        with self.assertRaises(ValueError):
+            decode_cursor('eyJkIjoiMjAyNC0xMy0wMSIsImkiOjEsInIiOjAsInAiOjF9')
+
+
+@override_settings(DDS_FRAGMENT_CACHE_TIMEOUT=0)
+class ExportTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет выгрузку ExportDdsView: форматы CSV и NDJSON, совпадение
+    набора операций с главной страницей и потоковую отдачу без моделей.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.personal = Status.objects.create(status_name='Личное')
+        cls.income = Type.objects.create(type_name='Пополнение')
+        cls.expense = Type.objects.create(type_name='Списание')
+        cls.sales = Category.objects.create(type=cls.income, category_name='Продажи')
+        cls.marketing = Category.objects.create(type=cls.expense, category_name='Маркетинг')
+        cls.goods = Subcategory.objects.create(category=cls.sales, subcategory_name='Товар')
+        cls.avito = Subcategory.objects.create(category=cls.marketing, subcategory_name='Avito')
+        for i in range(12):
+            income = i % 3 == 0
+            CashFlow.objects.create(
+                creation_date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i * 10),
+                status=cls.personal if i % 4 == 0 else cls.status,
+                type=cls.income if income else cls.expense,
+                category=cls.sales if income else cls.marketing,
+                subcategory=cls.goods if income else cls.avito,
+                amount=Decimal('100.25') + i,
+                comment='Реклама, "Авито"' if i == 1 else None,
+            )
+
+    def export(self, **params):
+        response = self.client.get(reverse('dds:export_dds'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def index_ids(self, **params):
+        response = self.client.get(reverse('dds:index'), params)
+        return [obj.pk for obj in response.context['paginator'].object_list]
+
+    def test_csv(self):
+        response, content = self.export(status=self.status.pk)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="cashflow.csv"')
+        self.assertTrue(content.startswith('\ufeff'))
+        rows = list(csv.reader(StringIO(content[1:])))
+        self.assertEqual(rows[0], ['id', 'creation_date', 'status', 'type', 'category', 'subcategory', 'amount', 'comment'])
+        ad = CashFlow.objects.get(comment__startswith='Реклама')
+        self.assertIn(
+            [str(ad.pk), '2024-01-11', 'Бизнес', 'Списание', 'Маркетинг', 'Avito', '101.25', 'Реклама, "Авито"'],
+            rows,
+        )
+        self.assertEqual(len(rows) - 1, CashFlow.objects.filter(status=self.status).count())
+
+    def test_ndjson(self):
+        response, content = self.export(format='ndjson', type_obj=self.income.pk)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        items = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(items[0], {
+            'id': items[0]['id'],
+            'creation_date': '2024-03-31',
+            'status': 'Бизнес',
+            'type': 'Пополнение',
+            'category': 'Продажи',
+            'subcategory': 'Товар',
+            'amount': '109.25',
+            'comment': None,
+        })
+        self.assertEqual(len(items), 4)
+        self.assertEqual(self.client.get(reverse('dds:export_dds'), {'format': 'xml'}).status_code, 404)
+
+    def test_filter_parity(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_cashflows', '--before', '2024-02-01', stdout=StringIO())
+        cases = [
+            {},
+            {'date_from': '2024-02-01', 'date_to': '2024-03-31'},
+            {'date_from': '2023-12-01', 'status': self.status.pk},
+            {'type_obj': self.expense.pk, 'category': self.marketing.pk, 'subcategory': self.avito.pk},
+            {'search': 'авито'},
+            {'status': 'abc'},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                _, content = self.export(format='ndjson', **params)
+                self.assertEqual([json.loads(line)['id'] for line in content.splitlines()], self.index_ids(**params))
+
+    def test_streaming(self):
+        # Ответ создается без запросов, строки читаются по мере отдачи через values_list
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('dds:export_dds'), {'format': 'ndjson'})
+        self.assertTrue(response.streaming)
+        with mock.patch.object(CashFlow, 'from_db', side_effect=AssertionError('Создан экземпляр модели')):
+            with mock.patch.object(ExportDdsView, 'chunk_size', 5):
+                lines = list(response.streaming_content)
+        self.assertEqual(len(lines), 12)
+
+
+class ApiCashFlowTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет API операций: фильтры, создание, изменение, удаление
+    и пакетные загрузку и изменение с ошибками по строкам.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.personal = Status.objects.create(status_name='Личное')
+        cls.income = Type.objects.create(type_name='Пополнение')
+        cls.expense = Type.objects.create(type_name='Списание')
+        cls.sales = Category.objects.create(type=cls.income, category_name='Продажи')
+        cls.marketing = Category.objects.create(type=cls.expense, category_name='Маркетинг')
+        cls.goods = Subcategory.objects.create(category=cls.sales, subcategory_name='Товар')
+        cls.avito = Subcategory.objects.create(category=cls.marketing, subcategory_name='Avito')
+        cls.sale = CashFlow.objects.create(
+            creation_date='2024-05-01', status=cls.status, type=cls.income,
+            category=cls.sales, subcategory=cls.goods, amount=1000,
+        )
+        cls.ad = CashFlow.objects.create(
+            creation_date='2024-05-02', status=cls.status, type=cls.expense,
+            category=cls.marketing, subcategory=cls.avito, amount=300,
+        )
+
+    def row(self, **values):
+        row = {
+            'status': self.status.pk,
+            'type': self.expense.pk,
+            'category': self.marketing.pk,
+            'subcategory': self.avito.pk,
+            'amount': '10.00',
+        }
+        row.update(values)
+        return row
+
+    def post_json(self, url, data, method='post'):
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json')
+
+    def assert_aggregates_consistent(self):
+        aggregates = list(DailyCashFlowAggregate.objects.order_by('date', 'type_id', 'status_id').values_list(
+            'date', 'status_id', 'type_id', 'total_amount', 'operations_count',
+        ))
+        DailyCashFlowAggregate.objects.rebuild()
+        self.assertEqual(list(DailyCashFlowAggregate.objects.order_by('date', 'type_id', 'status_id').values_list(
+            'date', 'status_id', 'type_id', 'total_amount', 'operations_count',
+        )), aggregates)
+
+    def test_list_filters(self):
+        url = reverse('api-root:cashflow-list')
+        response = self.client.get(url, {'type_obj': self.expense.pk, 'fields': 'id'})
+        self.assertEqual(response.json()['results'], [{'id': self.ad.pk}])
+        response = self.client.get(url, {'date_to': '2024-05-01', 'fields': 'id'})
+        self.assertEqual(response.json()['results'], [{'id': self.sale.pk}])
+
+    def test_create_update_delete(self):
+        # Без creation_date операция получает текущую дату
+        response = self.post_json(reverse('api-root:cashflow-list'), self.row(amount='25.50'))
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['creation_date'], timezone.localdate().isoformat())
+        pk = response.json()['id']
+
+        response = self.post_json(reverse('api-root:cashflow-list'), self.row(category=self.sales.pk))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('не принадлежит типу', response.json()['category'][0])
+        # Пакетная загрузка возвращает то же сообщение
+        bulk = self.post_json(reverse('api-root:cashflow-bulk'), [self.row(category=self.sales.pk)])
+        self.assertEqual(bulk.json()['errors'][0]['errors']['category'], response.json()['category'])
+
+        url = reverse('api-root:cashflow-detail', kwargs={'pk': pk})
+        response = self.post_json(url, {'amount': '40.00', 'creation_date': '2024-05-02'}, method='patch')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            DailyCashFlowAggregate.objects.get(date='2024-05-02', type=self.expense).total_amount, Decimal('340.00'),
+        )
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(CashFlow.objects.filter(pk=pk).exists())
+        self.assert_aggregates_consistent()
+
+    def test_bulk_create(self):
+        url = reverse('api-root:cashflow-bulk')
+        rows = [
+            self.row(creation_date='2024-05-03'),
+            self.row(category=self.sales.pk),
+            self.row(amount='-5'),
+            self.row(status=0),
+        ]
+        response = self.post_json(url, rows)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2, 3])
+        self.assertEqual(CashFlow.objects.count(), 2)
+
+        response = self.post_json(url + '?partial=true', rows)
+        self.assertEqual(response.status_code, 201)
+        created = response.json()['created']
+        self.assertEqual(len(created), 1)
+        self.assertEqual(CashFlow.objects.get(pk=created[0]).creation_date, datetime.date(2024, 5, 3))
+        self.assert_aggregates_consistent()
+
+        response = self.post_json(url, {'amount': 1})
+        self.assertEqual(response.status_code, 400)
+        with override_settings(DDS_API_BULK_MAX_ROWS=2):
+            self.assertEqual(self.post_json(url, rows).status_code, 400)
+
+    def test_bulk_update(self):
+        url = reverse('api-root:cashflow-bulk')
+        rows = [
+            {'id': self.ad.pk, 'amount': '350.00', 'creation_date': '2024-05-05', 'comment': 'Реклама'},
+            {'id': self.sale.pk, 'status': self.personal.pk},
+            {'id': 0, 'amount': '1.00'},
+            {'id': self.sale.pk, 'category': self.marketing.pk},
+            {'amount': '1.00'},
+        ]
+        response = self.post_json(url, rows, method='patch')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [2, 3, 4])
+        self.ad.refresh_from_db()
+        self.assertEqual(self.ad.amount, Decimal('300.00'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_json(url + '?partial=1', rows, method='patch')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['updated'], [self.ad.pk, self.sale.pk])
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "dds_cashflow"')]
+        self.assertEqual(len(updates), 1)
+
+        self.ad.refresh_from_db()
+        self.sale.refresh_from_db()
+        self.assertEqual((self.ad.amount, self.ad.creation_date, self.ad.comment), (
+            Decimal('350.00'), datetime.date(2024, 5, 5), 'Реклама',
+        ))
+        self.assertEqual(self.sale.status, self.personal)
+        self.assertFalse(DailyCashFlowAggregate.objects.filter(date='2024-05-02').exists())
+        self.assert_aggregates_consistent()
+
+
+class ApiConditionalTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет ETag / Last-Modified справочников и дерево /api/hierarchy/.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.type = Type.objects.create(type_name='Списание')
+        cls.category = Category.objects.create(type=cls.type, category_name='Маркетинг')
+        cls.subcategory = Subcategory.objects.create(category=cls.category, subcategory_name='Avito')
+
+    def test_not_modified(self):
+        url = reverse('api-root:category-list') + f'?type={self.type.pk}'
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(type=self.type, category_name='Офис')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_hierarchy(self):
+        response = self.client.get(reverse('api-root:hierarchy-list'))
+        self.assertEqual(response.json(), [{
+            'id': self.type.pk,
+            'type_name': 'Списание',
+            'categories': [{
+                'id': self.category.pk,
+                'category_name': 'Маркетинг',
+                'subcategories': [{'id': self.subcategory.pk, 'subcategory_name': 'Avito'}],
+            }],
+        }])
+        response = self.client.get(reverse('api-root:hierarchy-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class ReportTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет отчеты по дневным итогам: группировку, кеш и его инвалидацию.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.income = Type.objects.create(type_name='Пополнение')
+        cls.expense = Type.objects.create(type_name='Списание')
+        cls.sales = Category.objects.create(type=cls.income, category_name='Продажи')
+        cls.marketing = Category.objects.create(type=cls.expense, category_name='Маркетинг')
+        cls.goods = Subcategory.objects.create(category=cls.sales, subcategory_name='Товар')
+        cls.avito = Subcategory.objects.create(category=cls.marketing, subcategory_name='Avito')
+        for date, type_obj, category, subcategory, amount in (
+            ('2024-01-10', cls.income, cls.sales, cls.goods, 100),
+            ('2024-02-15', cls.income, cls.sales, cls.goods, 50),
+            ('2024-02-20', cls.expense, cls.marketing, cls.avito, 30),
+            ('2024-05-01', cls.expense, cls.marketing, cls.avito, 20),
+        ):
+            CashFlow.objects.create(
+                creation_date=date,
+                status=cls.status,
+                type=type_obj,
+                category=category,
+                subcategory=subcategory,
+                amount=amount,
+            )
+
+    def test_group_by_quarter_and_type(self):
+        rows = get_report('quarter', ('type',), {})
+        self.assertEqual(
+            [(str(row['period']), row['type_name'], row['total_amount'], row['operations_count']) for row in rows],
+            [
+                ('2024-01-01', 'Пополнение', Decimal('150.00'), 2),
+                ('2024-01-01', 'Списание', Decimal('30.00'), 1),
+                ('2024-04-01', 'Списание', Decimal('20.00'), 1),
+            ],
+        )
+        pivot = pivot_report(rows, ('type',))
+        self.assertEqual(len(pivot['periods']), 2)
+        self.assertEqual(pivot['totals']['amounts'], [Decimal('180.00'), Decimal('20.00')])
+
+    def test_filters(self):
+        rows = get_report('month', (), {'date_from': '2024-02-01', 'type_obj': str(self.expense.pk)})
+        self.assertEqual([(str(row['period']), row['total_amount']) for row in rows], [
+            ('2024-02-01', Decimal('30.00')),
+            ('2024-05-01', Decimal('20.00')),
+        ])
+
+    def test_cache_and_invalidation(self):
+        get_report('month', ('type',), {})
+        with self.assertNumQueries(0):
+            get_report('month', ('type',), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            CashFlow.objects.create(
+                creation_date='2024-05-02',
+                status=self.status,
+                type=self.expense,
+                category=self.marketing,
+                subcategory=self.avito,
+                amount=5,
+            )
+        rows = get_report('month', ('type',), {})
+        self.assertEqual(rows[-1]['total_amount'], Decimal('25.00'))
+
+    def test_pages(self):
+        response = self.client.get(reverse('dds:reports') + '?period=quarter&group_by=type,category')
+        self.assertContains(response, 'Пополнение / Продажи')
+        response = self.client.get(reverse('api-root:reports') + '?layout=pivot&group_by=category')
+        self.assertEqual(response.json()['totals']['total_amount'], '200.00')
+        response = self.client.get(reverse('api-root:reports') + '?group_by=amount')
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN - только SQLite')
+class CashFlowIndexTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет, что составные индексы CashFlow покрывают запросы по внешним ключам:
+    отдельных индексов по внешним ключам нет (db_index=False).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.type = Type.objects.create(type_name='Списание')
+        cls.category = Category.objects.create(type=cls.type, category_name='Маркетинг')
+        cls.subcategory = Subcategory.objects.create(category=cls.category, subcategory_name='Avito')
+        for day in range(1, 4):
+            CashFlow.objects.create(
+                creation_date=f'2024-05-0{day}',
+                status=cls.status,
+                type=cls.type,
+                category=cls.category,
+                subcategory=cls.subcategory,
+                amount=100,
+            )
+
+    def plan(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_index_page_filters(self):
+        # Страница главной с фильтром по справочнику: поиск по индексу без сортировки во временном B-дереве
+        for filters in (
+            {'status': self.status.pk},
+            {'type': self.type.pk},
+            {'category': self.category.pk},
+            {'subcategory': self.subcategory.pk},
+            {'type': self.type.pk, 'category': self.category.pk},
+        ):
+            queryset = CashFlow.objects.filter(**filters).order_by('-creation_date', '-id')[:10]
+            plan = self.plan(*queryset.query.sql_with_params())
+            with self.subTest(filters=filters):
+                self.assertTrue(any('USING INDEX' in detail for detail in plan), plan)
+                self.assertFalse([detail for detail in plan if 'TEMP B-TREE' in detail], plan)
+
+    def test_cascade_delete(self):
+        # Каскадное удаление справочников находит операции по индексу
+        for obj in self.subcategory, self.category, self.status:
+            with CaptureQueriesContext(connection) as queries:
+                obj.delete()
+            statements = [
+                query['sql'] for query in queries.captured_queries
+                if '"dds_cashflow"' in query['sql'] and query['sql'].startswith(('SELECT', 'DELETE'))
+            ]
+            with self.subTest(model=type(obj).__name__):
+                self.assertTrue(statements)
+                for sql in statements:
+                    plan = self.plan(sql)
+                    self.assertFalse([detail for detail in plan if re.match(r'SCAN dds_cashflow( |$)', detail)], sql)
+
+
+class SqliteConnectionTestCase(TestCase):
+    """
+    Проверяет применение DDS_SQLITE_PRAGMAS к соединению SQLite.
+    """
+
+    def test_busy_timeout(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Только для SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.DDS_SQLITE_PRAGMAS['busy_timeout'])
+
+
+class SeedCommandTestCase(TestCase):
+    """
+    Проверяет генерацию синтетических данных командой seed_dds.
+    """
+
+    def test_seed(self):
+        call_command('seed_dds', rows=50, seed=1, stdout=StringIO())
+        self.assertEqual(CashFlow.objects.count(), 50)
+        totals = DailyCashFlowAggregate.objects.aggregate(count=Sum('operations_count'))
+        self.assertEqual(totals['count'], 50)
+
+        call_command('seed_dds', rows=80, total=True, stdout=StringIO())
+        self.assertEqual(CashFlow.objects.count(), 80)
+
+
+class ImportCommandTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет импорт import_cashflows: поиск справочников по названиям,
+    ошибки иерархии, режимы skip и abort и итоговые агрегаты.
+    """
+    header = ['Дата создания', 'Статус операции', 'Тип операции', 'Категория', 'Подкатегория', 'Сумма', 'comment']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.income = Type.objects.create(type_name='Пополнение', sign=Type.INCOME)
+        cls.expense = Type.objects.create(type_name='Списание', sign=Type.EXPENSE)
+        # Одинаковые названия в разных ветках иерархии
+        cls.income_other = Category.objects.create(type=cls.income, category_name='Прочее')
+        cls.expense_other = Category.objects.create(type=cls.expense, category_name='Прочее')
+        cls.marketing = Category.objects.create(type=cls.expense, category_name='Маркетинг')
+        cls.income_misc = Subcategory.objects.create(category=cls.income_other, subcategory_name='Разное')
+        cls.expense_misc = Subcategory.objects.create(category=cls.expense_other, subcategory_name='Разное')
+        cls.avito = Subcategory.objects.create(category=cls.marketing, subcategory_name='Avito')
+        CashFlow.objects.create(
+            creation_date='2024-05-10', status=cls.status, type=cls.income,
+            category=cls.income_other, subcategory=cls.income_misc, amount=500,
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def write_csv(self, rows):
+        path = f'{self.root}/statement.csv'
+        with open(path, 'w', newline='', encoding='utf-8-sig') as fh:
+            writer = csv.writer(fh)
+            writer.writerow(self.header)
+            writer.writerows(rows)
+        return path
+
+    def import_file(self, path, *args):
+        stdout = StringIO()
+        call_command('import_cashflows', path, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def rows(self):
+        return [
+            ['2024-05-01', 'бизнес', 'Пополнение', 'Прочее', 'Разное', '1 000,50', 'Оплата'],
+            ['02.05.2024', 'Бизнес', 'списание', 'Прочее', 'Разное', '200', ''],
+            ['', '', '', '', '', '', ''],
+            ['2024-05-03', 'Бизнес', 'Списание', 'Маркетинг', 'Avito', '300', ''],
+            ['2024-05-04', 'Личное', 'Списание', 'Маркетинг', 'Avito', '10', ''],
+            ['2024-05-04', 'Бизнес', 'Пополнение', 'Маркетинг', 'Avito', '10', ''],
+            ['2024-05-04', 'Бизнес', 'Списание', 'Маркетинг', 'Разное', '10', ''],
+            ['2024-05-04', 'Бизнес', 'Списание', 'Маркетинг', 'Avito', 'много', ''],
+            ['2024-13-04', 'Бизнес', 'Списание', 'Маркетинг', 'Avito', '10', ''],
+            ['2024-05-20', 'Бизнес', 'Списание', 'Маркетинг', 'Avito', '40', ''],
+        ]
+
+    def test_skip_mode(self):
+        rejects = f'{self.root}/rejects.csv'
+        with CaptureQueriesContext(connection) as queries:
+            output = self.import_file(self.write_csv(self.rows()), '--batch-size', '2', '--rejects', rejects)
+        self.assertIn('Импортировано: 4, отклонено: 5', output)
+
+        imported = CashFlow.objects.exclude(creation_date='2024-05-10').order_by('creation_date')
+        self.assertEqual(
+            [(obj.creation_date.isoformat(), obj.type_id, obj.category_id, obj.subcategory_id, obj.amount) for obj in imported],
+            [
+                ('2024-05-01', self.income.pk, self.income_other.pk, self.income_misc.pk, Decimal('1000.50')),
+                ('2024-05-02', self.expense.pk, self.expense_other.pk, self.expense_misc.pk, Decimal('200.00')),
+                ('2024-05-03', self.expense.pk, self.marketing.pk, self.avito.pk, Decimal('300.00')),
+                ('2024-05-20', self.expense.pk, self.marketing.pk, self.avito.pk, Decimal('40.00')),
+            ],
+        )
+        with open(rejects, encoding='utf-8') as fh:
+            rejected = list(csv.reader(fh))[1:]
+        self.assertEqual([row[0] for row in rejected], ['6', '7', '8', '9', '10'])
+        self.assertIn('Статус "Личное" не существует', rejected[0][1])
+        self.assertIn('не принадлежит типу', rejected[1][1])
+        self.assertIn('не принадлежит категории', rejected[2][1])
+
+        # Агрегаты и остатки пересчитаны один раз по датам всех пачек
+        self.assertEqual(sum('DELETE FROM "dds_dailybalance"' in query['sql'] for query in queries), 1)
+        self.assertEqual(DailyCashFlowAggregate.objects.aggregate(count=Sum('operations_count'))['count'], 5)
+        self.assertEqual(DailyBalance.objects.balance_at(datetime.date(2024, 5, 20)), Decimal('960.50'))
+        balances = list(DailyBalance.objects.order_by('date').values_list('date', 'balance'))
+        DailyCashFlowAggregate.objects.rebuild()
+        self.assertEqual(list(DailyBalance.objects.order_by('date').values_list('date', 'balance')), balances)
+
+    def test_abort_mode(self):
+        path = self.write_csv(self.rows())
+        with self.assertRaisesMessage(CommandError, 'Строка 6'):
+            self.import_file(path, '--batch-size', '2', '--on-error', 'abort')
+        self.assertEqual(CashFlow.objects.count(), 1)
+        self.assertEqual(DailyCashFlowAggregate.objects.aggregate(count=Sum('operations_count'))['count'], 1)
+
+        valid = [row for row in self.rows()[:4] if any(row)]
+        output = self.import_file(self.write_csv(valid), '--on-error', 'abort')
+        self.assertIn('Импортировано: 3, отклонено: 0', output)
+        self.assertEqual(DailyCashFlowAggregate.objects.aggregate(count=Sum('operations_count'))['count'], 4)
+
+    def test_dry_run(self):
+        output = self.import_file(self.write_csv(self.rows()), '--dry-run')
+        self.assertIn('Импортировано: 4, отклонено: 5', output)
+        self.assertEqual(CashFlow.objects.count(), 1)
+
+
+@override_settings(DDS_METRICS_ENABLED=True, DDS_METRICS_TOKEN='secret')
+class RequestMetricsTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет замеры запросов, лог медленных запросов и доступ к /metrics.
+    """
+
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+
+    def test_metrics(self):
+        self.client.get(reverse('dds:index'))
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('dds_request_duration_seconds_count{view="dds:index",method="GET"} 1', body)
+        self.assertIn('# TYPE dds_request_queries histogram', body)
+
+    def test_access(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        user = get_user_model().objects.create_user('admin', password='admin', is_staff=True)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(DDS_SLOW_REQUEST_QUERIES=0)
+    def test_slow_request_log(self):
+        with self.assertLogs('dds.metrics', level='WARNING') as logs:
+            self.client.get(reverse('dds:index'))
+        self.assertIn('dds:index', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(DDS_METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.client.get(reverse('dds:index'))
+        self.assertNotIn('dds:index', registry.render())
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+class DeleteImpactTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет сводку по связанным операциям на страницах удаления справочников:
+    количество запросов не зависит от количества операций.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.type = Type.objects.create(type_name='Списание')
+        cls.category = Category.objects.create(type=cls.type, category_name='Маркетинг')
+        cls.subcategory = Subcategory.objects.create(category=cls.category, subcategory_name='Avito')
+        for day in range(1, 9):
+            CashFlow.objects.create(
+                creation_date=f'2024-05-{day:02d}',
+                status=cls.status,
+                type=cls.type,
+                category=cls.category,
+                subcategory=cls.subcategory,
+                amount=100,
+            )
+
+    def test_summary(self):
+        response = self.client.get(reverse('dds:delete_type', kwargs={'pk': self.type.pk}))
+        summary = response.context['cash_flow_summary']
+        self.assertEqual(summary['count'], 8)
+        self.assertEqual(summary['total'], Decimal('800'))
+        self.assertEqual(str(summary['date_from']), '2024-05-01')
+        self.assertEqual(str(summary['date_to']), '2024-05-08')
+        self.assertEqual([cash_flow.creation_date.day for cash_flow in response.context['cash_flow_sample']],
+                         [8, 7, 6, 5, 4])
+        self.assertEqual(response.context['cash_flow_rest'], 3)
+        self.assertEqual(response.context['categories'], [self.category])
+        self.assertEqual(response.context['all_subcategories'], [self.subcategory])
+        self.assertContains(response, '... и еще 3')
+
+    def test_preloaded_references(self):
+        # Страницы удаления берут справочники через get_references и не загружают снимок повторно
+        references = reference_cache.get()
+        with mock.patch.object(reference_cache, 'get', side_effect=AssertionError('Повторная загрузка справочников')):
+            response = DeleteTypeView.as_view(references=references)(RequestFactory().get('/'), pk=self.type.pk)
+            self.assertEqual(response.context_data['all_subcategories'], [self.subcategory])
+            response = DeleteCategoryView.as_view(references=references)(RequestFactory().get('/'), pk=self.category.pk)
+            self.assertEqual(response.context_data['subcategories'], [self.subcategory])
+
+    def test_queries(self):
+        reference_cache.get()
+        objects = {
+            'status': self.status,
+            'type': self.type,
+            'category': self.category,
+            'subcategory': self.subcategory,
+        }
+        for name, obj in objects.items():
+            # Объект, сводка по дневным итогам и последние операции
+            with self.subTest(name=name), self.assertNumQueries(3):
+                response = self.client.get(reverse(f'dds:delete_{name}', kwargs={'pk': obj.pk}))
+                self.assertEqual(response.status_code, 200)
+
+
+class DeleteJobTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет удаление справочников фоновой задачей пачками.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.type = Type.objects.create(type_name='Списание')
+        cls.other_type = Type.objects.create(type_name='Пополнение')
+        cls.category = Category.objects.create(type=cls.type, category_name='Маркетинг')
+        cls.other_category = Category.objects.create(type=cls.other_type, category_name='Продажи')
+        cls.subcategory = Subcategory.objects.create(category=cls.category, subcategory_name='Avito')
+        cls.other_subcategory = Subcategory.objects.create(category=cls.other_category, subcategory_name='Товар')
+        for day in range(1, 9):
+            for type_obj, category, subcategory in (
+                (cls.type, cls.category, cls.subcategory),
+                (cls.other_type, cls.other_category, cls.other_subcategory),
+            ):
+                CashFlow.objects.create(
+                    creation_date=f'2024-05-{day:02d}',
+                    status=cls.status,
+                    type=type_obj,
+                    category=category,
+                    subcategory=subcategory,
+                    amount=100,
+                )
+
+    def test_sync_delete(self):
+        response = self.client.post(reverse('dds:delete_type', kwargs={'pk': self.type.pk}))
+        self.assertRedirects(response, reverse('dds:types'))
+        self.assertFalse(Type.objects.filter(pk=self.type.pk).exists())
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(DDS_DELETE_SYNC_LIMIT=3, DDS_DELETE_BATCH_SIZE=3)
+    def test_background_delete(self):
+        url = reverse('dds:delete_type', kwargs={'pk': self.type.pk})
+        response = self.client.post(url)
+        job = Job.objects.get()
+        self.assertRedirects(response, f'{reverse("dds:job", kwargs={"pk": job.pk})}?next=%2Ftypes%2F')
+        self.assertTrue(Type.objects.filter(pk=self.type.pk).exists())
+
+        # Повторное подтверждение не создает вторую задачу, страница показывает прогресс
+        self.client.post(url)
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertEqual(self.client.get(url).context['job'], job)
+
+        with self.assertLogs('dds.jobs', level='INFO'):
+            self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual((job.processed, job.total), (8, 8))
+        self.assertFalse(Type.objects.filter(pk=self.type.pk).exists())
+        self.assertFalse(Subcategory.objects.filter(pk=self.subcategory.pk).exists())
+        self.assertEqual(CashFlow.objects.count(), 8)
+        self.assertEqual(DailyCashFlowAggregate.objects.aggregate(count=Sum('operations_count'))['count'], 8)
+        # Пачки пересчитывают только свои дни и сдвигают последующие остатки
+        balances = list(DailyBalance.objects.order_by('date').values_list('date', 'amount', 'operations_count', 'balance'))
+        self.assertEqual(balances[-1][-1], Decimal('800'))
+        DailyBalance.objects.rebuild()
+        self.assertEqual(
+            list(DailyBalance.objects.order_by('date').values_list('date', 'amount', 'operations_count', 'balance')),
+            balances,
+        )
+        self.assertContains(self.client.get(reverse('dds:job', kwargs={'pk': job.pk})), '100%')
+
+    def test_prune_changes(self):
+        # Журнал пополняется и без снимка dds.analytics; run_jobs удаляет записи старше срока хранения
+        self.assertTrue(CashFlowChange.objects.exists())
+        CashFlowChange.objects.update(changed_at=timezone.now() - datetime.timedelta(days=31))
+        CashFlowChange.objects.record(dates=[datetime.date(2024, 5, 1)])
+        out = StringIO()
+        call_command('run_jobs', '--once', stdout=out)
+        self.assertIn('Удалено записей журнала изменений', out.getvalue())
+        self.assertEqual(list(CashFlowChange.objects.values_list('date_from', flat=True)), [datetime.date(2024, 5, 1)])
+
+    def test_failed_and_stale_jobs(self):
+        failed = Job.objects.create(kind='unknown')
+        stale = Job.objects.create(kind='delete_reference', status=Job.RUNNING, params={'model': 'dds.type', 'pk': 0})
+        Job.objects.filter(pk=stale.pk).update(updated_at=stale.updated_at - datetime.timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 1)
+        with self.assertLogs('dds.jobs', level='INFO') as logs:
+            self.assertEqual(run_pending(), 2)
+        self.assertIn('LookupError', logs.output[0])
+        failed.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual(failed.status, Job.FAILED)
+        self.assertIn('LookupError', failed.error)
+        self.assertEqual(stale.status, Job.DONE)
+
+
+class DailyAggregateTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет инкрементальное обновление дневных агрегатов в CashFlow.save/delete.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.personal = Status.objects.create(status_name='Личное')
+        cls.type = Type.objects.create(type_name='Списание')
+        cls.category = Category.objects.create(type=cls.type, category_name='Маркетинг')
+        cls.subcategory = Subcategory.objects.create(category=cls.category, subcategory_name='Avito')
+
+    def aggregates(self):
+        return list(
+            DailyCashFlowAggregate.objects.order_by('date', 'status_id')
+            .values_list('date', 'status_id', 'total_amount', 'operations_count')
+        )
+
+    def assert_rebuild_matches(self):
+        incremental = self.aggregates()
+        DailyCashFlowAggregate.objects.rebuild()
+        self.assertEqual(self.aggregates(), incremental)
+
+    def test_string_values(self):
+        # Значения строками, как при создании операции из кода или JSON без формы
+        cash_flow = CashFlow.objects.create(
+            creation_date='2024-06-01',
+            status_id=str(self.status.pk),
+            type_id=self.type.pk,
+            category_id=self.category.pk,
+            subcategory_id=self.subcategory.pk,
+            amount='100.50',
+        )
+        self.assertEqual(self.aggregates(), [(datetime.date(2024, 6, 1), self.status.pk, Decimal('100.50'), 1)])
+
+        cash_flow.amount = '40.255'
+        cash_flow.creation_date = '2024-06-02'
+        cash_flow.save()
+        self.assertEqual(self.aggregates(), [(datetime.date(2024, 6, 2), self.status.pk, Decimal('40.26'), 1)])
+        self.assert_rebuild_matches()
+
+        cash_flow.status = self.personal
+        cash_flow.save()
+        self.assertEqual(self.aggregates(), [(datetime.date(2024, 6, 2), self.personal.pk, Decimal('40.26'), 1)])
+
+        CashFlow.objects.get(pk=cash_flow.pk).delete()
+        self.assertEqual(self.aggregates(), [])
+
+    def test_stale_instance_delete(self):
+        cash_flow = CashFlow.objects.create(
+            creation_date='2024-06-01',
+            status=self.status,
+            type=self.type,
+            category=self.category,
+            subcategory=self.subcategory,
+            amount=100,
+        )
+        CashFlow.objects.create(
+            creation_date='2024-06-01',
+            status=self.status,
+            type=self.type,
+            category=self.category,
+            subcategory=self.subcategory,
+            amount=30,
+        )
+        CashFlow.objects.filter(pk=cash_flow.pk).update(amount=70)
+        DailyCashFlowAggregate.objects.rebuild(dates=[datetime.date(2024, 6, 1)])
+        # Экземпляр хранит сумму 100, в базе данных - 70
+        cash_flow.delete()
+        self.assertEqual(self.aggregates(), [(datetime.date(2024, 6, 1), self.status.pk, Decimal('30.00'), 1)])
+        self.assert_rebuild_matches()
+
+
+class DailyBalanceTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет остатки по дням: инкрементальное обновление, пересчет
+    и остаток после каждой операции на главной странице.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.income = Type.objects.create(type_name='Пополнение', sign=Type.INCOME)
+        cls.expense = Type.objects.create(type_name='Списание', sign=Type.EXPENSE)
+        cls.income_category = Category.objects.create(type=cls.income, category_name='Продажи')
+        cls.expense_category = Category.objects.create(type=cls.expense, category_name='Маркетинг')
+        cls.income_subcategory = Subcategory.objects.create(category=cls.income_category, subcategory_name='Товар')
+        cls.expense_subcategory = Subcategory.objects.create(category=cls.expense_category, subcategory_name='Avito')
+
+    def create(self, date, amount, income=True):
+        return CashFlow.objects.create(
+            creation_date=date,
+            status=self.status,
+            type=self.income if income else self.expense,
+            category=self.income_category if income else self.expense_category,
+            subcategory=self.income_subcategory if income else self.expense_subcategory,
+            amount=amount,
+        )
+
+    def balances(self):
+        return {str(row.date): row.balance for row in DailyBalance.objects.order_by('date')}
+
+    def assert_rebuild_matches(self):
+        incremental = self.balances()
+        DailyBalance.objects.rebuild()
+        self.assertEqual(self.balances(), incremental)
+
+    def test_incremental(self):
+        self.create('2024-05-01', 1000)
+        expense = self.create('2024-05-02', 300, income=False)
+        self.create('2024-05-03', 50)
+        self.assertEqual(self.balances(), {
+            '2024-05-01': Decimal('1000'), '2024-05-02': Decimal('700'), '2024-05-03': Decimal('750'),
+        })
+        self.assertEqual(DailyBalance.objects.balance_at(datetime.date(2024, 5, 2)), Decimal('700'))
+        self.assertEqual(DailyBalance.objects.balance_at(datetime.date(2024, 4, 30)), Decimal('0'))
+
+        # Перенос даты списания через форму редактирования
+        form = UpdateCashFlowForm(instance=expense, data={
+            'creation_date': '2024-04-30',
+            'status': self.status.pk,
+            'type': self.expense.pk,
+            'category': self.expense_category.pk,
+            'subcategory': self.expense_subcategory.pk,
+            'amount': '300.00',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self.balances(), {
+            '2024-04-30': Decimal('-300'), '2024-05-01': Decimal('700'), '2024-05-03': Decimal('750'),
+        })
+        self.assert_rebuild_matches()
+
+        expense.delete()
+        self.assertEqual(DailyBalance.objects.balance_at(datetime.date(2024, 5, 3)), Decimal('1050'))
+        self.assert_rebuild_matches()
+
+    def test_update_single_shift(self):
+        self.create('2024-05-01', 1000)
+        expense = self.create('2024-05-02', 300, income=False)
+        self.create('2024-05-03', 50)
+
+        # Изменение суммы без смены даты: один UPDATE агрегата и один сдвиг остатков, без запроса типа
+        expense.amount = Decimal('200')
+        with CaptureQueriesContext(connection) as queries:
+            expense.save()
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertFalse([query for query in sql if 'FROM "dds_type"' in query and 'JOIN' not in query])
+        self.assertEqual(sum(query.startswith('UPDATE "dds_dailycashflowaggregate"') for query in sql), 1)
+        self.assertEqual(sum(query.startswith('UPDATE "dds_dailybalance" SET "balance"') for query in sql), 1)
+        self.assertEqual(self.balances(), {
+            '2024-05-01': Decimal('1000'), '2024-05-02': Decimal('800'), '2024-05-03': Decimal('850'),
+        })
+
+        # Изменение комментария не затрагивает агрегаты, остатки и журнал изменений
+        changes = CashFlowChange.objects.count()
+        expense.comment = 'Реклама'
+        with CaptureQueriesContext(connection) as queries:
+            expense.save()
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if 'dds_dailybalance' in query['sql'] or 'dds_dailycashflowaggregate' in query['sql']
+        ])
+        self.assertEqual(CashFlowChange.objects.count(), changes)
+        self.assert_rebuild_matches()
+
+    def test_type_sign_change(self):
+        self.create('2024-05-01', 1000)
+        self.create('2024-05-02', 300, income=False)
+        self.expense.sign = Type.INCOME
+        self.expense.save()
+        self.assertEqual(DailyBalance.objects.balance_at(datetime.date(2024, 5, 2)), Decimal('1300'))
+
+    def test_reference_delete(self):
+        self.create('2024-05-01', 1000)
+        self.create('2024-05-02', 300, income=False)
+        self.client.post(reverse('dds:delete_type', kwargs={'pk': self.expense.pk}))
+        self.assertEqual(self.balances(), {'2024-05-01': Decimal('1000')})
+
+    def test_reference_orm_delete(self):
+        self.create('2024-05-01', 1000)
+        self.create('2024-05-02', 300, income=False)
+        self.create('2024-05-03', 50)
+        other = Subcategory.objects.create(category=self.expense_category, subcategory_name='Farpost')
+        CashFlow.objects.create(
+            creation_date='2024-05-04',
+            status=self.status,
+            type=self.expense,
+            category=self.expense_category,
+            subcategory=other,
+            amount=20,
+        )
+        # Удаление через ORM (как в админке) вне представлений удаления
+        Subcategory.objects.filter(pk=other.pk).delete()
+        self.assertEqual(self.balances(), {
+            '2024-05-01': Decimal('1000'), '2024-05-02': Decimal('700'), '2024-05-03': Decimal('750'),
+        })
+        # Каскад тип -> категория -> подкатегория пересчитывает остатки один раз
+        with CaptureQueriesContext(connection) as queries:
+            self.expense.delete()
+        self.assertEqual(self.balances(), {'2024-05-01': Decimal('1000'), '2024-05-03': Decimal('1050')})
+        self.assertEqual(sum('DELETE FROM "dds_dailybalance"' in query['sql'] for query in queries), 1)
+        self.assertEqual(
+            list(CashFlowChange.objects.filter(date_to__isnull=False).order_by('-id').values_list('date_from', 'date_to')[:1]),
+            [(datetime.date(2024, 5, 2), datetime.date(2024, 5, 2))],
+        )
+        self.assert_rebuild_matches()
+
+    def test_running_balance(self):
+        self.create('2024-05-01', 1000)
+        self.create('2024-05-02', 300, income=False)
+        self.create('2024-05-02', 200)
+        self.create('2024-05-03', 50, income=False)
+        response = self.client.get(reverse('dds:index'), {'date_to': '2024-05-02'})
+        self.assertEqual(response.context['balance'], Decimal('900'))
+        response = self.client.get(reverse('dds:index'))
+        self.assertEqual(
+            [row.running_balance for row in response.context['object_list']],
+            [Decimal('850'), Decimal('900'), Decimal('700'), Decimal('1000')],
+        )
+        # С фильтром остаток после операции не меняется
+        response = self.client.get(reverse('dds:index'), {'type_obj': self.expense.pk})
+        self.assertEqual(
+            [row.running_balance for row in response.context['object_list']],
+            [Decimal('850'), Decimal('700')],
+        )
+
+
+class AsyncViewsTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет, что асинхронные представления (DDS_ASYNC_VIEWS) отдают
+    те же данные, что и синхронные.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.type = Type.objects.create(type_name='Списание', sign=Type.EXPENSE)
+        cls.category = Category.objects.create(type=cls.type, category_name='Маркетинг')
+        cls.subcategory = Subcategory.objects.create(category=cls.category, subcategory_name='Avito')
+        for day in (1, 2, 2, 3):
+            CashFlow.objects.create(
+                creation_date=f'2024-05-0{day}',
+                status=cls.status,
+                type=cls.type,
+                category=cls.category,
+                subcategory=cls.subcategory,
+                amount=100,
+            )
+
+    async def test_index(self):
+        for params in {}, {'page': 'last'}, {'pagination': 'cursor'}, {'date_to': '2024-05-02'}:
+            with self.subTest(params=params):
+                expected = await sync_to_async(IndexView.as_view())(RequestFactory().get('/', params))
+                response = await AsyncIndexView.as_view()(AsyncRequestFactory().get('/', params))
+                self.assertEqual(
+                    [(row.pk, row.running_balance) for row in response.context_data['object_list']],
+                    [(row.pk, row.running_balance) for row in expected.context_data['object_list']],
+                )
+                self.assertEqual(response.context_data['balance'], expected.context_data['balance'])
+        with self.assertRaises(Http404):
+            await AsyncIndexView.as_view()(AsyncRequestFactory().get('/', {'page': 100}))
+
+    @override_settings(
+        DDS_FRAGMENT_CACHE_TIMEOUT=0,
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'dds_test_cache'}},
+    )
+    def test_index_without_fragment_cache(self):
+        # Кеш в базе данных: синхронное чтение версий в цикле событий вызвало бы SynchronousOnlyOperation
+        call_command('createcachetable', stdout=StringIO())
+        response = async_to_sync(AsyncIndexView.as_view())(AsyncRequestFactory().get('/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('table_html', response.context_data)
+        self.assertEqual(len(response.context_data['object_list']), 4)
+
+    async def test_reference_lists(self):
+        response = await AsyncStatusesView.as_view()(AsyncRequestFactory().get('/'))
+        self.assertEqual(list(response.context_data['object_list']), [self.status])
+
+    async def test_api(self):
+        url = f'/api/category/?type={self.type.pk}&fields=id,category_name'
+        expected = await sync_to_async(self.client.get)(url)
+        response = await AsyncCategoryListView.as_view()(AsyncRequestFactory().get(url))
+        self.assertEqual(json.loads(response.content), expected.json())
+        self.assertEqual(response['ETag'], expected['ETag'])
+        response = await AsyncCategoryListView.as_view()(
+            AsyncRequestFactory().get(url, headers={'If-None-Match': expected['ETag']})
+        )
+        self.assertEqual(response.status_code, 304)
+        response = await AsyncCategoryListView.as_view()(AsyncRequestFactory().get('/api/category/?fields=unknown'))
+        self.assertEqual(response.status_code, 400)
+
+
+class FragmentCacheTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет кеш фрагментов главной страницы: повторный запрос без выборки
+    операций и инвалидацию при изменении операций и справочников через представления.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.type = Type.objects.create(type_name='Списание', sign=Type.EXPENSE)
+        cls.category = Category.objects.create(type=cls.type, category_name='Маркетинг')
+        cls.subcategory = Subcategory.objects.create(category=cls.category, subcategory_name='Avito')
+        cls.operation = CashFlow.objects.create(
+            creation_date='2024-05-01',
+            status=cls.status,
+            type=cls.type,
+            category=cls.category,
+            subcategory=cls.subcategory,
+            amount=100,
+            comment='Размещение объявлений',
+        )
+
+    def form_data(self, **data):
+        return {
+            'creation_date': '2024-05-02',
+            'status': self.status.pk,
+            'type': self.type.pk,
+            'category': self.category.pk,
+            'subcategory': self.subcategory.pk,
+            'amount': '250.00',
+            **data,
+        }
+
+    def test_hit(self):
+        expected = self.client.get(reverse('dds:index'), {'page': 1})
+        # Только остаток на дату
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('dds:index'), {'page': 1})
+        self.assertIn('table_html', response.context)
+        self.assertEqual(without_csrf_token(response.content), without_csrf_token(expected.content))
+        # Другие параметры - другой фрагмент
+        response = self.client.get(reverse('dds:index'), {'status': self.status.pk})
+        self.assertNotIn('table_html', response.context)
+
+    async def test_async_hit(self):
+        expected = await sync_to_async(self.client.get)(reverse('dds:index'))
+        response = await AsyncIndexView.as_view()(AsyncRequestFactory().get('/'))
+        self.assertIn('table_html', response.context_data)
+        self.assertEqual(without_csrf_token(response.render().content), without_csrf_token(expected.content))
+
+    def test_invalidation(self):
+        index = reverse('dds:index')
+        self.client.get(index)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('dds:create_dds'), self.form_data(comment='Баннер на сайте'))
+        self.assertContains(self.client.get(index), 'Баннер на сайте')
+        operation = CashFlow.objects.get(comment='Баннер на сайте')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('dds:update_dds', kwargs={'pk': operation.pk}),
+                self.form_data(comment='Баннер в рассылке'),
+            )
+        response = self.client.get(index)
+        self.assertContains(response, 'Баннер в рассылке')
+        self.assertNotContains(response, 'Баннер на сайте')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('dds:delete_dds', kwargs={'pk': operation.pk}))
+        self.assertNotContains(self.client.get(index), 'Баннер в рассылке')
+
+        # Переименование справочника меняет и таблицу, и панель фильтров
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('dds:update_status', kwargs={'pk': self.status.pk}), {'status_name': 'Личное'})
+        response = self.client.get(index)
+        self.assertNotContains(response, 'Бизнес')
+        # Фильтр, панель массовых действий и строка таблицы
+        self.assertContains(response, 'Личное', count=3)
+
+
+class ArchiveTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет архив операций: перенос командой archive_cashflows, неизменность
+    агрегатов и остатков и чтение архива главной страницей и выгрузкой.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.income = Type.objects.create(type_name='Пополнение', sign=Type.INCOME)
+        cls.expense = Type.objects.create(type_name='Списание', sign=Type.EXPENSE)
+        cls.income_category = Category.objects.create(type=cls.income, category_name='Продажи')
+        cls.expense_category = Category.objects.create(type=cls.expense, category_name='Маркетинг')
+        cls.income_subcategory = Subcategory.objects.create(category=cls.income_category, subcategory_name='Товар')
+        cls.expense_subcategory = Subcategory.objects.create(category=cls.expense_category, subcategory_name='Avito')
+        for date, amount, income, comment in (
+            ('2024-01-10', 1000, True, 'Оплата заказа'),
+            ('2024-01-10', 200, False, 'Баннер'),
+            ('2024-02-05', 300, False, 'Рассылка'),
+            ('2024-03-01', 500, True, 'Оплата заказа'),
+            ('2024-03-02', 100, False, 'Баннер'),
+        ):
+            CashFlow.objects.create(
+                creation_date=date,
+                status=cls.status,
+                type=cls.income if income else cls.expense,
+                category=cls.income_category if income else cls.expense_category,
+                subcategory=cls.income_subcategory if income else cls.expense_subcategory,
+                amount=amount,
+                comment=comment,
+            )
+
+    def archive(self, before='2024-02-10'):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_cashflows', '--before', before, '--batch-size', '2', stdout=StringIO())
+
+    def index_rows(self, **params):
+        response = self.client.get(reverse('dds:index'), params)
+        return [(row.pk, row.running_balance) for row in response.context['object_list']]
+
+    def aggregates(self):
+        return list(DailyCashFlowAggregate.objects.order_by('date', 'type_id').values_list(
+            'date', 'type_id', 'total_amount', 'operations_count',
+        ))
+
+    def test_archive(self):
+        expected_rows = self.index_rows(date_from='2024-01-01')
+        expected_aggregates = self.aggregates()
+        expected_balance = DailyBalance.objects.balance_at(datetime.date(2024, 3, 2))
+
+        self.archive()
+        self.assertEqual(CashFlow.objects.count(), 2)
+        self.assertEqual(ArchivedCashFlow.objects.count(), 3)
+        self.assertEqual(self.aggregates(), expected_aggregates)
+        self.assertEqual(DailyBalance.objects.balance_at(datetime.date(2024, 3, 2)), expected_balance)
+        DailyCashFlowAggregate.objects.rebuild()
+        self.assertEqual(self.aggregates(), expected_aggregates)
+
+        # Без даты "с" архив не читается
+        response = self.client.get(reverse('dds:index'))
+        self.assertEqual(len(response.context['object_list']), 2)
+        self.assertEqual(response.context['archive_boundary'], datetime.date(2024, 2, 5))
+        self.assertContains(response, 'перенесены в архив')
+        self.assertEqual(len(self.index_rows(date_from='2024-02-06')), 2)
+
+        # Дата "с" за границей архива - операции обеих таблиц с прежними остатками
+        self.assertEqual(self.index_rows(date_from='2024-01-01'), expected_rows)
+        response = self.client.get(reverse('dds:index'), {'date_from': '2024-01-01', 'pagination': 'cursor'})
+        self.assertEqual(response.context['pagination_mode'], 'offset')
+        response = self.client.get(reverse('dds:index'), {'date_from': '2024-01-01', 'type_obj': self.expense.pk})
+        rows = response.context['object_list']
+        self.assertEqual([row.archived for row in rows], [False, True, True])
+        self.assertEqual(rows[1].subcategory.subcategory_name, 'Avito')
+        self.assertContains(response, 'В архиве', count=2)
+        self.assertContains(response, 'Изменить', count=1)
+
+        response = self.client.get(reverse('dds:index'), {'date_from': '2024-01-01', 'search': 'баннер'})
+        self.assertEqual(len(response.context['object_list']), 2)
+
+        response = self.client.get(reverse('dds:export_dds'), {'date_from': '2024-01-01', 'format': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [pk for pk, _ in expected_rows])
+
+    async def test_async_index(self):
+        await sync_to_async(self.archive)()
+        params = {'date_from': '2024-01-01'}
+        expected = await sync_to_async(IndexView.as_view())(RequestFactory().get('/', params))
+        response = await AsyncIndexView.as_view()(AsyncRequestFactory().get('/', params))
+        self.assertEqual(
+            [(row.pk, row.running_balance) for row in response.context_data['object_list']],
+            [(row.pk, row.running_balance) for row in expected.context_data['object_list']],
+        )
+        self.assertEqual(len(response.context_data['object_list']), 5)
+
+    def test_reference_delete(self):
+        self.archive()
+        self.client.post(reverse('dds:delete_subcategory', kwargs={'pk': self.expense_subcategory.pk}))
+        self.assertEqual(ArchivedCashFlow.objects.count(), 1)
+        self.assertFalse(DailyCashFlowAggregate.objects.filter(type=self.expense).exists())
+
+
+@skipUnless(analytics.np is not None, 'numpy не установлен')
+class AnalyticsTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет столбцовый снимок dds.analytics: совпадение отчетов с базой данных,
+    инкрементальное обновление и использование снимка страницей отчетов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.personal = Status.objects.create(status_name='Личное')
+        cls.income = Type.objects.create(type_name='Пополнение')
+        cls.expense = Type.objects.create(type_name='Списание')
+        cls.sales = Category.objects.create(type=cls.income, category_name='Продажи')
+        cls.marketing = Category.objects.create(type=cls.expense, category_name='Маркетинг')
+        cls.goods = Subcategory.objects.create(category=cls.sales, subcategory_name='Товар')
+        cls.avito = Subcategory.objects.create(category=cls.marketing, subcategory_name='Avito')
+        cls.farpost = Subcategory.objects.create(category=cls.marketing, subcategory_name='Farpost')
+        subcategories = cls.goods, cls.avito, cls.farpost
+        for i in range(40):
+            subcategory = subcategories[i % 3]
+            CashFlow.objects.create(
+                creation_date=datetime.date(2023, 11, 27) + datetime.timedelta(days=i * 5),
+                status=cls.personal if i % 4 == 0 else cls.status,
+                type=subcategory.category.type,
+                category=subcategory.category,
+                subcategory=subcategory,
+                amount=Decimal(100 + i * 17) + Decimal('0.25') * (i % 4),
+            )
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(DDS_ANALYTICS_DIR=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def assertReportsMatch(self):
+        for period in PERIODS:
+            for group_by in (), ('type',), ('category', 'subcategory', 'status'):
+                for filters in {}, {'date_from': '2024-01-03', 'date_to': '2024-04-30'}, {'category': str(self.marketing.pk)}:
+                    expected = build_report(period, group_by, filters)
+                    with override_settings(DDS_REPORT_BACKEND='analytics'):
+                        self.assertEqual(build_report(period, group_by, filters), expected, (period, group_by, filters))
+
+    def test_report_matches_database(self):
+        snapshot, stats = analytics.refresh_snapshot()
+        self.assertTrue(stats['full'])
+        self.assertEqual(len(snapshot), 40)
+        self.assertEqual(snapshot.columns['amount'].dtype, analytics.np.int64)
+        self.assertReportsMatch()
+
+        result = snapshot.aggregate('quarter', ('subcategory',), percentiles=(50, 90), compare=True)
+        amounts = analytics.np.array(
+            CashFlow.objects.filter(subcategory=self.avito, creation_date__lt='2024-01-01')
+            .values_list('amount', flat=True),
+            dtype=float,
+        ) * 100
+        position = list(zip(result['period'].tolist(), result['subcategory'].tolist())).index(
+            (datetime.date(2023, 10, 1).toordinal(), self.avito.pk)
+        )
+        self.assertAlmostEqual(result['p50'][position], analytics.np.percentile(amounts, 50))
+        self.assertAlmostEqual(result['p90'][position], analytics.np.percentile(amounts, 90))
+        next_position = list(zip(result['period'].tolist(), result['subcategory'].tolist())).index(
+            (datetime.date(2024, 1, 1).toordinal(), self.avito.pk)
+        )
+        self.assertEqual(result['previous_amount'][next_position], result['amount'][position])
+        self.assertEqual(result['previous_amount'][position], 0)
+
+    def test_incremental_refresh(self):
+        analytics.refresh_snapshot()
+        first, second, third = CashFlow.objects.order_by('id')[:3]
+        first.subcategory = self.farpost
+        first.category = self.marketing
+        first.type = self.expense
+        first.save()
+        second.delete()
+        third.creation_date = datetime.date(2025, 1, 1)
+        third.save()
+        CashFlow.objects.create(
+            creation_date='2024-06-01',
+            status=self.status,
+            type=self.income,
+            category=self.sales,
+            subcategory=self.goods,
+            amount=Decimal('10.10'),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_cashflows', '--before', '2024-01-15', stdout=StringIO())
+
+        snapshot, stats = analytics.refresh_snapshot()
+        self.assertEqual(stats['appended'], 1)
+        # Даты из журнала изменений: три измененные операции (одна сменила дату) и новая
+        self.assertEqual(stats['reloaded_dates'], 5)
+        self.assertEqual(len(snapshot), 40)
+        self.assertEqual(snapshot.meta['watermark'], CashFlow.objects.order_by('-id').values_list('id', flat=True)[0])
+        self.assertReportsMatch()
+
+        _, stats = analytics.refresh_snapshot()
+        self.assertEqual((stats['appended'], stats['reloaded_dates']), (0, 0))
+
+    def test_offsetting_changes(self):
+        analytics.refresh_snapshot()
+        # Обмен сумм, статусов и подкатегорий двух операций одного дня не меняет итоги дня
+        first = CashFlow.objects.order_by('id')[1]
+        second = CashFlow.objects.create(
+            creation_date=first.creation_date,
+            status=self.personal if first.status == self.status else self.status,
+            type=self.expense,
+            category=self.marketing,
+            subcategory=self.farpost if first.subcategory == self.avito else self.avito,
+            amount=first.amount + 1,
+        )
+        analytics.refresh_snapshot()
+        first.amount, second.amount = second.amount, first.amount
+        first.status, second.status = second.status, first.status
+        first.subcategory, second.subcategory = second.subcategory, first.subcategory
+        first.save()
+        second.save()
+
+        snapshot, stats = analytics.refresh_snapshot()
+        self.assertEqual((stats['appended'], stats['reloaded_dates']), (0, 1))
+        self.assertReportsMatch()
+        row = snapshot.columns['id'].tolist().index(first.pk)
+        self.assertEqual(int(snapshot.columns['amount'][row]), int(first.amount * 100))
+        self.assertEqual(int(snapshot.columns['status'][row]), first.status.pk)
+
+        # Массовое изменение пересчитывает агрегаты по датам и тоже попадает в журнал
+        bulk_update_cash_flows(CashFlow.objects.filter(pk__in=[first.pk, second.pk]), status_id=self.status.pk)
+        snapshot, stats = analytics.refresh_snapshot()
+        self.assertEqual(stats['reloaded_dates'], 1)
+        row = snapshot.columns['id'].tolist().index(second.pk)
+        self.assertEqual(int(snapshot.columns['status'][row]), self.status.pk)
+
+    def test_full_rebuild_marker(self):
+        analytics.refresh_snapshot()
+        DailyCashFlowAggregate.objects.rebuild()
+        _, stats = analytics.refresh_snapshot()
+        self.assertTrue(stats['full'])
+
+        CashFlowChange.objects.update(changed_at=timezone.now() - datetime.timedelta(days=60))
+        DailyCashFlowAggregate.objects.rebuild(date_from=datetime.date(2024, 1, 1), date_to=datetime.date(2024, 2, 1))
+        _, stats = analytics.refresh_snapshot()
+        self.assertEqual((stats['full'], stats['reloaded_ranges']), (False, 1))
+        # Записи старше срока хранения удалены
+        self.assertEqual(CashFlowChange.objects.filter(date_from=None).count(), 0)
+
+    @override_settings(DDS_REPORT_BACKEND='analytics')
+    def test_report_page(self):
+        response = self.client.get(reverse('dds:reports') + '?period=year&group_by=type')
+        self.assertContains(response, 'Списание')
+        self.assertIsNotNone(analytics.open_snapshot())
+        total = response.context['report']['totals']['total_amount']
+        with self.captureOnCommitCallbacks(execute=True):
+            CashFlow.objects.create(
+                creation_date='2024-06-01',
+                status=self.status,
+                type=self.expense,
+                category=self.marketing,
+                subcategory=self.avito,
+                amount=5,
+            )
+        response = self.client.get(reverse('dds:reports') + '?period=year&group_by=type')
+        self.assertEqual(response.context['report']['totals']['total_amount'], total + 5)
+        self.assertEqual(len(analytics.open_snapshot()), 41)
+
+
+class BulkActionsTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет массовые действия главной страницы: один запрос UPDATE/DELETE,
+    проверку иерархии справочников и пересчет агрегатов и остатков.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.personal = Status.objects.create(status_name='Личное')
+        cls.income = Type.objects.create(type_name='Пополнение', sign=Type.INCOME)
+        cls.expense = Type.objects.create(type_name='Списание', sign=Type.EXPENSE)
+        cls.income_category = Category.objects.create(type=cls.income, category_name='Продажи')
+        cls.expense_category = Category.objects.create(type=cls.expense, category_name='Маркетинг')
+        cls.income_subcategory = Subcategory.objects.create(category=cls.income_category, subcategory_name='Товар')
+        cls.expense_subcategory = Subcategory.objects.create(category=cls.expense_category, subcategory_name='Avito')
+        for date, amount, income, comment in (
+            ('2024-01-10', 1000, True, 'Оплата заказа'),
+            ('2024-01-10', 200, False, 'Баннер'),
+            ('2024-02-05', 300, False, 'Рассылка'),
+            ('2024-03-01', 500, True, 'Оплата заказа'),
+            ('2024-03-02', 100, False, 'Баннер'),
+        ):
+            CashFlow.objects.create(
+                creation_date=date,
+                status=cls.status,
+                type=cls.income if income else cls.expense,
+                category=cls.income_category if income else cls.expense_category,
+                subcategory=cls.income_subcategory if income else cls.expense_subcategory,
+                amount=amount,
+                comment=comment,
+            )
+
+    def bulk(self, query='', **data):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f'{reverse("dds:bulk_dds")}?{query}', data)
+        statements = [
+            query['sql'].split(' WHERE ')[0] for query in queries.captured_queries
+            if query['sql'].startswith(('UPDATE "dds_cashflow"', 'DELETE FROM "dds_cashflow"'))
+        ]
+        return response, statements
+
+    def assert_rebuild_matches(self):
+        aggregates = list(DailyCashFlowAggregate.objects.order_by('date', 'type_id', 'status_id').values_list(
+            'date', 'status_id', 'type_id', 'category_id', 'subcategory_id', 'total_amount', 'operations_count',
+        ))
+        balances = list(DailyBalance.objects.order_by('date').values_list('date', 'balance'))
+        DailyCashFlowAggregate.objects.rebuild()
+        self.assertEqual(list(DailyCashFlowAggregate.objects.order_by('date', 'type_id', 'status_id').values_list(
+            'date', 'status_id', 'type_id', 'category_id', 'subcategory_id', 'total_amount', 'operations_count',
+        )), aggregates)
+        self.assertEqual(list(DailyBalance.objects.order_by('date').values_list('date', 'balance')), balances)
+
+    def test_status_selected(self):
+        ids = list(CashFlow.objects.filter(type=self.expense).values_list('id', flat=True)[:2])
+        query = f'type_obj={self.expense.pk}'
+        response, statements = self.bulk(query, action='status', scope='selected', ids=ids, status=self.personal.pk)
+        self.assertRedirects(response, f'{reverse("dds:index")}?{query}', fetch_redirect_response=False)
+        self.assertEqual(statements, [f'UPDATE "dds_cashflow" SET "status_id" = {self.personal.pk}'])
+        self.assertEqual(set(CashFlow.objects.filter(status=self.personal).values_list('id', flat=True)), set(ids))
+        self.assert_rebuild_matches()
+
+        response = self.client.get(response.url)
+        self.assertContains(response, 'Изменено операций: 2')
+        self.assertEqual(
+            sum(row.status_id == self.personal.pk for row in response.context['object_list']),
+            2,
+        )
+
+    def test_recategorize_filtered(self):
+        balance = DailyBalance.objects.balance_at(datetime.date(2024, 3, 2))
+        response, statements = self.bulk(
+            'search=баннер',
+            action='category',
+            scope='filtered',
+            type=self.income.pk,
+            category=self.income_category.pk,
+            subcategory=self.income_subcategory.pk,
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(CashFlow.objects.filter(type=self.income).count(), 4)
+        self.assertFalse(CashFlow.objects.filter(comment='Баннер', type=self.expense).exists())
+        # Списания по 200 и 100 стали пополнениями
+        self.assertEqual(DailyBalance.objects.balance_at(datetime.date(2024, 3, 2)), balance + 600)
+        self.assert_rebuild_matches()
+
+    def test_invalid(self):
+        response, statements = self.bulk(
+            action='category',
+            scope='filtered',
+            type=self.expense.pk,
+            category=self.income_category.pk,
+            subcategory=self.income_subcategory.pk,
+        )
+        self.assertContains(response, 'не принадлежит типу')
+        self.assertEqual(statements, [])
+        response, _ = self.bulk(action='status', scope='selected', status=self.personal.pk)
+        self.assertContains(response, 'Отметьте операции')
+        response, _ = self.bulk(action='status', scope='filtered')
+        self.assertContains(response, 'Выберите статус')
+        self.assertFalse(CashFlow.objects.filter(status=self.personal).exists())
+        self.assertEqual(self.client.get(reverse('dds:bulk_dds')).status_code, 405)
+
+    def test_delete_filtered(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_cashflows', '--before', '2024-01-15', stdout=StringIO())
+        response, statements = self.bulk(f'type_obj={self.expense.pk}', action='delete', scope='filtered')
+        self.assertEqual(statements, ['DELETE FROM "dds_cashflow"'])
+        self.assertEqual(CashFlow.objects.count(), 1)
+        # Архивные операции массовые действия не затрагивают
+        self.assertEqual(ArchivedCashFlow.objects.count(), 2)
+        self.assertEqual(
+            DailyCashFlowAggregate.objects.filter(type=self.expense).aggregate(total=Sum('total_amount'))['total'],
+            Decimal('200'),
+        )
+        self.assert_rebuild_matches()
+        self.assertContains(self.client.get(response.url), 'Удалено операций: 2')
+
+
+@override_settings(DDS_FRAGMENT_CACHE_TIMEOUT=0)
+class SearchTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Проверяет поиск операций по комментарию и названиям справочников:
+    синхронизацию индекса FTS5 триггерами, ранжирование и пагинацию.
+
+    Операции изменяются без фиксации транзакции (и в обход save), поэтому
+    кеш фрагментов главной страницы отключен.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(status_name='Бизнес')
+        cls.type = Type.objects.create(type_name='Списание', sign=Type.EXPENSE)
+        cls.marketing = Category.objects.create(type=cls.type, category_name='Маркетинг')
+        cls.office = Category.objects.create(type=cls.type, category_name='Офис')
+        cls.avito = Subcategory.objects.create(category=cls.marketing, subcategory_name='Avito')
+        cls.rent = Subcategory.objects.create(category=cls.office, subcategory_name='Аренда')
+
+    def create(self, comment, subcategory=None, date='2024-05-01'):
+        subcategory = subcategory or self.rent
+        return CashFlow.objects.create(
+            creation_date=date,
+            status=self.status,
+            type=self.type,
+            category=subcategory.category,
+            subcategory=subcategory,
+            amount=100,
+            comment=comment,
+        )
+
+    def search(self, value, **params):
+        response = self.client.get(reverse('dds:index'), {'search': value, **params})
+        return [row.pk for row in response.context['object_list']]
+
+    def test_index_sync(self):
+        operation = self.create('Оплата рекламы')
+        self.assertEqual(self.search('реклам'), [operation.pk])
+        self.assertEqual(self.search('РЕКЛАМ'), [operation.pk])
+
+        operation.comment = 'Аренда склада'
+        operation.save()
+        self.assertEqual(self.search('реклам'), [])
+        self.assertEqual(self.search('склад'), [operation.pk])
+
+        CashFlow.objects.bulk_create([CashFlow(
+            status=self.status, type=self.type, category=self.office, subcategory=self.rent,
+            amount=1, comment='Склад на юге',
+        )])
+        self.assertEqual(len(self.search('склад')), 2)
+
+        operation.delete()
+        self.assertEqual(len(self.search('склад')), 1)
+
+    def test_references_and_ranking(self):
+        by_reference = self.create(None, subcategory=self.avito, date='2024-05-03')
+        by_comment = self.create('Размещение на Avito', date='2024-05-01')
+        other = self.create('Уборка')
+        # Совпадение в комментарии выше совпадения по справочнику, несмотря на дату
+        self.assertEqual(self.search('avito'), [by_comment.pk, by_reference.pk])
+        # Слова объединяются через AND, каждое - в комментарии или в справочнике
+        self.assertEqual(self.search('маркетинг'), [by_reference.pk])
+        self.assertEqual(self.search('офис уборка'), [other.pk])
+        self.assertEqual(self.search('офис уборка', status=self.status.pk + 1), [])
+        # Строка без слов - обычный список
+        self.assertEqual(len(self.search('!!!')), 3)
+
+        # Переименование справочника не требует переиндексации
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rent.subcategory_name = 'Коммунальные платежи'
+            self.rent.save()
+        self.assertEqual(self.search('коммунал'), [other.pk, by_comment.pk])
+
+    def test_pages(self):
+        operations = [self.create(f'Реклама {index}', date=f'2024-05-0{index}') for index in range(1, 8)]
+        expected = [obj.pk for obj in reversed(operations)]
+        pages = [self.search('реклама', page=page) for page in (1, 2)]
+        self.assertEqual(pages[0] + pages[1], expected)
+
+        url = reverse('api-root:cashflow-list') + '?' + urlencode({'search': 'реклама', 'page_size': 3, 'fields': 'id'})
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids += [row['id'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(ids, expected)
+
+        response = self.client.get(reverse('dds:export_dds'), {'search': 'реклама', 'format': 'ndjson'})
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 7)
+
+
+class QueryBudgetTestCase(ReferenceCacheMixin, TestCase):
+    """
+    Обходит все маршруты dds.urls и dds.api.urls на синтетических данных (seed_dds)
+    с холодным кешем и проверяет:
+        - количество запросов не превышает бюджета маршрута (QUERY_BUDGETS)
+          и не растет, когда операций и справочников становится больше
+        - планы запросов к dds_cashflow (EXPLAIN QUERY PLAN, только SQLite)
+          не содержат полного просмотра таблицы
+
+    Маршрут без бюджета считается ошибкой: новый маршрут должен получить бюджет.
+    Дополнительные параметры запросов маршрутов - в URL_VARIANTS; значения
+    {status}, {type}, {category}, {subcategory} подставляются из данных.
+    Запросы на изменение (POST, PATCH) проверяются отдельно по WRITE_BUDGETS;
+    маршруты без GET перечислены в GET_EXCLUDED.
+    """
+    QUERY_BUDGETS = {
+        'dds:index': 11,
+        'dds:create_dds': 4,
+        'dds:update_dds': 5,
+        'dds:delete_dds': 2,
+        'dds:export_dds': 2,
+        'dds:reports': 5,
+        'dds:job': 1,
+        'dds:statuses': 4,
+        'dds:create_status': 0,
+        'dds:update_status': 1,
+        'dds:delete_status': 3,
+        'dds:types': 4,
+        'dds:create_type': 0,
+        'dds:update_type': 1,
+        'dds:delete_type': 7,
+        'dds:categories': 4,
+        'dds:create_category': 1,
+        'dds:update_category': 1,
+        'dds:delete_category': 7,
+        'dds:subcategories': 4,
+        'dds:create_subcategory': 1,
+        'dds:update_subcategory': 1,
+        'dds:delete_subcategory': 3,
+        'api-root:api-root': 0,
+        'api-root:reports': 5,
+        'api-root:category-list': 4,
+        'api-root:category-detail': 4,
+        'api-root:subcategory-list': 4,
+        'api-root:subcategory-detail': 4,
+        'api-root:hierarchy-list': 4,
+        'api-root:cashflow-list': 5,
+        'api-root:cashflow-detail': 1,
+    }
+    # Маршруты, у которых нет GET: проверяются только запросами из WRITE_BUDGETS
+    GET_EXCLUDED = {
+        'dds:bulk_dds': 'принимает только POST формы массовых действий',
+        'api-root:cashflow-bulk': 'принимает только POST (создание) и PATCH (изменение)',
+    }
+    # Бюджеты запросов на изменение: (маршрут, метод) -> количество SQL-запросов,
+    # включая обработчики on_commit
+    WRITE_BUDGETS = {
+        ('dds:create_dds', 'post'): 21,
+        ('dds:bulk_dds', 'post'): 24,
+        ('dds:create_status', 'post'): 1,
+        ('dds:create_type', 'post'): 3,
+        ('dds:create_category', 'post'): 3,
+        ('dds:create_subcategory', 'post'): 3,
+        ('api-root:cashflow-list', 'post'): 19,
+        ('api-root:cashflow-bulk', 'post'): 23,
+        ('api-root:cashflow-bulk', 'patch'): 26,
+    }
+    URL_VARIANTS = {
+        'dds:index': [
+            'page=2',
+            'pagination=cursor',
+            'status={status}&type_obj={type}&date_from=2020-01-01',
+            'category={category}&subcategory={subcategory}',
+            'search=товар',
+            # Дата "с" за границей архива
+            'date_from=2000-01-01',
+        ],
+        'dds:export_dds': ['format=ndjson&category={category}'],
+        'dds:reports': ['period=day&group_by=type,category,subcategory'],
+        'api-root:reports': ['layout=pivot&group_by=category'],
+        'api-root:subcategory-list': ['category={category}'],
+        'api-root:cashflow-list': ['type_obj={type}', 'search=товар'],
+    }
+
+    def seed(self, rows, seed):
+        call_command('seed_dds', rows=rows, seed=seed, years=3, stdout=StringIO())
+
+    def walk(self, patterns, namespace):
+        """
+        Возвращает маршруты: (имя, класс представления, параметры пути).
+        Варианты с суффиксом формата (.json) пропускаются.
+        """
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from self.walk(pattern.url_patterns, namespace)
+                continue
+            params = list(pattern.pattern.regex.groupindex)
+            if 'format' in params:
+                continue
+            callback = pattern.callback
+            view_class = getattr(callback, 'view_class', None) or getattr(callback, 'cls', None)
+            yield f'{namespace}:{pattern.name}', view_class, params
+
+    def route_model(self, view_class):
+        model = getattr(view_class, 'model', None)
+        if model is None and getattr(view_class, 'queryset', None) is not None:
+            model = view_class.queryset.model
+        if model is None:
+            model = view_class.serializer_class.Meta.model
+        return model
+
+    def urls(self):
+        """
+        Возвращает {маршрут: [адреса]} для всех маршрутов.
+        """
+        values = {
+            'status': Status.objects.order_by('pk').first().pk,
+            'type': Type.objects.order_by('pk').first().pk,
+            'category': Category.objects.order_by('pk').first().pk,
+            'subcategory': Subcategory.objects.order_by('pk').first().pk,
+        }
+        routes = {}
+        for namespace, module in ('dds', dds_urls), ('api-root', api_urls):
+            for name, view_class, params in self.walk(module.urlpatterns, namespace):
+                kwargs = {}
+                if 'pk' in params:
+                    kwargs['pk'] = self.route_model(view_class).objects.order_by('pk').values_list('pk', flat=True)[0]
+                url = reverse(name, kwargs=kwargs)
+                routes[name] = [url] + [f'{url}?{query.format(**values)}' for query in self.URL_VARIANTS.get(name, ())]
+        return routes
+
+    def measure(self):
+        """
+        Выполняет GET всех адресов с холодным кешем.
+
+        Returns:
+            dict: {маршрут: [(адрес, список SQL запросов)]}
+        """
+        result = {}
+        for name, urls in self.urls().items():
+            if name in self.GET_EXCLUDED:
+                continue
+            for url in urls:
+                cache.clear()
+                reference_cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertEqual(response.status_code, 200, url)
+                result.setdefault(name, []).append((url, [query['sql'] for query in queries.captured_queries]))
+        return result
+
+    def write_request(self, name, method):
+        """
+        Возвращает адрес и параметры запроса на изменение для маршрута из WRITE_BUDGETS.
+        Справочники операций берутся одной ветки иерархии.
+        """
+        subcategory = Subcategory.objects.select_related('category').order_by('pk').first()
+        references = {
+            'status': Status.objects.order_by('pk').first().pk,
+            'type': subcategory.category.type_id,
+            'category': subcategory.category_id,
+            'subcategory': subcategory.pk,
+        }
+        ids = list(CashFlow.objects.order_by('pk').values_list('pk', flat=True)[:2])
+        url = reverse(name)
+        if name == 'dds:create_dds':
+            data = {'creation_date': '2024-05-02', 'amount': '250.00', 'comment': 'Бюджет', **references}
+        elif name == 'dds:bulk_dds':
+            url = f'{url}?category={references["category"]}'
+            data = {'action': 'status', 'scope': 'filtered', 'status': references['status']}
+        elif name == 'dds:create_status':
+            data = {'status_name': 'Новый статус'}
+        elif name == 'dds:create_type':
+            data = {'type_name': 'Новый тип', 'sign': Type.EXPENSE}
+        elif name == 'dds:create_category':
+            data = {'type': references['type'], 'category_name': 'Новая категория'}
+        elif name == 'dds:create_subcategory':
+            data = {'category': references['category'], 'subcategory_name': 'Новая подкатегория'}
+        elif name == 'api-root:cashflow-list':
+            data = {'creation_date': '2024-05-02', 'amount': '250.00', **references}
+        elif method == 'post':
+            data = [{'creation_date': f'2024-05-0{day}', 'amount': '10.00', **references} for day in (1, 2, 3)]
+        else:
+            data = [{'id': pk, 'amount': '20.00', 'creation_date': '2024-05-04'} for pk in ids]
+        if name.startswith('api-root:'):
+            return url, {'data': json.dumps(data), 'content_type': 'application/json'}
+        return url, {'data': data}
+
+    def measure_writes(self):
+        """
+        Выполняет запросы на изменение из WRITE_BUDGETS с холодным кешем
+        и откатывает их.
+
+        Returns:
+            dict: {(маршрут, метод): [(адрес, список SQL запросов)]}
+        """
+        result = {}
+        for name, method in self.WRITE_BUDGETS:
+            url, kwargs = self.write_request(name, method)
+            cache.clear()
+            reference_cache.clear()
+            # Изменения откатываются, чтобы не влиять на следующие замеры
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    with self.captureOnCommitCallbacks(execute=True):
+                        response = getattr(self.client, method)(url, **kwargs)
+                transaction.set_rollback(True)
+            # Формы перенаправляют после сохранения, API создает (201) или изменяет (200)
+            expected = 200 if method == 'patch' else 201 if name.startswith('api-root:') else 302
+            self.assertEqual(response.status_code, expected, f'{method.upper()} {url}: {response.content[:500]}')
+            result[name, method] = [(f'{method.upper()} {url}', [query['sql'] for query in queries.captured_queries])]
+        return result
+
+    def add_references(self, count):
+        """
+        Добавляет справочники, чтобы списки справочников тоже росли.
+        """
+        type_obj = Type.objects.order_by('pk').first()
+        for i in range(count):
+            Status.objects.create(status_name=f'Статус {i}')
+            category = Category.objects.create(type=type_obj, category_name=f'Категория {i}')
+            Subcategory.objects.create(category=category, subcategory_name=f'Подкатегория {i}')
+
+    def test_query_budget(self):
+        self.seed(60, seed=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_cashflows', '--keep-days', '730', stdout=StringIO())
+        Job.objects.create(kind='delete_reference', status=Job.DONE, description='Удаление справочника')
+        small = self.measure()
+
+        self.add_references(10)
+        self.seed(600, seed=2)
+        large = self.measure()
+        large_writes = self.measure_writes()
+
+        self.assertEqual(sorted(large), sorted(self.QUERY_BUDGETS), 'Маршруты без бюджета запросов')
+        write_routes = {name for name, method in self.WRITE_BUDGETS}
+        self.assertEqual(set(self.GET_EXCLUDED) - write_routes, set(), 'Маршруты без GET и без WRITE_BUDGETS')
+        # Для запросов на изменение проверяется только бюджет: остатки по дням
+        # пересчитываются пачками, и число INSERT зависит от количества дней после
+        # измененной даты
+        for name, measurements in large_writes.items():
+            for url, queries in measurements:
+                self.assertLessEqual(
+                    len(queries), self.WRITE_BUDGETS[name],
+                    f'{url}: {len(queries)} запросов при бюджете {self.WRITE_BUDGETS[name]}\n' + '\n'.join(queries),
+                )
+        for name, measurements in large.items():
+            for (url, queries), (_, small_queries) in zip(measurements, small[name]):
+                self.assertLessEqual(
+                    len(queries), self.QUERY_BUDGETS[name],
+                    f'{url}: {len(queries)} запросов при бюджете {self.QUERY_BUDGETS[name]}\n' + '\n'.join(queries),
+                )
+                self.assertLessEqual(
+                    len(queries), len(small_queries),
+                    f'{url}: количество запросов растет с данными\n' + '\n'.join(queries),
+                )
+
+        if connection.vendor == 'sqlite':
+            self.assert_plans({**large, **large_writes})
+
+    def assert_plans(self, measurements):
+        """
+        Проверяет EXPLAIN QUERY PLAN запросов SELECT к dds_cashflow.
+        """
+        scans = []
+        with connection.cursor() as cursor:
+            for name, items in measurements.items():
+                for url, queries in items:
+                    for sql in queries:
+                        if not sql.startswith('SELECT') or '"dds_cashflow"' not in sql:
+                            continue
+                        # Таблица в подзапросах получает псевдоним: "dds_cashflow" U0
+                        aliases = {'dds_cashflow', *re.findall(r'"dds_cashflow" (?:AS )?"?(\w+)"?', sql)}
+                        aliases.discard('WHERE')
+                        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                        for row in cursor.fetchall():
+                            detail = row[-1]
+                            match = re.match(r'SCAN (\w+)( |$)', detail)
+                            if match and match.group(1) in aliases and 'USING' not in detail:
+                                scans.append(f'{url}: {detail}\n    {sql}')
+        self.assertEqual(scans, [], 'Полный просмотр dds_cashflow:\n' + '\n'.join(scans))
+
+    def test_plan_check(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Только для SQLite')
+        indexed = 'SELECT "dds_cashflow"."id" FROM "dds_cashflow" ORDER BY "dds_cashflow"."creation_date" DESC LIMIT 5'
+        self.assert_plans({'index': [('/', [indexed])]})
+        # Фильтр по комментарию без индекса - полный просмотр, в том числе в подзапросе с псевдонимом
+        for sql in (
+            'SELECT "dds_cashflow"."id" FROM "dds_cashflow" WHERE "dds_cashflow"."comment" = \'x\'',
+            'SELECT COUNT(*) FROM "dds_status" WHERE "dds_status"."id" IN '
+            '(SELECT U0."status_id" FROM "dds_cashflow" U0 WHERE U0."comment" = \'x\')',
+        ):
+            with self.assertRaises(AssertionError):
+                self.assert_plans({'index': [('/', [sql])]})
 
-# Create your tests here.
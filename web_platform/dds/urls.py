@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import (
@@ -5,6 +6,10 @@ from .views import (
     CreateDdsView,
     UpdateDdsView,
     DeleteDdsView,
+    BulkDdsView,
+    ExportDdsView,
+    ReportView,
+    JobView,
     StatusesView,
     CreateStatusView,
     UpdateStatusView,
@@ -21,32 +26,44 @@ from .views import (
     CreateSubcategoryView,
     UpdateSubcategoryView,
     DeleteSubcategoryView,
+    AsyncIndexView,
+    AsyncStatusesView,
+    AsyncTypesView,
+    AsyncCategoriesView,
+    AsyncSubcategoriesView,
 )
 
+# Списки обслуживают асинхронные представления при DDS_ASYNC_VIEWS
+async_views = settings.DDS_ASYNC_VIEWS
+
 app_name = 'dds'
 
 urlpatterns = [
-    path('', IndexView.as_view(), name='index'),
+    path('', (AsyncIndexView if async_views else IndexView).as_view(), name='index'),
     path('create/dds/', CreateDdsView.as_view(), name='create_dds'),
     path('update/dds/<int:pk>', UpdateDdsView.as_view(), name='update_dds'),
     path('delete/dds/<int:pk>', DeleteDdsView.as_view(), name='delete_dds'),
+    path('bulk/dds/', BulkDdsView.as_view(), name='bulk_dds'),
+    path('export/dds/', ExportDdsView.as_view(), name='export_dds'),
+    path('reports/', ReportView.as_view(), name='reports'),
+    path('jobs/<int:pk>', JobView.as_view(), name='job'),
 
-    path('statuses/', StatusesView.as_view(), name='statuses'),
+    path('statuses/', (AsyncStatusesView if async_views else StatusesView).as_view(), name='statuses'),
     path('create/status/', CreateStatusView.as_view(), name='create_status'),
     path('update/status/<int:pk>', UpdateStatusView.as_view(), name='update_status'),
     path('delete/status/<int:pk>', DeleteStatusView.as_view(), name='delete_status'),
 
-    path('types/', TypesView.as_view(), name='types'),
+    path('types/', (AsyncTypesView if async_views else TypesView).as_view(), name='types'),
     path('create/type/', CreateTypeView.as_view(), name='create_type'),
     path('update/type/<int:pk>', UpdateTypeView.as_view(), name='update_type'),
     path('delete/type/<int:pk>', DeleteTypeView.as_view(), name='delete_type'),
 
-    path('categories/', CategoriesView.as_view(), name='categories'),
+    path('categories/', (AsyncCategoriesView if async_views else CategoriesView).as_view(), name='categories'),
     path('create/category/', CreateCategoryView.as_view(), name='create_category'),
     path('update/category/<int:pk>', UpdateCategoryView.as_view(), name='update_category'),
     path('delete/category/<int:pk>', DeleteCategoryView.as_view(), name='delete_category'),
 
-    path('subcategories/', SubcategoriesView.as_view(), name='subcategories'),
+    path('subcategories/', (AsyncSubcategoriesView if async_views else SubcategoriesView).as_view(), name='subcategories'),
     path('create/subcategory/', CreateSubcategoryView.as_view(), name='create_subcategory'),
     path('update/subcategory/<int:pk>', UpdateSubcategoryView.as_view(), name='update_subcategory'),
     path('delete/subcategory/<int:pk>', DeleteSubcategoryView.as_view(), name='delete_subcategory'),
@@ -0,0 +1,87 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def get_cache():
+    """
+    Возвращает кеш Django, в котором хранятся счетчики версий таблиц.
+
+    Версия таблицы увеличивается после фиксации каждой транзакции, изменившей
+    таблицу, и служит ключом инвалидации: снимка справочников, отчетов, ETag API.
+
+    Для нескольких процессов (gunicorn, uvicorn workers) это должен быть общий
+    бэкенд (Redis, Memcached, база данных), иначе изменения справочников будут
+    видны только процессу, который их выполнил.
+    """
+    return caches[getattr(settings, 'DDS_CACHE_ALIAS', 'default')]
+
+
+def _version_key(model):
+    return f'dds:version:{model._meta.label_lower}'
+
+
+def _modified_key(model):
+    return f'dds:modified:{model._meta.label_lower}'
+
+
+def get_table_states(models):
+    """
+    Возвращает версии таблиц и время их последнего изменения одним обращением к кешу.
+
+    Отсутствующая версия (первый запуск, вытеснение из кеша) инициализируется
+    текущим временем в микросекундах, поэтому новая версия никогда не совпадает
+    с версией, под которой в памяти процессов лежат устаревшие данные.
+    Отсутствующее время изменения инициализируется текущим временем.
+
+    Returns:
+        dict: {модель: (версия, время изменения в секундах с эпохи)}
+    """
+    cache = get_cache()
+    keys = {}
+    for model in models:
+        keys[_version_key(model)] = model
+        keys[_modified_key(model)] = model
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        now = time.time_ns()
+        cache.add(key, now // 1000 if key.startswith('dds:version:') else now / 10 ** 9, timeout=None)
+        found[key] = cache.get(key)
+    return {model: (found[_version_key(model)], found[_modified_key(model)]) for model in models}
+
+
+def get_table_versions(models):
+    """
+    Возвращает текущие версии таблиц одним обращением к кешу.
+
+    Returns:
+        dict: {модель: версия}
+    """
+    return {model: state[0] for model, state in get_table_states(models).items()}
+
+
+def get_table_version(model):
+    return get_table_versions([model])[model]
+
+
+def bump_table_version(model):
+    """
+    Увеличивает версию таблицы после фиксации текущей транзакции.
+
+    До фиксации другие процессы могли бы загрузить старые данные
+    и сохранить их под новой версией. Время изменения записывается раньше
+    версии: читатель может увидеть новое время со старой версией
+    (лишний повторный запрос клиента), но не наоборот.
+    """
+    def bump():
+        cache = get_cache()
+        key = _version_key(model)
+        cache.set(_modified_key(model), time.time(), timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns() // 1000, timeout=None)
+
+    transaction.on_commit(bump)
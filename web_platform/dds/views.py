@@ -1,14 +1,38 @@
+import asyncio
+import csv
+import datetime
+import json
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache.utils import make_template_fragment_key
+from django.core.paginator import InvalidPage
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, F, Max, Min, Sum, When
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
+from django.utils.safestring import mark_safe
 from django.urls import (
+    reverse,
     reverse_lazy
 )
 from django.views.generic import (
+    View,
     ListView,
+    DetailView,
+    TemplateView,
+    FormView,
     CreateView,
     UpdateView,
     DeleteView
 )
 
 from .forms import (
+    BulkCashFlowForm,
     CreateCashFlowForm,
     UpdateCashFlowForm,
     CreateStatusForm,
@@ -25,10 +49,37 @@ from .models import (
     Type,
     Category,
     Subcategory,
+    DailyBalance,
+    DailyCashFlowAggregate,
+    Job,
+    ArchivedCashFlow,
 )
+from .archive import get_archive_boundary, reaches_archive, with_archive
+from .bulk import bulk_delete_cash_flows, bulk_update_cash_flows
+from .filters import FILTER_PARAMS, filter_cash_flows
+from .jobs import active_delete_job, enqueue_delete
+from .metrics import registry as metrics_registry
+from .pagination import KeysetPaginator, UnionPaginator
+from .reference_cache import REFERENCE_MODELS, reference_cache
+from .reports import DIMENSIONS, PERIODS, format_period, get_report, parse_report_params, pivot_report
+from .search import SEARCH_PARAM, parse_search_terms, search_cash_flows
+from .versions import get_cache, get_table_versions
+
+
+class ReferenceSnapshotMixin:
+    """
+    Миксин представлений, читающих справочники из reference_cache.
+
+    Асинхронные варианты представлений загружают снимок заранее
+    (reference_cache.aget) и сохраняют его в атрибуте references.
+    """
+    references = None
+
+    def get_references(self):
+        return self.references or reference_cache.get()
 
 
-class IndexView(ListView):
+class IndexView(ReferenceSnapshotMixin, ListView):
     """
     Представление для отображения главной страницы системы учета ДДС.
 
@@ -37,13 +88,49 @@ class IndexView(ListView):
     - Фильтрацию операций по различным параметрам
     - Передачу в контекст справочников для фильтров
 
+    Поддерживает два режима пагинации:
+        - offset: стандартный Paginator Django (COUNT(*) + OFFSET), номер страницы в ?page=
+        - cursor: пагинация по ключу (creation_date, id) через KeysetPaginator,
+          непрозрачный токен страницы в ?cursor=, количество строк оценивается
+          с ограничением DDS_INDEX_COUNT_LIMIT
+
+    Режим по умолчанию задается настройкой DDS_INDEX_PAGINATION, для отдельного
+    запроса его можно включить параметром ?pagination=cursor.
+
+    Поиск (?search=) по комментарию и названиям справочников выполняется по
+    полнотекстовому индексу (dds.search); результаты поиска упорядочены по
+    релевантности, затем по дате, и разбиваются на страницы в режиме offset.
+
+    Операции, перенесенные в архив (ArchivedCashFlow, команда archive_cashflows),
+    показываются, только если "Дата с" не позже последней даты архива: тогда
+    оперативная таблица и архив объединяются через UNION ALL (режим offset),
+    справочники архивных строк берутся из снимка, а изменение и удаление
+    архивных операций недоступно. Без даты "с" архив не читается.
+
+    Панель фильтров и таблица операций с пагинацией кешируются как фрагменты
+    шаблона (тег cache) в кеше DDS_CACHE_ALIAS на DDS_FRAGMENT_CACHE_TIMEOUT секунд:
+        - панель фильтров - по версии справочников и значениям фильтров
+        - таблица - по параметрам запроса и версиям таблиц операций и справочников
+    Версия таблицы операций увеличивается при каждом изменении операций
+    (CashFlow.save/delete, пересчет агрегатов после массовых изменений),
+    поэтому создание, изменение и удаление операций сразу меняют ключ.
+    Если фрагмент таблицы уже есть в кеше, выборка страницы, подсчет строк
+    и остатки операций не запрашиваются - только остаток на дату.
+
     Атрибуты:
         template_name (str): Путь к шаблону страницы
         paginate_by (int): Количество операций на странице
+        page_window (int): Количество номеров страниц по обе стороны от текущей
+        filter_params (tuple): GET-параметры фильтров и поиска, сохраняемые в ссылках пагинации
+        fragment_cache_models (tuple): Таблицы, версии которых входят в ключ фрагмента таблицы
 
     Методы:
+        get(): Отдает страницу, используя закешированный фрагмент таблицы
         get_queryset(): Возвращает отфильтрованный queryset операций
+        get_pagination_mode(): Определяет режим пагинации для запроса
+        paginate_queryset(): Разбивает queryset на страницы в выбранном режиме
         get_context_data(): Добавляет в контекст данные для фильтров и формы
+        get_filter_context(): Возвращает контекст панели фильтров и ключи фрагментов
 
     Фильтрация поддерживается по:
         - Диапазону дат (date_from, date_to)
@@ -51,9 +138,11 @@ class IndexView(ListView):
         - Типу операции (type_obj)
         - Категории (category)
         - Подкатегории (subcategory)
+        - Строке поиска (search)
 
     Пример использования в URL:
         /?date_from=2024-01-01&date_to=2024-12-31&status=1&type_obj=2
+        /?search=avito+реклама
 
     Возвращает:
         QuerySet: Отсортированный по дате (новые сначала) список операций
@@ -61,6 +150,69 @@ class IndexView(ListView):
     """
     template_name = 'dds/index.html'
     paginate_by = 5
+    page_window = 2
+    filter_params = (*FILTER_PARAMS, SEARCH_PARAM)
+    fragment_cache_models = (CashFlow, ArchivedCashFlow, *REFERENCE_MODELS)
+    table_cache_key = None
+    archive_parts = None
+
+    def get(self, request, *args, **kwargs):
+        """
+        Отдает страницу. Если фрагмент таблицы операций есть в кеше, страница
+        собирается из него и остатка на дату, без выборки операций.
+        """
+        table_html = self.get_cached_table()
+        if table_html is None:
+            return super().get(request, *args, **kwargs)
+        balance = DailyBalance.objects.balance_at(self.get_balance_date())
+        return self.render_to_response(self.get_cached_table_context(table_html, balance))
+
+    def get_fragment_cache_timeout(self):
+        return getattr(settings, 'DDS_FRAGMENT_CACHE_TIMEOUT', 300)
+
+    def get_table_cache_key(self):
+        """
+        Возвращает ключ фрагмента таблицы операций: версии таблиц
+        fragment_cache_models, режим пагинации и непустые параметры фильтров,
+        поиска и страницы.
+        """
+        if self.table_cache_key is None:
+            versions = get_table_versions(self.fragment_cache_models)
+            params = [
+                (key, self.request.GET[key])
+                for key in sorted({*self.filter_params, self.page_kwarg, 'cursor'})
+                if self.request.GET.get(key)
+            ]
+            self.table_cache_key = json.dumps([
+                [versions[model] for model in self.fragment_cache_models],
+                self.get_pagination_mode(),
+                params,
+            ], ensure_ascii=False)
+        return self.table_cache_key
+
+    def get_table_fragment_key(self):
+        return make_template_fragment_key('dds_index_table', [self.get_table_cache_key()])
+
+    def get_cached_table(self):
+        """
+        Возвращает закешированный HTML таблицы операций или None.
+        """
+        if not self.get_fragment_cache_timeout():
+            return None
+        return get_cache().get(self.get_table_fragment_key())
+
+    def get_cached_table_context(self, table_html, balance):
+        """
+        Возвращает контекст страницы с готовым фрагментом таблицы операций.
+        """
+        # Строки страницы уже отрисованы во фрагменте
+        self.object_list = CashFlow.objects.none()
+        context = self.get_filter_context()
+        context['view'] = self
+        context['table_html'] = mark_safe(table_html)
+        context['balance_date'] = self.get_balance_date()
+        context['balance'] = balance
+        return context
 
     def get_queryset(self):
         """
@@ -73,6 +225,7 @@ class IndexView(ListView):
             - type_obj: ID типа операции
             - category: ID категории
             - subcategory: ID подкатегории
+            - search: строка поиска
 
         Returns:
             QuerySet: Отфильтрованный и отсортированный queryset операций CashFlow
@@ -80,42 +233,89 @@ class IndexView(ListView):
 
         Note:
             Использует select_related для оптимизации запросов к связанным моделям.
-            Фильтрация по ID выполняется только для цифровых значений.
+            Фильтры применяются функцией filter_cash_flows, поиск - search_cash_flows.
         """
-        date_from = self.request.GET.get('date_from')
-        date_to = self.request.GET.get('date_to')
-        status = self.request.GET.get('status')
-        type_obj = self.request.GET.get('type_obj')
-        category = self.request.GET.get('category')
-        subcategory = self.request.GET.get('subcategory')
-
         queryset = CashFlow.objects.select_related(
             'status',
             'type',
             'category',
             'subcategory',
         ).all()
+        queryset = self.filter_queryset(queryset)
+        if self.uses_archive():
+            self.archive_parts = [queryset, self.filter_queryset(ArchivedCashFlow.objects.all())]
+            queryset = with_archive(*self.archive_parts)
 
-        if date_from:
-            queryset =queryset.filter(creation_date__gte=date_from)
+        if self.is_search():
+            return queryset.order_by('search_rank', '-creation_date', '-id')
+        return queryset.order_by('-creation_date', '-id')
 
-        if date_to:
-            queryset =queryset.filter(creation_date__lte=date_to)
+    def filter_queryset(self, queryset):
+        """
+        Применяет фильтры и поиск запроса к queryset CashFlow или ArchivedCashFlow.
+        """
+        queryset = filter_cash_flows(queryset, self.request.GET)
+        if self.is_search():
+            queryset = search_cash_flows(queryset, self.request.GET[SEARCH_PARAM], self.get_references())
+        return queryset
 
-        if status and status.isdigit():
-            queryset = queryset.filter(status=int(status))
+    def is_search(self):
+        return bool(parse_search_terms(self.request.GET.get(SEARCH_PARAM)))
 
-        if type_obj and type_obj.isdigit():
-            queryset = queryset.filter(type=int(type_obj))
+    def get_archive_boundary(self):
+        if not hasattr(self, 'archive_boundary'):
+            self.archive_boundary = get_archive_boundary()
+        return self.archive_boundary
 
-        if category and category.isdigit():
-            queryset = queryset.filter(category=int(category))
+    def uses_archive(self):
+        return reaches_archive(self.request.GET, self.get_archive_boundary())
 
-        if subcategory and subcategory.isdigit():
-            queryset = queryset.filter(subcategory=int(subcategory))
+    def get_pagination_mode(self):
+        """
+        Возвращает режим пагинации: 'cursor' или 'offset'.
 
-        return queryset.order_by('-creation_date')
+        Наличие токена ?cursor= включает режим cursor, поиск и чтение архива - режим offset:
+        результаты поиска упорядочены по релевантности, а UNION с архивом
+        не поддерживает фильтр по ключу (creation_date, id).
+        """
+        if self.is_search() or self.uses_archive():
+            return 'offset'
+        if 'cursor' in self.request.GET:
+            return 'cursor'
+        mode = self.request.GET.get('pagination') or getattr(settings, 'DDS_INDEX_PAGINATION', 'offset')
+        return 'cursor' if mode == 'cursor' else 'offset'
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        """
+        Для UNION с архивом возвращает UnionPaginator: строки считаются по частям.
+        """
+        if self.archive_parts is not None:
+            return UnionPaginator(queryset, per_page, self.archive_parts, **kwargs)
+        return super().get_paginator(queryset, per_page, **kwargs)
 
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Разбивает queryset на страницы.
+
+        В режиме offset делегирует стандартной реализации ListView.
+        В режиме cursor выбирает страницу через KeysetPaginator.
+
+        Raises:
+            Http404: Если токен курсора некорректен
+        """
+        if self.get_pagination_mode() == 'offset':
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(
+            queryset,
+            per_page=page_size,
+            count_limit=getattr(settings, 'DDS_INDEX_COUNT_LIMIT', 1000),
+        )
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except ValueError:
+            raise Http404('Некорректный курсор страницы')
+        return paginator, page, page.object_list, page.has_other_pages()
 
     def get_context_data(self, *, object_list=None, **kwargs):
         """
@@ -137,14 +337,47 @@ class IndexView(ListView):
                 - categories: Все категории
                 - subcategories: Все подкатегории
                 - current_*: Текущие значения фильтров
+                - filter_query: Строка GET-параметров фильтров для ссылок пагинации
+                - pagination_mode: Режим пагинации ('offset' или 'cursor')
+                - page_numbers: Окно номеров страниц вокруг текущей (режим offset)
+                - balance, balance_date: Остаток на дату "по" или на сегодня
         """
         context = super().get_context_data(**kwargs)
+        context.update(self.get_filter_context())
+
+        # Остаток на дату "по" (или на сегодня) и остаток после каждой операции страницы
+        context['object_list'] = rows = list(context['object_list'])
+        if self.uses_archive():
+            self.set_references(rows)
+        balance_date = self.get_balance_date()
+        closing, later, balance = self.get_balances(rows, balance_date)
+        self.set_running_balances(rows, closing, later)
+        context['balance_date'] = balance_date
+        context['balance'] = balance
+
+        page_obj = context.get('page_obj')
+        if context['pagination_mode'] == 'offset' and page_obj is not None:
+            context['page_numbers'] = page_obj.paginator.get_elided_page_range(
+                page_obj.number,
+                on_each_side=self.page_window,
+                on_ends=1,
+            )
+        return context
+
+    def get_filter_context(self):
+        """
+        Возвращает контекст панели фильтров: справочники, текущие значения
+        фильтров, строку параметров для ссылок, режим пагинации и ключи
+        кеша фрагментов шаблона.
+        """
+        context = {}
 
-        # Справочники для фильтров
-        context['statuses'] = Status.objects.all()
-        context['types'] = Type.objects.all()
-        context['categories'] = Category.objects.all()
-        context['subcategories'] = Subcategory.objects.all()
+        # Справочники для фильтров (из кеша, без запросов при прогретом кеше)
+        references = self.get_references()
+        context['statuses'] = references.statuses
+        context['types'] = references.types
+        context['categories'] = references.categories
+        context['subcategories'] = references.subcategories
 
         # Текущие значения фильтров для сохранения состояния формы
         context['current_date_from'] = self.request.GET.get('date_from', '')
@@ -153,10 +386,163 @@ class IndexView(ListView):
         context['current_type'] = self.request.GET.get('type_obj', '')
         context['current_category'] = self.request.GET.get('category', '')
         context['current_subcategory'] = self.request.GET.get('subcategory', '')
+        context['current_search'] = self.request.GET.get(SEARCH_PARAM, '')
+
+        # Пагинация: фильтры сохраняются при переходе между страницами
+        query = self.request.GET.copy()
+        for key in list(query):
+            if key not in self.filter_params or not query[key]:
+                del query[key]
+        mode = self.get_pagination_mode()
+        if mode == 'cursor':
+            query['pagination'] = mode
+        context['filter_query'] = query.urlencode()
+        context['pagination_mode'] = mode
+
+        # Граница архива: подсказка о перенесенных операциях
+        context['archive_boundary'] = self.get_archive_boundary()
+        context['uses_archive'] = self.uses_archive()
+
+        # Кеш фрагментов шаблона
+        context['fragment_cache_alias'] = getattr(settings, 'DDS_CACHE_ALIAS', 'default')
+        context['fragment_cache_timeout'] = self.get_fragment_cache_timeout()
+        context['filters_cache_key'] = f'{references.version}:{context["filter_query"]}'
+        context['table_cache_key'] = self.get_table_cache_key()
         return context
 
+    def get_balance_date(self):
+        try:
+            return datetime.date.fromisoformat(self.request.GET.get('date_to', ''))
+        except ValueError:
+            return timezone.localdate()
+
+    def set_references(self, rows):
+        """
+        Заполняет справочники строк страницы из снимка справочников
+        (строки UNION с архивом загружаются без select_related).
+        """
+        references = self.get_references()
+        for row in rows:
+            row.status = references.get(Status, row.status_id)
+            row.type = references.get(Type, row.type_id)
+            row.category = references.get(Category, row.category_id)
+            row.subcategory = references.get(Subcategory, row.subcategory_id)
+
+    def get_balance_queries(self, rows):
+        """
+        Возвращает запросы для остатков после операций страницы:
+        (остатки дней страницы, операции этих дней, условные суммы для aggregate).
+
+        Остаток после операции равен остатку на конец ее дня (DailyBalance)
+        за вычетом операций того же дня, которые идут в списке выше (id больше).
+        Остаток общий по всем операциям, фильтры на него не влияют.
+        Операции дней не позже границы архива суммируются и по архиву,
+        поэтому операции дня - список queryset. Запросы не зависят
+        от глубины страницы и размера таблицы.
+        """
+        days = {row.creation_date for row in rows}
+        closing = DailyBalance.objects.filter(date__in=days).values_list('date', 'balance')
+        signed_amount = F('amount') * F('type__sign')
+        aggregates = {
+            f'later_{index}': Sum(
+                Case(
+                    When(creation_date=row.creation_date, pk__gt=row.pk, then=signed_amount),
+                    default=0,
+                    output_field=DecimalField(),
+                ),
+            )
+            for index, row in enumerate(rows)
+        }
+        later = [CashFlow.objects.filter(creation_date__in=days)]
+        boundary = self.get_archive_boundary()
+        if boundary is not None and min(days) <= boundary:
+            later.append(ArchivedCashFlow.objects.filter(creation_date__in=days))
+        return closing, later, aggregates
+
+    def get_balances(self, rows, balance_date):
+        """
+        Возвращает (остатки дней страницы, суммы операций дня выше каждой строки, остаток на дату).
+        """
+        closing, later = {}, {}
+        if rows:
+            closing_queryset, later_querysets, aggregates = self.get_balance_queries(rows)
+            closing = dict(closing_queryset)
+            later = self.merge_later(queryset.aggregate(**aggregates) for queryset in later_querysets)
+        return closing, later, DailyBalance.objects.balance_at(balance_date)
+
+    @staticmethod
+    def merge_later(results):
+        """
+        Складывает суммы операций дня из оперативной таблицы и архива.
+        """
+        later = {}
+        for result in results:
+            for key, value in result.items():
+                later[key] = (later.get(key) or 0) + (value or 0)
+        return later
+
+    @staticmethod
+    def set_running_balances(rows, closing, later):
+        """
+        Добавляет операциям страницы атрибут running_balance - остаток после операции.
+        """
+        for index, row in enumerate(rows):
+            balance = closing.get(row.creation_date)
+            if balance is not None:
+                balance = (balance - (later[f'later_{index}'] or 0)).quantize(Decimal('0.01'))
+            row.running_balance = balance
+
+
+class CashFlowFormMixin(ReferenceSnapshotMixin):
+    """
+    Миксин представлений формы операции.
 
-class CreateDdsView(CreateView):
+    Добавляет в контекст дерево Тип -> Категория -> Подкатегория из снимка
+    справочников. Шаблон встраивает его через json_script, и списки категорий
+    и подкатегорий фильтруются в браузере (dds/cash_flow_form.js) без запросов
+    к API. Соответствие категории типу и подкатегории категории по-прежнему
+    проверяет форма.
+    """
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['hierarchy'] = self.get_references().hierarchy()
+        return context
+
+    def form_valid(self, form):
+        """
+        Сохраняет операцию.
+
+        Форма проверяет справочники только по снимку reference_cache. Если
+        справочник удален в обход сигналов, снимок устарел и сохранение нарушает
+        внешний ключ: снимок сбрасывается, а удаленные значения отмечаются
+        ошибками полей вместо ответа 500.
+        """
+        instance = self.object
+        try:
+            with transaction.atomic():
+                return super().form_valid(form)
+        except IntegrityError:
+            reference_cache.invalidate()
+            self.references = reference_cache.get()
+            missing = []
+            for field in form.reference_fields:
+                value = form.cleaned_data.get(field)
+                if value is None:
+                    continue
+                try:
+                    self.references.get(type(value), value.pk)
+                except KeyError:
+                    missing.append(field)
+            if not missing:
+                raise
+            for field in missing:
+                form.add_error(field, 'Выбранное значение было удалено, выберите другое')
+            self.object = instance
+            return self.form_invalid(form)
+
+
+class CreateDdsView(CashFlowFormMixin, CreateView):
     """
     Представление для создания новой денежной операции.
 
@@ -169,7 +555,7 @@ class CreateDdsView(CreateView):
     success_url = reverse_lazy('dds:index')
 
 
-class UpdateDdsView(UpdateView):
+class UpdateDdsView(CashFlowFormMixin, UpdateView):
     """
     Представление для редактирования существующей денежной операции.
 
@@ -194,6 +580,152 @@ class DeleteDdsView(DeleteView):
     success_url = reverse_lazy('dds:index')
 
 
+class BulkDdsView(FormView):
+    """
+    Представление массовых действий над операциями главной страницы.
+
+    Принимает POST формы BulkCashFlowForm: смена статуса, смена типа,
+    категории и подкатегории или удаление - для отмеченных операций (ids)
+    или для всех операций, подходящих под фильтры и поиск из строки запроса
+    (те же GET-параметры, что у IndexView). Действие выполняется одним
+    запросом UPDATE или DELETE с условием WHERE, после чего дневные агрегаты
+    и остатки затронутых дат пересчитываются (dds.bulk). Архивные операции
+    не изменяются.
+
+    После выполнения перенаправляет на главную страницу с теми же фильтрами
+    и сообщением о количестве измененных операций; при ошибке формы
+    показывает страницу с ошибками.
+
+    Пример использования в URL:
+        POST /bulk/dds/?status=1&date_from=2024-01-01
+            action=category&scope=filtered&type=2&category=5&subcategory=9
+    """
+    form_class = BulkCashFlowForm
+    template_name = 'dds/bulk_dds.html'
+    http_method_names = ['post']
+
+    def get_filter_query(self):
+        query = self.request.GET.copy()
+        for key in list(query):
+            if key not in IndexView.filter_params or not query[key]:
+                del query[key]
+        return query.urlencode()
+
+    def get_success_url(self):
+        query = self.get_filter_query()
+        return f'{reverse("dds:index")}?{query}' if query else reverse('dds:index')
+
+    def get_queryset(self, form):
+        """
+        Возвращает операции, к которым применяется действие.
+        """
+        queryset = CashFlow.objects.all()
+        if form.cleaned_data['scope'] == BulkCashFlowForm.SCOPE_SELECTED:
+            return queryset.filter(pk__in=form.cleaned_data['ids'])
+        queryset = filter_cash_flows(queryset, self.request.GET)
+        return search_cash_flows(queryset, self.request.GET.get(SEARCH_PARAM))
+
+    def form_valid(self, form):
+        queryset = self.get_queryset(form)
+        if form.cleaned_data['action'] == BulkCashFlowForm.ACTION_DELETE:
+            count = bulk_delete_cash_flows(queryset)
+            messages.success(self.request, f'Удалено операций: {count}')
+        else:
+            count = bulk_update_cash_flows(queryset, **form.get_values())
+            messages.success(self.request, f'Изменено операций: {count}')
+        return HttpResponseRedirect(self.get_success_url())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['back_url'] = self.get_success_url()
+        return context
+
+
+class Echo:
+    """
+    Псевдо-буфер для csv.writer: вместо записи возвращает строку,
+    чтобы ее можно было сразу отдать в StreamingHttpResponse.
+    """
+
+    def write(self, value):
+        return value
+
+
+class ExportDdsView(View):
+    """
+    Представление для потоковой выгрузки отфильтрованного списка операций.
+
+    Принимает те же GET-параметры фильтрации и поиска, что и IndexView
+    (date_from, date_to, status, type_obj, category, subcategory, search),
+    и параметр format: csv (по умолчанию) или ndjson. Выгрузка упорядочена
+    по дате и при поиске. Архив операций включается по тому же правилу,
+    что и на главной странице (date_from не позже границы архива).
+
+    Строки читаются через values_list и iterator(chunk_size), без создания
+    экземпляров моделей, и отдаются клиенту по мере чтения, поэтому память
+    не зависит от объема выгрузки, а первые байты уходят сразу.
+
+    Пример использования в URL:
+        /export/dds/?format=ndjson&date_from=2024-01-01&type_obj=2
+    """
+    chunk_size = 2000
+    fields = (
+        ('id', 'id'),
+        ('creation_date', 'creation_date'),
+        ('status', 'status__status_name'),
+        ('type', 'type__type_name'),
+        ('category', 'category__category_name'),
+        ('subcategory', 'subcategory__subcategory_name'),
+        ('amount', 'amount'),
+        ('comment', 'comment'),
+    )
+    formats = {
+        'csv': ('text/csv; charset=utf-8', 'csv'),
+        'ndjson': ('application/x-ndjson', 'ndjson'),
+    }
+
+    def get_rows(self):
+        """
+        Возвращает итератор кортежей значений отфильтрованных операций.
+        """
+        lookups = [lookup for _, lookup in self.fields]
+        queryset = self.filter_queryset(CashFlow.objects.all()).values_list(*lookups)
+        if reaches_archive(self.request.GET, get_archive_boundary()):
+            archive = self.filter_queryset(ArchivedCashFlow.objects.all()).values_list(*lookups)
+            queryset = queryset.union(archive, all=True)
+        return queryset.order_by('-creation_date', '-id').iterator(chunk_size=self.chunk_size)
+
+    def filter_queryset(self, queryset):
+        queryset = filter_cash_flows(queryset, self.request.GET)
+        return search_cash_flows(queryset, self.request.GET.get(SEARCH_PARAM))
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in self.formats:
+            raise Http404('Неизвестный формат выгрузки')
+
+        content_type, extension = self.formats[export_format]
+        stream = self.stream_csv() if export_format == 'csv' else self.stream_ndjson()
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="cashflow.{extension}"'
+        return response
+
+    def stream_csv(self):
+        writer = csv.writer(Echo())
+        # BOM, чтобы Excel корректно определил кодировку
+        yield '\ufeff' + writer.writerow([name for name, _ in self.fields])
+        for row in self.get_rows():
+            yield writer.writerow(row)
+
+    def stream_ndjson(self):
+        names = [name for name, _ in self.fields]
+        for row in self.get_rows():
+            item = dict(zip(names, row))
+            item['creation_date'] = item['creation_date'].isoformat()
+            item['amount'] = str(item['amount'])
+            yield json.dumps(item, ensure_ascii=False) + '\n'
+
+
 class BaseCreateView(CreateView):
     """
     Базовое представление для создания записей справочников.
@@ -274,12 +806,200 @@ class BaseUpdateView(UpdateView):
         return context
 
 
-class StatusesView(ListView):
+class ReportView(TemplateView):
+    """
+    Представление страницы отчетов: суммы и количество операций по периодам.
+
+    Строит сводную таблицу: строки - комбинации выбранных измерений
+    (статус, тип, категория, подкатегория), колонки - периоды (день, неделя,
+    месяц, квартал, год). Поддерживает те же фильтры, что и главная страница.
+
+    Отчет строится по таблице дневных итогов и кешируется (dds.reports.get_report).
+
+    Пример использования в URL:
+        /reports/?period=quarter&group_by=type,category&date_from=2024-01-01
+    """
+    template_name = 'dds/reports.html'
+    filter_params = FILTER_PARAMS
+
+    def get_context_data(self, **kwargs):
+        """
+        Добавляет в контекст сводную таблицу, справочники для фильтров
+        и текущие значения параметров.
+
+        При недопустимых параметрах в контекст передается сообщение error
+        и пустой отчет.
+        """
+        context = super().get_context_data(**kwargs)
+        try:
+            params = parse_report_params(self.request.GET)
+        except ValueError as exc:
+            context['error'] = str(exc)
+            params = parse_report_params({})
+            rows = []
+        else:
+            rows = get_report(**params)
+        report = pivot_report(rows, params['group_by'])
+        report['period_labels'] = [format_period(value, params['period']) for value in report['periods']]
+        context['report'] = report
+        context['current_period'] = params['period']
+        context['current_group_by'] = params['group_by']
+        context['periods'] = list(PERIODS)
+        context['dimensions'] = list(DIMENSIONS)
+
+        references = reference_cache.get()
+        context['statuses'] = references.statuses
+        context['types'] = references.types
+        context['categories'] = references.categories
+        context['subcategories'] = references.subcategories
+
+        context['current_date_from'] = self.request.GET.get('date_from', '')
+        context['current_date_to'] = self.request.GET.get('date_to', '')
+        context['current_status'] = self.request.GET.get('status', '')
+        context['current_type'] = self.request.GET.get('type_obj', '')
+        context['current_category'] = self.request.GET.get('category', '')
+        context['current_subcategory'] = self.request.GET.get('subcategory', '')
+        return context
+
+
+class MetricsView(View):
+    """
+    Метрики запросов в текстовом формате Prometheus.
+
+    Доступ - только сотрудникам (is_staff) или по заголовку
+    "Authorization: Bearer <DDS_METRICS_TOKEN>" для сборщика Prometheus.
+    Если замеры выключены (DDS_METRICS_ENABLED=False), возвращает 404.
+    """
+
+    def get(self, request):
+        if not getattr(settings, 'DDS_METRICS_ENABLED', False):
+            raise Http404('Метрики выключены')
+        if not self.has_access(request):
+            return HttpResponseForbidden('Доступ только для администраторов')
+        return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    def has_access(self, request):
+        if request.user.is_active and request.user.is_staff:
+            return True
+        token = getattr(settings, 'DDS_METRICS_TOKEN', '')
+        header = request.headers.get('Authorization', '')
+        return bool(token) and constant_time_compare(header, f'Bearer {token}')
+
+
+class BaseDeleteView(ReferenceSnapshotMixin, DeleteView):
+    """
+    Базовое представление для удаления записей справочников.
+
+    Страница подтверждения показывает, что будет удалено каскадом, не загружая
+    связанные операции:
+        - количество, сумма и период операций - одним агрегирующим запросом
+          по таблице дневных итогов DailyCashFlowAggregate
+        - несколько последних операций - запросом с LIMIT по индексу
+          (справочник, -creation_date, -id)
+        - дочерние справочники - из кеша справочников, без запросов
+
+    Время ответа и память не зависят от количества операций справочника.
+
+    Справочник, у которого больше DDS_DELETE_SYNC_LIMIT операций, удаляется
+    фоновой задачей (dds.jobs.delete_reference) пачками в отдельных транзакциях:
+    после подтверждения выполняется переход на страницу прогресса задачи.
+
+    Атрибуты:
+        cash_flow_field (str): Поле CashFlow, ссылающееся на удаляемую модель
+        sample_size (int): Количество последних операций в примере
+    """
+    cash_flow_field = None
+    sample_size = 5
+
+    def get_cash_flow_summary(self):
+        """
+        Возвращает количество, сумму и период операций, удаляемых вместе с объектом.
+
+        Returns:
+            dict: {'count': int, 'total': Decimal | None, 'date_from': date | None, 'date_to': date | None}
+        """
+        summary = DailyCashFlowAggregate.objects.filter(**{self.cash_flow_field: self.object.pk}).aggregate(
+            count=Sum('operations_count'),
+            total=Sum('total_amount'),
+            date_from=Min('date'),
+            date_to=Max('date'),
+        )
+        summary['count'] = summary['count'] or 0
+        return summary
+
+    def get_cash_flow_sample(self):
+        """
+        Возвращает последние sample_size операций объекта.
+        """
+        return list(
+            CashFlow.objects.filter(**{self.cash_flow_field: self.object.pk})
+            .select_related('type')
+            .order_by('-creation_date', '-id')[:self.sample_size]
+        )
+
+    def get_context_data(self, **kwargs):
+        """
+        Расширяет контекст сводкой по связанным операциям.
+
+        Добавляет:
+            - cash_flow_summary: Количество, сумма и период операций
+            - cash_flow_sample: Последние операции
+            - cash_flow_rest: Количество операций, не вошедших в пример
+            - job: Незавершенная задача удаления объекта или None
+        """
+        context = super().get_context_data(**kwargs)
+        summary = self.get_cash_flow_summary()
+        sample = self.get_cash_flow_sample() if summary['count'] else []
+        context['cash_flow_summary'] = summary
+        context['cash_flow_sample'] = sample
+        context['cash_flow_rest'] = max(summary['count'] - len(sample), 0)
+        context['job'] = active_delete_job(self.object) if summary['count'] > self.get_sync_limit() else None
+        return context
+
+    def get_sync_limit(self):
+        return getattr(settings, 'DDS_DELETE_SYNC_LIMIT', 5000)
+
+    def form_valid(self, form):
+        """
+        Удаляет объект сразу или ставит удаление в очередь фоновых задач.
+        """
+        summary = self.get_cash_flow_summary()
+        if summary['count'] <= self.get_sync_limit():
+            # Остатки по дням пересчитывает обработчик удаления справочника (dds.signals)
+            return super().form_valid(form)
+        job = enqueue_delete(self.object)
+        query = urlencode({'next': self.get_success_url()})
+        return HttpResponseRedirect(f'{reverse("dds:job", kwargs={"pk": job.pk})}?{query}')
+
+
+class JobView(DetailView):
+    """
+    Представление страницы фоновой задачи: статус и прогресс выполнения.
+
+    Пока задача выполняется, страница обновляется каждые несколько секунд.
+    Параметр next - адрес для перехода после завершения задачи.
+    """
+    model = Job
+    template_name = 'dds/job.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        next_url = self.request.GET.get('next', '')
+        if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={self.request.get_host()}):
+            next_url = reverse('dds:index')
+        context['next_url'] = next_url
+        return context
+
+
+class StatusesView(ReferenceSnapshotMixin, ListView):
     """
     Представление для отображения списка всех статусов операций.
+    Статусы берутся из кеша справочников.
     """
     template_name = 'dds/statuses.html'
-    queryset = Status.objects.all()
+
+    def get_queryset(self):
+        return self.get_references().statuses
 
 
 class CreateStatusView(BaseCreateView):
@@ -306,23 +1026,26 @@ class UpdateStatusView(BaseUpdateView):
     back_url = reverse_lazy('dds:statuses')
 
 
-class DeleteStatusView(DeleteView):
+class DeleteStatusView(BaseDeleteView):
     """
     Представление для удаления статуса операции.
-    Включает предзагрузку связанных операций для отображения предупреждения.
+    Показывает сводку по связанным операциям для отображения предупреждения.
     """
     model = Status
     template_name = 'dds/delete_status.html'
     success_url = reverse_lazy('dds:statuses')
-    queryset = Status.objects.prefetch_related('status_cash_flows')
+    cash_flow_field = 'status'
 
 
-class TypesView(ListView):
+class TypesView(ReferenceSnapshotMixin, ListView):
     """
     Представление для отображения списка всех типов операций.
+    Типы берутся из кеша справочников.
     """
     template_name = 'dds/types.html'
-    queryset = Type.objects.all()
+
+    def get_queryset(self):
+        return self.get_references().types
 
 
 class CreateTypeView(BaseCreateView):
@@ -349,36 +1072,41 @@ class UpdateTypeView(BaseUpdateView):
     back_url = reverse_lazy('dds:types')
 
 
-class DeleteTypeView(DeleteView):
+class DeleteTypeView(BaseDeleteView):
     """
     Представление для удаления типа операции.
-    Включает предзагрузку связанных категорий, подкатегорий и операций
+    Показывает связанные категории, подкатегории и сводку по операциям
     для отображения предупреждения о связанных данных.
     """
     model = Type
     template_name = 'dds/delete_type.html'
     success_url = reverse_lazy('dds:types')
-    queryset = Type.objects.prefetch_related('categories__subcategories', 'type_cash_flows').all()
+    cash_flow_field = 'type'
 
     def get_context_data(self, **kwargs):
         """
-        Расширяет контекст списком всех подкатегорий, связанных с типом.
+        Расширяет контекст категориями и подкатегориями типа из кеша справочников.
         """
         context = super().get_context_data(**kwargs)
-
-        all_subcategories = []
-        for category in self.object.categories.all():
-            all_subcategories.extend(category.subcategories.all())
-        context['all_subcategories'] = all_subcategories
+        references = self.get_references()
+        categories = [category for category in references.categories if category.type_id == self.object.pk]
+        category_ids = {category.pk for category in categories}
+        context['categories'] = categories
+        context['all_subcategories'] = [
+            subcategory for subcategory in references.subcategories
+            if subcategory.category_id in category_ids
+        ]
         return context
 
-class CategoriesView(ListView):
+class CategoriesView(ReferenceSnapshotMixin, ListView):
     """
     Представление для отображения списка всех категорий операций.
-    Включает предзагрузку связанных типов для оптимизации запросов.
+    Категории берутся из кеша справочников вместе со связанными типами.
     """
     template_name = 'dds/categories.html'
-    queryset = Category.objects.select_related('type').all()
+
+    def get_queryset(self):
+        return self.get_references().categories
 
 
 class CreateCategoryView(BaseCreateView):
@@ -405,24 +1133,38 @@ class UpdateCategoryView(BaseUpdateView):
     back_url = reverse_lazy('dds:categories')
 
 
-class DeleteCategoryView(DeleteView):
+class DeleteCategoryView(BaseDeleteView):
     """
     Представление для удаления категории операции.
-    Включает предзагрузку связанных операций и подкатегорий
+    Показывает связанные подкатегории и сводку по операциям
     для отображения предупреждения о связанных данных.
     """
     model = Category
     template_name = 'dds/delete_category.html'
     success_url = reverse_lazy('dds:categories')
-    queryset = Category.objects.prefetch_related('category_cash_flows', 'subcategories').all()
+    cash_flow_field = 'category'
 
-class SubcategoriesView(ListView):
+    def get_context_data(self, **kwargs):
+        """
+        Расширяет контекст подкатегориями категории из кеша справочников.
+        """
+        context = super().get_context_data(**kwargs)
+        context['subcategories'] = [
+            subcategory for subcategory in self.get_references().subcategories
+            if subcategory.category_id == self.object.pk
+        ]
+        return context
+
+
+class SubcategoriesView(ReferenceSnapshotMixin, ListView):
     """
     Представление для отображения списка всех подкатегорий операций.
-    Включает предзагрузку связанных категорий и их типов для оптимизации запросов.
+    Подкатегории берутся из кеша справочников вместе со связанными категориями и типами.
     """
     template_name = 'dds/subcategories.html'
-    queryset = Subcategory.objects.select_related('category__type').all()
+
+    def get_queryset(self):
+        return self.get_references().subcategories
 
 
 class CreateSubcategoryView(BaseCreateView):
@@ -449,12 +1191,174 @@ class UpdateSubcategoryView(BaseUpdateView):
     back_url = reverse_lazy('dds:subcategories')
 
 
-class DeleteSubcategoryView(DeleteView):
+class DeleteSubcategoryView(BaseDeleteView):
     """
     Представление для удаления подкатегории операции.
-    Включает предзагрузку связанных операций для отображения предупреждения.
+    Показывает сводку по связанным операциям для отображения предупреждения.
     """
     model = Subcategory
     template_name = 'dds/delete_subcategory.html'
     success_url = reverse_lazy('dds:subcategories')
-    queryset = Subcategory.objects.prefetch_related('subcategory_cash_flows')
+    cash_flow_field = 'subcategory'
+
+
+class AsyncIndexView(IndexView):
+    """
+    Асинхронный вариант IndexView для развертывания через ASGI (uvicorn).
+
+    Запросы выполняются асинхронным ORM (aiterator, acount, aaggregate)
+    заранее, независимые группы - конкурентно через asyncio.gather:
+        - снимок справочников и страница операций вместе с подсчетом строк
+        - остатки дней страницы, суммы операций этих дней и остаток на дату
+    Затем контекст собирается общим кодом IndexView из готовых результатов
+    (хуки paginate_queryset, get_references и get_balances), поэтому
+    шаблон и поведение совпадают с синхронным вариантом. Если фрагмент таблицы
+    есть в кеше, запрашиваются только снимок справочников и остаток на дату.
+
+    Подключается вместо IndexView настройкой DDS_ASYNC_VIEWS.
+    """
+    page_result = None
+    balances = None
+
+    async def get(self, request, *args, **kwargs):
+        # Граница архива нужна для ключа фрагмента и queryset
+        await sync_to_async(self.get_archive_boundary)()
+        table_html = await self.aget_cached_table()
+        if table_html is not None:
+            self.references, balance = await asyncio.gather(
+                self.aget_references(),
+                DailyBalance.objects.abalance_at(self.get_balance_date()),
+            )
+            return self.render_to_response(self.get_cached_table_context(table_html, balance))
+        if self.is_search():
+            # Строка поиска сопоставляется с названиями справочников при построении queryset
+            self.references = await reference_cache.aget()
+        self.object_list = self.get_queryset()
+        self.references, self.page_result = await asyncio.gather(
+            self.aget_references(),
+            self.apaginate_queryset(self.object_list, self.paginate_by),
+        )
+        self.balances = await self.aget_balances(self.page_result[2], self.get_balance_date())
+        return self.render_to_response(self.get_context_data())
+
+    async def aget_references(self):
+        return self.references or await reference_cache.aget()
+
+    async def aget_cached_table(self):
+        # Ключ нужен и без кеша фрагментов: get_context_data читает его в цикле событий
+        await sync_to_async(self.get_table_cache_key)()
+        if not self.get_fragment_cache_timeout():
+            return None
+        return await get_cache().aget(self.get_table_fragment_key())
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """
+        Асинхронный вариант paginate_queryset.
+
+        Raises:
+            Http404: Если номер страницы или токен курсора некорректен
+        """
+        if self.get_pagination_mode() == 'cursor':
+            paginator = KeysetPaginator(
+                queryset,
+                per_page=page_size,
+                count_limit=getattr(settings, 'DDS_INDEX_COUNT_LIMIT', 1000),
+            )
+            try:
+                page = await paginator.apage(self.request.GET.get('cursor'))
+            except ValueError:
+                raise Http404('Некорректный курсор страницы')
+            return paginator, page, page.object_list, page.has_other_pages()
+
+        paginator = self.get_paginator(queryset, page_size, allow_empty_first_page=self.get_allow_empty())
+        page_number = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        count = None
+        if page_number == 'last':
+            count = await self.acount(paginator, queryset)
+            paginator.count = count
+            page_number = paginator.num_pages
+        try:
+            number = int(page_number)
+        except ValueError:
+            raise Http404(f'Некорректный номер страницы: {page_number}')
+
+        bottom = max(number - 1, 0) * page_size
+
+        async def fetch():
+            return [row async for row in queryset[bottom:bottom + page_size]]
+
+        if count is None:
+            # Подсчет строк и выборка страницы - конкурентно, номер проверяется после подсчета
+            paginator.count, rows = await asyncio.gather(self.acount(paginator, queryset), fetch())
+        else:
+            rows = await fetch()
+        try:
+            number = paginator.validate_number(number)
+        except InvalidPage as exc:
+            raise Http404(f'Некорректная страница ({page_number}): {exc}')
+        page = paginator._get_page(rows, number, paginator)
+        return paginator, page, rows, page.has_other_pages()
+
+    @staticmethod
+    async def acount(paginator, queryset):
+        if isinstance(paginator, UnionPaginator):
+            return await paginator.acount()
+        return await queryset.acount()
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.page_result
+
+    async def aget_balances(self, rows, balance_date):
+        """
+        Асинхронный вариант get_balances: запросы выполняются конкурентно.
+        """
+        async def no_rows():
+            return {}
+
+        if not rows:
+            return await asyncio.gather(no_rows(), no_rows(), DailyBalance.objects.abalance_at(balance_date))
+        closing_queryset, later_querysets, aggregates = self.get_balance_queries(rows)
+
+        async def fetch_closing():
+            return {date: balance async for date, balance in closing_queryset}
+
+        async def fetch_later():
+            results = await asyncio.gather(*(queryset.aaggregate(**aggregates) for queryset in later_querysets))
+            return self.merge_later(results)
+
+        return await asyncio.gather(
+            fetch_closing(),
+            fetch_later(),
+            DailyBalance.objects.abalance_at(balance_date),
+        )
+
+    def get_balances(self, rows, balance_date):
+        return self.balances
+
+
+class AsyncReferenceListMixin:
+    """
+    Асинхронный вариант списков справочников: снимок загружается через
+    reference_cache.aget (при промахе - четыре запроса конкурентно),
+    дальше страница строится синхронным кодом ListView без запросов.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.references = await reference_cache.aget()
+        return super().get(request, *args, **kwargs)
+
+
+class AsyncStatusesView(AsyncReferenceListMixin, StatusesView):
+    pass
+
+
+class AsyncTypesView(AsyncReferenceListMixin, TypesView):
+    pass
+
+
+class AsyncCategoriesView(AsyncReferenceListMixin, CategoriesView):
+    pass
+
+
+class AsyncSubcategoriesView(AsyncReferenceListMixin, SubcategoriesView):
+    pass
@@ -1,15 +1,33 @@
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+
+def env(name, default=None):
+    return os.environ.get(name, default)
+
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-co^bx)!nmmvj(yrc2oj7gs(hq60%s^(i=oxmsytbi2+3i5gq-c'
+SECRET_KEY = env('DJANGO_SECRET_KEY', 'django-insecure-co^bx)!nmmvj(yrc2oj7gs(hq60%s^(i=oxmsytbi2+3i5gq-c')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = env_bool('DJANGO_DEBUG', True)
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in env('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -35,6 +53,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Замеры запросов (включаются DDS_METRICS_ENABLED), сессия и пользователь загружаются лениво и тоже учитываются
+    'dds.middleware.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'web_platform.urls'
@@ -59,14 +79,91 @@ WSGI_APPLICATION = 'web_platform.wsgi.application'
 
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Профиль базы данных задается переменной окружения DB_ENGINE:
+#   sqlite   - файл DB_NAME (по умолчанию db.sqlite3), PRAGMA из DDS_SQLITE_PRAGMAS
+#              применяются к каждому соединению (dds.db.configure_sqlite)
+#   postgres - PostgreSQL (нужен пакет psycopg или psycopg2), постоянные соединения
+#              DB_CONN_MAX_AGE с проверкой DB_CONN_HEALTH_CHECKS
+DB_ENGINE = env('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('DB_NAME', 'cashflow'),
+            'USER': env('DB_USER', 'postgres'),
+            'PASSWORD': env('DB_PASSWORD', ''),
+            'HOST': env('DB_HOST', 'localhost'),
+            'PORT': env('DB_PORT', '5432'),
+            # Соединение переиспользуется между запросами в течение CONN_MAX_AGE секунд
+            'CONN_MAX_AGE': env_int('DB_CONN_MAX_AGE', 60),
+            # Перед переиспользованием соединение проверяется, разорванное - открывается заново
+            'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', True),
+            # Пулер в режиме transaction (PgBouncer) не поддерживает серверные курсоры,
+            # которые используют QuerySet.iterator() в экспорте и импорте
+            'DISABLE_SERVER_SIDE_CURSORS': env_bool('DB_PGBOUNCER', False),
+            'OPTIONS': {
+                'connect_timeout': env_int('DB_CONNECT_TIMEOUT', 5),
+            },
+        }
+    }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / env('DB_NAME', 'db.sqlite3'),
+            'OPTIONS': {
+                # Ожидание блокировки на уровне драйвера, секунд
+                'timeout': env_int('DB_SQLITE_TIMEOUT', 20),
+            },
+        }
     }
+else:
+    raise ValueError(f'Неизвестное значение DB_ENGINE: {DB_ENGINE}')
+
+# PRAGMA для каждого соединения SQLite. WAL позволяет читать параллельно с записью,
+# busy_timeout (мс) - ждать освобождения блокировки вместо ошибки "database is locked",
+# synchronous=NORMAL в режиме WAL сохраняет целостность при сбое процесса и убирает fsync на каждую транзакцию
+DDS_SQLITE_PRAGMAS = {
+    'journal_mode': env('DB_SQLITE_JOURNAL_MODE', 'WAL'),
+    'busy_timeout': env_int('DB_SQLITE_BUSY_TIMEOUT', 20000),
+    'synchronous': env('DB_SQLITE_SYNCHRONOUS', 'NORMAL'),
 }
 
 
+# Cache
+# Профиль кеша задается переменной окружения CACHE_BACKEND:
+#   locmem   - память процесса; подходит только для разработки и одного процесса
+#   database - таблица CACHE_TABLE в базе данных (создается командой createcachetable)
+#   redis    - Redis по адресу CACHE_LOCATION (нужен пакет redis)
+# Без DEBUG по умолчанию используется database: версии таблиц (dds.versions) должны быть
+# общими для всех процессов, иначе процессы отдают устаревшие данные.
+CACHE_BACKEND = env('CACHE_BACKEND', 'locmem' if DEBUG else 'database')
+
+if CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+elif CACHE_BACKEND == 'database':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': env('CACHE_TABLE', 'dds_cache'),
+        }
+    }
+elif CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': env('CACHE_LOCATION', 'redis://127.0.0.1:6379/0'),
+        }
+    }
+else:
+    raise ValueError(f'Неизвестное значение CACHE_BACKEND: {CACHE_BACKEND}')
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -99,3 +196,76 @@ STATIC_URL = 'static/'
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Пагинация главной страницы: 'offset' (Paginator Django) или 'cursor' (по ключу creation_date, id)
+DDS_INDEX_PAGINATION = 'offset'
+
+# Максимальное количество строк, которое считается для оценки числа страниц в режиме cursor
+DDS_INDEX_COUNT_LIMIT = 1000
+
+# Кеш Django для версий таблиц и общего снимка справочников.
+# При нескольких процессах должен быть общим бэкендом (Redis, Memcached, база данных):
+# без DEBUG проверка dds.E001 (manage.py check --deploy) запрещает LocMemCache.
+DDS_CACHE_ALIAS = 'default'
+
+# Количество версий снимка справочников в памяти процесса
+DDS_REFERENCE_CACHE_SIZE = 4
+
+# Хранить снимок справочников также в кеше DDS_CACHE_ALIAS (для холодного старта процессов)
+DDS_REFERENCE_CACHE_SHARED = False
+
+# Максимальное количество операций в одном запросе POST /api/cashflow/bulk/
+DDS_API_BULK_MAX_ROWS = 5000
+
+# max-age (в секундах) для ответов API справочников с ETag / Last-Modified
+DDS_API_CACHE_MAX_AGE = 0
+
+# Время хранения построенных отчетов в кеше DDS_CACHE_ALIAS, секунд
+DDS_REPORT_CACHE_TIMEOUT = 600
+
+# Движок отчетов: database (GROUP BY по таблице дневных итогов) или analytics
+# (столбцовый снимок операций в NumPy, dds.analytics; нужен пакет numpy)
+DDS_REPORT_BACKEND = env('DDS_REPORT_BACKEND', 'database')
+# Каталог снимка dds.analytics (файлы .npy, открываются через memory map)
+DDS_ANALYTICS_DIR = Path(env('DDS_ANALYTICS_DIR', str(BASE_DIR / 'analytics')))
+# Срок хранения журнала измененных дат (CashFlowChange), дней; снимок, не обновлявшийся
+# дольше этого срока, строится заново
+DDS_ANALYTICS_CHANGES_DAYS = env_int('DDS_ANALYTICS_CHANGES_DAYS', 30)
+
+# Время хранения фрагментов главной страницы (панель фильтров, таблица операций)
+# в кеше DDS_CACHE_ALIAS, секунд; 0 - не кешировать
+DDS_FRAGMENT_CACHE_TIMEOUT = env_int('DDS_FRAGMENT_CACHE_TIMEOUT', 300)
+
+# Замеры запросов (dds.middleware.RequestMetricsMiddleware) и /metrics
+DDS_METRICS_ENABLED = env_bool('DDS_METRICS_ENABLED', False)
+# Токен сборщика Prometheus: заголовок "Authorization: Bearer <токен>"
+DDS_METRICS_TOKEN = env('DDS_METRICS_TOKEN', '')
+# Пороги лога медленных запросов (логгер dds.metrics): время ответа, мс, и количество SQL-запросов
+DDS_SLOW_REQUEST_MS = env_int('DDS_SLOW_REQUEST_MS', 500)
+DDS_SLOW_REQUEST_QUERIES = env_int('DDS_SLOW_REQUEST_QUERIES', 50)
+# Количество самых долгих SQL-запросов в записи лога
+DDS_SLOW_REQUEST_SQL_LIMIT = 50
+
+# Асинхронные варианты главной страницы, списков справочников и API категорий/подкатегорий
+# (dds.views.Async*, dds.api.views.Async*) для развертывания через ASGI (uvicorn)
+DDS_ASYNC_VIEWS = env_bool('DDS_ASYNC_VIEWS', False)
+
+# Удаление справочника, у которого больше DDS_DELETE_SYNC_LIMIT операций, выполняется
+# фоновой задачей (команда run_jobs) пачками примерно по DDS_DELETE_BATCH_SIZE операций
+DDS_DELETE_SYNC_LIMIT = env_int('DDS_DELETE_SYNC_LIMIT', 5000)
+DDS_DELETE_BATCH_SIZE = env_int('DDS_DELETE_BATCH_SIZE', 5000)
+# Задача в статусе running без обновлений дольше этого времени возвращается в очередь, секунд
+DDS_JOB_STALE_SECONDS = 300
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'dds.metrics': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+        'dds.jobs': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -2,8 +2,11 @@ from django.contrib import admin
 from django.urls import path
 from django.urls import include
 
+from dds.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('dds.urls')),
     path('api/', include('dds.api.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]